@@ -0,0 +1,100 @@
+"""Memory allocated per refresh by the decoding of a forecast response, measured with tracemalloc.
+
+Compares copying every entry into filter_attributes dicts and dataclasses with wrapping the decoded entries in views.
+The conversion into Kodi entries is measured as well where Kodi's modules can be imported.
+
+    python -m benchmark.allocations [hourly entries]
+"""
+import gc
+import json
+import sys
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Tuple
+
+from lib.homeassistant import (
+    HomeAssistantAdapter, HomeAssistantCurrentForecast, HomeAssistantHourlyForecast, HomeAssistantHourlyForecastView,
+    HomeAssistantResolvedForecastMeta, HomeAssistantSunInfo
+)
+from lib.homeassistant._sun import HomeAssistantSunState
+
+
+def response(count: int) -> str:
+    start = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    return json.dumps([{
+        "datetime": (start + timedelta(hours=i)).isoformat(), "condition": "partlycloudy",
+        "temperature": 15.0 + i % 10, "apparent_temperature": 14.0, "dew_point": 9.5, "humidity": 60 + i % 30,
+        "cloud_coverage": 40.0, "pressure": 1013.2, "wind_bearing": 180.0 + i % 90, "wind_gust_speed": 20.5,
+        "wind_speed": 9.4, "precipitation": 0.2 * (i % 4), "precipitation_probability": 20, "uv_index": 1.0,
+    } for i in range(count)])
+
+
+def measure(name: str, action: Callable[[], Any]) -> Tuple[int, int]:
+    tracemalloc.start()
+    kept = action()
+    gc.collect()    # also empties the free lists, objects parked there are not kept by the entries
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    print(f"{name:<40} kept {current / 1024:8.1f} KiB   peak {peak / 1024:8.1f} KiB")
+    return current, peak
+
+
+def dataclasses(content: str) -> list:
+    return [
+        HomeAssistantHourlyForecast(**HomeAssistantAdapter.filter_attributes(entry, 'hourly'))
+        for entry in json.loads(content)
+    ]
+
+
+def views(content: str) -> list:
+    return [HomeAssistantHourlyForecastView(entry) for entry in json.loads(content)]
+
+
+def main(count: int) -> None:
+    content = response(count)
+    print(f"{count} hourly entries, {len(content) / 1024:.1f} KiB of JSON")
+    measure("decoded JSON only", lambda: json.loads(content))
+    measure("filter_attributes + dataclasses", lambda: dataclasses(content))
+    measure("views", lambda: views(content))
+    try:
+        from plugin.util.forecast_converter import ForecastConverter
+    except ImportError:
+        print("Kodi modules not importable, conversion not measured")
+        return
+    meta = HomeAssistantResolvedForecastMeta(HomeAssistantCurrentForecast(
+        temperature_unit="°C", pressure_unit="hPa", wind_speed_unit="km/h", visibility_unit="km",
+        precipitation_unit="mm", attribution="", friendly_name="Home", supported_features=3, wind_bearing=180,
+        wind_speed=10, temperature=20, humidity=50, condition="sunny", dew_point=10, cloud_coverage=0, pressure=1013,
+        uv_index=2
+    ))
+    sun = HomeAssistantSunInfo(
+        state=HomeAssistantSunState.ABOVE_HORIZON, next_dawn="2024-06-02T03:00:00+00:00",
+        next_dusk="2024-06-01T20:00:00+00:00", next_midnight="2024-06-01T23:00:00+00:00",
+        next_noon="2024-06-02T11:00:00+00:00", next_rising="2024-06-02T03:30:00+00:00",
+        next_setting="2024-06-01T19:30:00+00:00", elevation=40.0, azimuth=180.0, rising=False, friendly_name="Sun"
+    )
+    rendered = ("timestamp", "condition_str", "wind_speed", "wind_direction", "humidity", "temperature", "dew_point",
+                "feels_like", "precipitation")
+
+    def refresh(decode: Callable[[str], list], read: bool, release: bool = False) -> Tuple[list, list]:
+        # the pipeline keeps both the Home Assistant entries and the converted ones until the next refresh
+        entries = decode(content)
+        converted = ForecastConverter.translate_hourly_forecasts(ha_hourly=entries, meta=meta, ha_sun_info=sun)
+        if read:
+            for entry in converted:
+                for name in rendered:
+                    getattr(entry, name)
+        if release:
+            entries = HomeAssistantHourlyForecastView.release_all(entries)
+            ForecastConverter.rebind_all(converted, entries)
+        return entries, converted
+
+    measure("dataclasses converted and read", lambda: refresh(dataclasses, read=True))
+    measure("views converted, not read", lambda: refresh(views, read=False))
+    measure("views converted and read", lambda: refresh(views, read=True))
+    measure("views converted, read and released", lambda: refresh(views, read=True, release=True))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 168)
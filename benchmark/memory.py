@@ -0,0 +1,97 @@
+"""Bytes per hourly entry kept alive by the forecast models and unit values, measured with tracemalloc.
+
+Each slotted class is measured next to an unslotted baseline of the same run: a plain @dataclass copy of the model
+and a unit value keeping its number in a __dict__. The Kodi models are measured as well where Kodi's modules can be
+imported, e.g. from Kodistubs (requirements-dev.txt).
+
+    python -m benchmark.memory [hourly entries]
+"""
+import gc
+import sys
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from dataclasses import fields, make_dataclass
+from typing import Any, Callable, Union
+
+from lib.homeassistant import HomeAssistantHourlyForecast, HomeAssistantHourlyForecastView
+from lib.unit.speed import SpeedKph
+from lib.unit.temperature import TemperatureCelsius
+
+
+def measure(name: str, count: int, create: Callable[[int], Any]) -> float:
+    tracemalloc.start()
+    kept = [create(i) for i in range(count)]
+    gc.collect()    # also empties the free lists, objects parked there are not kept by the entries
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    print(f"{name:<40} {current / count:8.1f} bytes per entry")
+    return current / count
+
+
+# the layouts before slots: every instance carries a __dict__ and a missing value is an object of its own
+def _unslotted(cls: type) -> type:
+    return make_dataclass("_Unslotted" + cls.__name__, [(field.name, field.type) for field in fields(cls)])
+
+
+_UnslottedHourlyForecast = _unslotted(HomeAssistantHourlyForecast)
+
+
+class _UnslottedValue:
+    # a unit value of any unit, the unit is a class attribute either way
+    def __init__(self, value: Union[float, None]) -> None:
+        self.value = value
+
+
+def main(count: int) -> None:
+    start = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    # values are created outside of the measurement, both layouts refer to the same objects
+    stamps = [(start + timedelta(hours=i)).isoformat() for i in range(count)]
+    temperatures = [15.0 + i / 100 for i in range(count)]
+    print(f"{count} hourly entries")
+    values = lambda i: dict(
+        wind_bearing=180.0, wind_speed=9.4, temperature=temperatures[i], humidity=60, condition="rainy",
+        datetime=stamps[i], precipitation=0.3, cloud_coverage=40.0, uv_index=1.0
+    )
+    measure("HomeAssistantHourlyForecast", count, lambda i: HomeAssistantHourlyForecast(**values(i)))
+    measure("  unslotted @dataclass baseline", count, lambda i: _UnslottedHourlyForecast(**values(i)))
+    entry = lambda i: {
+        "wind_bearing": 180.0, "wind_speed": 9.4, "temperature": temperatures[i], "humidity": 60, "condition": "rainy",
+        "datetime": stamps[i], "precipitation": 0.3, "cloud_coverage": 40.0, "uv_index": 1.0
+    }
+    # a view keeps the decoded entry alive until it is released into the dataclass
+    measure("HomeAssistantHourlyForecastView", count, lambda i: HomeAssistantHourlyForecastView(entry(i)))
+    measure("released HomeAssistantHourlyForecastView", count, lambda i: HomeAssistantHourlyForecastView.release_all(
+        [HomeAssistantHourlyForecastView(entry(i))]
+    )[0])
+    measure("Temperature and Speed values", count, lambda i: (
+        TemperatureCelsius(temperatures[i]), SpeedKph(9.4), TemperatureCelsius(temperatures[i] - 1)
+    ))
+    measure("  unslotted baseline", count, lambda i: (
+        _UnslottedValue(temperatures[i]), _UnslottedValue(9.4), _UnslottedValue(temperatures[i] - 1)
+    ))
+    measure("missing Temperature values", count, lambda i: (TemperatureCelsius(None), TemperatureCelsius(None)))
+    measure("  unslotted baseline", count, lambda i: (_UnslottedValue(None), _UnslottedValue(None)))
+    try:
+        from lib.kodi import KodiHourlyForecastData, KodiWindDirectionCode, KodiConditionCode
+    except ImportError:
+        print("Kodi modules not importable, Kodi models not measured")
+        return
+    timestamps = [start + timedelta(hours=i) for i in range(count)]
+    kodi_values = lambda i, temperature, speed: dict(
+        timestamp=timestamps[i], temperature=temperature(temperatures[i]), wind_speed=speed(9.4),
+        wind_direction=KodiWindDirectionCode.VAR, precipitation="0.3 mm", humidity=60,
+        feels_like=temperature(None), dew_point=temperature(temperatures[i] - 5),
+        condition=KodiConditionCode.SHOWERS, pressure=""
+    )
+    measure("KodiHourlyForecastData with values", count, lambda i: KodiHourlyForecastData(
+        **kodi_values(i, TemperatureCelsius, SpeedKph)
+    ))
+    unslotted = _unslotted(KodiHourlyForecastData)
+    measure("  unslotted baseline", count, lambda i: unslotted(
+        **kodi_values(i, _UnslottedValue, _UnslottedValue)
+    ))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 168 * 4)
@@ -0,0 +1,83 @@
+"""Time of the derived summaries next to the conversion whose values they reuse.
+
+The summary runs on views whose rendered values were read already, like after publishing; it must not convert any value
+on its own. Needs Kodi's modules to be importable.
+
+    python -m benchmark.summary [hourly entries]
+"""
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+
+from lib.homeassistant import (
+    HomeAssistantCurrentForecast, HomeAssistantDailyForecast, HomeAssistantForecast, HomeAssistantHourlyForecast,
+    HomeAssistantSunInfo
+)
+
+# of the values the summary reads, those the adapter renders; low_temperature is daily only
+_RENDERED = ("timestamp", "temperature", "condition", "low_temperature")
+
+
+def _forecast(count: int, start: datetime) -> HomeAssistantForecast:
+    stamp = lambda hours: (start + timedelta(hours=hours)).isoformat()
+    return HomeAssistantForecast(
+        current=HomeAssistantCurrentForecast(
+            temperature=12.0, dew_point=8.0, temperature_unit="°C", humidity=70, cloud_coverage=40, pressure=1012,
+            wind_bearing=200, wind_speed=9.4, wind_speed_unit="km/h", visibility_unit="km", precipitation_unit="mm",
+            pressure_unit="hPa", condition="cloudy", friendly_name="Home", supported_features=3, uv_index=1,
+            attribution="",
+        ),
+        hourly=[HomeAssistantHourlyForecast(
+            wind_bearing=200, wind_speed=9.4, temperature=8.0 + i % 24 / 2, humidity=70,
+            condition=("cloudy", "rainy")[i % 7 == 6], datetime=stamp(i), precipitation=0.3, cloud_coverage=40.0,
+            uv_index=i % 24 / 4,
+        ) for i in range(count)],
+        daily=[HomeAssistantDailyForecast(
+            wind_bearing=200, wind_speed=9.4, temperature=20.0 - i, humidity=70, condition="rainy", datetime=stamp(24 * i),
+            precipitation=3.0, templow=5.0 + i,
+        ) for i in range(7)],
+    )
+
+
+def main(count: int) -> None:
+    try:
+        from plugin.util.forecast_converter import ForecastConverter
+        from plugin.util.forecast_summary import ForecastSummarizer
+    except ImportError:
+        print("Kodi modules not importable, nothing measured")
+        return
+    start = datetime.now(tz=timezone.utc).replace(minute=0, second=0, microsecond=0)
+    ha_forecast = _forecast(count=count, start=start)
+    sun_info = HomeAssistantSunInfo(
+        state="above_horizon", next_dawn=ha_forecast.hourly[20].datetime, next_dusk=ha_forecast.hourly[9].datetime,
+        next_midnight=ha_forecast.hourly[14].datetime, next_noon=ha_forecast.hourly[2].datetime,
+        next_rising=ha_forecast.hourly[21].datetime, next_setting=ha_forecast.hourly[8].datetime, elevation=30.0,
+        azimuth=180.0, rising=False, friendly_name="Sun",
+    )
+    now = datetime.now().astimezone()
+
+    def convert():
+        forecast = ForecastConverter.translate_ha_forecast_to_kodi_forecast(ha_forecast=ha_forecast, ha_sun_info=sun_info)
+        for entry in forecast.HourlyForecasts + forecast.DailyForecasts:
+            for name in _RENDERED:
+                getattr(entry, name, None)
+        return forecast
+
+    kodi_forecast = convert()
+    views = kodi_forecast.HourlyForecasts + kodi_forecast.DailyForecasts
+    # cached values live in the slots of the view classes and their bases
+    filled = lambda: sum(
+        hasattr(view, name) for view in views for cls in type(view).__mro__ for name in getattr(cls, "__slots__", ())
+    )
+    before = filled()
+    summarize = lambda: ForecastSummarizer.summarize(forecast=kodi_forecast, ha_hourly=ha_forecast.hourly, now=now)
+    summarize()
+    print(f"{count} hourly and {len(ha_forecast.daily)} daily entries")
+    print(f"values converted by the summary       {filled() - before:8d}")
+    for name, action in (("convert and read rendered values", convert), ("summarize", summarize)):
+        runs, seconds = timeit.Timer(action).autorange()
+        print(f"{name:<38} {seconds / runs * 1e6 / count:8.2f} µs per hourly entry")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 168)
@@ -1,4 +1,10 @@
-from plugin import KodiHomeAssistantWeatherPlugin
+import sys
+
+from plugin import KodiHomeAssistantWeatherPlugin, KodiHomeAssistantWeatherService
 
 if __name__ == '__main__':
-    KodiHomeAssistantWeatherPlugin()
+    # Kodi passes the index of the selected location when the weather window switches locations
+    location = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else None
+    # a running background service owns the warm pipeline, otherwise refresh in this process
+    if not KodiHomeAssistantWeatherService.trigger_refresh(location=location):
+        KodiHomeAssistantWeatherPlugin(location=location)
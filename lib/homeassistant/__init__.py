@@ -1,7 +1,16 @@
 from ._adapter import HomeAssistantAdapter
-from ._errors import RequestError
+from ._batch import HomeAssistantForecastBatch, HomeAssistantSharedRequests
+from ._errors import RequestError, SnapshotError
 from ._forecast import (
     HomeAssistantForecast, HomeAssistantCurrentForecast, HomeAssistantHourlyForecast, HomeAssistantDailyForecast,
-    HomeAssistantWeatherCondition, HomeAssistantForecastMeta
+    HomeAssistantWeatherCondition, HomeAssistantForecastMeta, HomeAssistantWeatherFeature
 )
+from ._interpolate import HomeAssistantCurrentInterpolator
+from ._meta import HomeAssistantForecastMetaCache, HomeAssistantResolvedForecastMeta
+from ._overlay import HomeAssistantCurrentOverlay, HomeAssistantSensorState
+from ._history import HomeAssistantForecastHistory, HomeAssistantHistoryKind
+from ._snapshot import HomeAssistantForecastSnapshot, HomeAssistantSnapshotRecords
+from ._resample import HomeAssistantForecastResampler
+from ._relay import HomeAssistantRelayServer, HomeAssistantRelayClient, HomeAssistantRelayResource
 from ._sun import HomeAssistantSunInfo
+from ._views import HomeAssistantHourlyForecastView, HomeAssistantDailyForecastView
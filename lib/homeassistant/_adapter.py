@@ -1,26 +1,95 @@
+import time
 import urllib.parse
-from typing import Dict, Union
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Tuple, Union
 
 import requests, urllib3
 from requests import RequestException
 
+from lib.util.cancellation import CancellationToken
+from lib.util.rate_limiter import TokenBucket
+
 from ._errors import RequestError
 from ._forecast import (
-    HomeAssistantForecast, HomeAssistantCurrentForecast, HomeAssistantHourlyForecast, HomeAssistantDailyForecast
+    HomeAssistantForecast, HomeAssistantCurrentForecast, HomeAssistantHourlyForecast, HomeAssistantDailyForecast,
+    HomeAssistantWeatherFeature
 )
+from ._overlay import HomeAssistantSensorState
 from ._sun import HomeAssistantSunInfo, HomeAssistantSunState
+from ._views import HomeAssistantHourlyForecastView, HomeAssistantDailyForecastView
 
 # If the user selects not to check for SSL certificate, this doesn't mean we have to flood the log with the mentions of that being bad. User has a choice.
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+_RequestListener = Callable[[str, str, int, float], None]
+_POOL_SIZE = 10     # concurrent requests of all locations and tiers
+_DEFAULT_RETRY_AFTER = 60   # seconds to back off after a 429 without Retry-After
+_BAN_BACKOFF = 15 * 60      # seconds to stay away once Home Assistant's ip-ban answers 403
+# answers of a get_forecasts call that one entity unable to serve the forecast type fails as a whole
+_ENTITY_ERRORS = (400, 500)
+_REFUSED_FOR = 3600     # seconds an entity that failed a batch is left out of the batches of its server
+_SERVICE_RESPONSE = {"return_response": True}   # a service call answers with its response data only if asked
+
+_EntriesResult = Union[Tuple[List[dict], int], RequestError]
+
+
+def _create_session() -> requests.Session:
+    # one pool of keep-alive connections shared by all fetch workers
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
 class HomeAssistantAdapter:
+    __request_listener: Union[_RequestListener, None] = None
+    __rate_limiter: Union[TokenBucket, None] = None
+    __session = _create_session()
+    # error and expiry by (server, forecast type, entity) of the entities Home Assistant refused a forecast type for
+    __refused: Dict[Tuple[str, str, str], Tuple[RequestError, float]] = {}
+
+    @staticmethod
+    def set_request_listener(listener: Union[_RequestListener, None]) -> None:
+        # called as listener(method, url, status_code, elapsed_seconds) after every attempt, status -1 on failure
+        HomeAssistantAdapter.__request_listener = listener
+
+    @staticmethod
+    def set_rate_limiter(limiter: Union[TokenBucket, None]) -> None:
+        # every attempt takes a token; 429 and ip-ban answers block the limiter for all processes of the device
+        HomeAssistantAdapter.__rate_limiter = limiter
+
+    @staticmethod
+    def retry_after(value: Union[str, None], now: datetime, default: float = _DEFAULT_RETRY_AFTER) -> float:
+        # Retry-After is either delta-seconds or an HTTP-date
+        if not value:
+            return default
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, (parsedate_to_datetime(value) - now).total_seconds())
+        except (TypeError, ValueError):
+            return default
+
+    @staticmethod
+    def notify_request_listener(method: str, url: str, status_code: int, started: float) -> None:
+        # shared with the other request sources, e.g. the relay client
+        if HomeAssistantAdapter.__request_listener is not None:
+            HomeAssistantAdapter.__request_listener(method, url, status_code, time.perf_counter() - started)
+
     @staticmethod
     def __make_headers_from_token(token: str) -> Dict[str, str]:
         return {"Authorization": f"Bearer {token}", "Content-Type": "application/json"}
 
     @staticmethod
     def __request(url: str, token: str, post: bool = False,
-                  data: Union[Dict[str, str], None] = None, check_ssl = True, request_attempts = 5) -> requests.Response:
+                  data: Union[Dict[str, str], None] = None, check_ssl = True, request_attempts = 5,
+                  cancellation: Union[CancellationToken, None] = None,
+                  params: Union[Dict[str, Any], None] = None) -> requests.Response:
+        # params go into the query string of a POST, a GET sends data there
         err_code_received = -1
         err_msg = "Unknown error"
         default_request_attempts = 5
@@ -33,43 +102,73 @@ class HomeAssistantAdapter:
             request_attempts = default_request_attempts
         except ValueError:
             request_attempts = default_request_attempts
+        method = "POST" if post else "GET"
         for i in range(request_attempts):
+            timeout = None
+            if cancellation is not None:
+                # checked before every attempt, so a retry never starts after shutdown or past the deadline
+                cancellation.raise_if_cancelled()
+            if HomeAssistantAdapter.__rate_limiter is not None:
+                HomeAssistantAdapter.__rate_limiter.acquire(cancellation=cancellation)
+            if cancellation is not None:
+                # the budget may have run out waiting for the rate limiter
+                cancellation.raise_if_cancelled()
+                timeout = cancellation.timeout()
+            started = time.perf_counter()
             try:
                 if post:
                     if not is_http:
                         # HTTPS
-                        r = requests.post(
+                        r = HomeAssistantAdapter.__session.post(
                             url=url, headers=HomeAssistantAdapter.__make_headers_from_token(token=token), json=data,
-                            params={"return_response": True}, verify=check_ssl
+                            params=params, verify=check_ssl, timeout=timeout
                         )
                     else:
                         # HTTP
-                        r = requests.post(
+                        r = HomeAssistantAdapter.__session.post(
                             url=url, headers=HomeAssistantAdapter.__make_headers_from_token(token=token), json=data,
-                            params={"return_response": True}
+                            params=params, timeout=timeout
                         )
                 else:
                     if not is_http:
                         # HTTPS
-                        r = requests.get(
-                            url=url, headers=HomeAssistantAdapter.__make_headers_from_token(token=token), params=data, verify=check_ssl
+                        r = HomeAssistantAdapter.__session.get(
+                            url=url, headers=HomeAssistantAdapter.__make_headers_from_token(token=token), params=data, verify=check_ssl, timeout=timeout
                         )
                     else:
                         # HTTP
-                         r = requests.get(
-                            url=url, headers=HomeAssistantAdapter.__make_headers_from_token(token=token), params=data
+                         r = HomeAssistantAdapter.__session.get(
+                            url=url, headers=HomeAssistantAdapter.__make_headers_from_token(token=token), params=data, timeout=timeout
                         )
+                HomeAssistantAdapter.notify_request_listener(method, url, r.status_code, started)
                 if r.ok:
                     return r
             except RequestException:
                 #raise RequestError(error_code=-1, url=url, method="POST" if post else "GET", body="")
+                HomeAssistantAdapter.notify_request_listener(method, url, -1, started)
                 err_code_received = -1
                 err_msg = "Unknown error"
+                continue
             if not r.ok:
                 #raise RequestError(error_code=r.status_code, url=url, method="POST" if post else "GET", body=r.text)
                 err_code_received = r.status_code
                 err_msg = r.text
-        raise RequestError(error_code=err_code_received, url=url, method="POST" if post else "GET", body=err_msg)
+                if r.status_code == 429:
+                    if HomeAssistantAdapter.__rate_limiter is not None:
+                        HomeAssistantAdapter.__rate_limiter.block(HomeAssistantAdapter.retry_after(
+                            value=r.headers.get("Retry-After"), now=datetime.now(tz=timezone.utc)
+                        ))
+                    break
+                if r.status_code == 403:
+                    # Home Assistant's ip-ban answers every request of a banned address with 403
+                    if HomeAssistantAdapter.__rate_limiter is not None:
+                        HomeAssistantAdapter.__rate_limiter.block(_BAN_BACKOFF)
+                    break
+                if r.status_code == 401:
+                    break   # retrying a wrong token only counts towards Home Assistant's ip-ban threshold
+        if cancellation is not None:
+            cancellation.raise_if_cancelled()   # a timed out last attempt is a cut, not a server error
+        raise RequestError(error_code=err_code_received, url=url, method=method, body=err_msg)
         #return False
 
     @staticmethod
@@ -126,57 +225,255 @@ class HomeAssistantAdapter:
         return output_attributes
 
     @staticmethod
-    def get_forecast(server_url: str, entity_id: str, token: str, check_ssl: bool, request_attempts: int) -> HomeAssistantForecast:
-        # Based on Home Assistant's WeatherEntityFeature IntFlag
-        FORECAST_DAILY = 1
-        FORECAST_HOURLY = 2
+    def truncate_to_horizon(entries: List[dict], horizon: Union[int, None], slot_length: timedelta,
+                            now: datetime) -> Tuple[List[dict], int]:
+        # works on the raw decoded entries so that dropped ones never reach filtering, dataclasses or conversion
+        kept = []
+        for entry in entries:
+            if horizon is not None and len(kept) >= horizon:
+                break
+            try:
+                if datetime.fromisoformat(entry["datetime"]) + slot_length <= now:
+                    continue
+            except (KeyError, TypeError, ValueError):
+                pass    # let the regular decoding deal with malformed entries
+            kept.append(entry)
+        return kept, len(entries) - len(kept)
 
+    @staticmethod
+    def get_current_forecast(server_url: str, entity_id: str, token: str, check_ssl: bool,
+                             request_attempts: int,
+                             cancellation: Union[CancellationToken, None] = None) -> HomeAssistantCurrentForecast:
         current_url = urllib.parse.urljoin(base=server_url, url=f"/api/states/{entity_id}")
-        forecast_url = urllib.parse.urljoin(base=server_url, url="/api/services/weather/get_forecasts")
+        current = HomeAssistantAdapter.__request(url=current_url, token=token, check_ssl=check_ssl, request_attempts=request_attempts, cancellation=cancellation)
+        return HomeAssistantAdapter.__current_from_state(current.json())
 
-        current = HomeAssistantAdapter.__request(url=current_url, token=token, check_ssl=check_ssl, request_attempts=request_attempts)
-        current_json = current.json()
+    @staticmethod
+    def __current_from_state(current_json: dict) -> HomeAssistantCurrentForecast:
         current_forecast_attributes = HomeAssistantAdapter.filter_attributes(current_json["attributes"], 'current')
         current_forecast_attributes['condition'] = current_json['state']
-        supported_features = current_json.get("attributes", {}).get("supported_features", 0)
-        if supported_features is None:
-            supported_features = 0
+        current_forecast_attributes['last_updated'] = current_json.get('last_updated')
+        if current_forecast_attributes['supported_features'] is None:
+            current_forecast_attributes['supported_features'] = 0
+        return HomeAssistantCurrentForecast(**current_forecast_attributes)
 
-        hourly_forecast_attributes = []
-        if supported_features & FORECAST_HOURLY:
+    @staticmethod
+    def __get_forecast_entries(server_url: str, entity_id: str, token: str, check_ssl: bool, request_attempts: int,
+                               forecast_type: str, horizon: Union[int, None], slot_length: timedelta,
+                               cancellation: Union[CancellationToken, None]) -> Tuple[List[dict], int]:
+        forecast_url = urllib.parse.urljoin(base=server_url, url="/api/services/weather/get_forecasts")
+        response = HomeAssistantAdapter.__request(
+            url=forecast_url, token=token, post=True, data={"entity_id": entity_id, "type": forecast_type}, check_ssl=check_ssl, request_attempts=request_attempts,
+            cancellation=cancellation, params=_SERVICE_RESPONSE
+        )
+        entries, skipped = HomeAssistantAdapter.truncate_to_horizon(
+            entries=response.json()["service_response"][entity_id]["forecast"], horizon=horizon,
+            slot_length=slot_length, now=datetime.now(tz=timezone.utc)
+        )
+        return entries, skipped
+
+    @staticmethod
+    def __get_batched_forecast_entries(server_url: str, horizons: Dict[str, Union[int, None]], token: str,
+                                       check_ssl: bool, request_attempts: int, forecast_type: str,
+                                       slot_length: timedelta,
+                                       cancellation: Union[CancellationToken, None]) -> Dict[str, _EntriesResult]:
+        forecast_url = urllib.parse.urljoin(base=server_url, url="/api/services/weather/get_forecasts")
+        results: Dict[str, _EntriesResult] = {}
+        # an entity that failed a batch before would fail every batch it is in again, it gets its error right away
+        for entity_id in horizons:
+            refused = HomeAssistantAdapter.__refused.get((server_url, forecast_type, entity_id))
+            if refused is not None and refused[1] > time.monotonic():
+                results[entity_id] = refused[0]
+        horizons = {entity_id: horizon for entity_id, horizon in horizons.items() if entity_id not in results}
+        if not horizons:
+            return results
+        try:
+            response = HomeAssistantAdapter.__request(
+                url=forecast_url, token=token, post=True, data={"entity_id": list(horizons), "type": forecast_type},
+                check_ssl=check_ssl, request_attempts=request_attempts, cancellation=cancellation,
+                params=_SERVICE_RESPONSE
+            )
+        except RequestError as e:
+            if len(horizons) == 1 or e.error_code not in _ENTITY_ERRORS:
+                raise
+            # one request per entity, so that the entity Home Assistant refused doesn't fail the others; it is
+            # remembered, so that the next batches go out in one request again
+            for entity_id, horizon in horizons.items():
+                try:
+                    results[entity_id] = HomeAssistantAdapter.__get_forecast_entries(
+                        server_url=server_url, entity_id=entity_id, token=token, check_ssl=check_ssl,
+                        request_attempts=request_attempts, forecast_type=forecast_type, horizon=horizon,
+                        slot_length=slot_length, cancellation=cancellation
+                    )
+                except RequestError as error:
+                    results[entity_id] = error
+                    if error.error_code in _ENTITY_ERRORS:
+                        HomeAssistantAdapter.__refused[(server_url, forecast_type, entity_id)] = (
+                            error, time.monotonic() + _REFUSED_FOR
+                        )
+            return results
+        service_response = response.json()["service_response"]
+        now = datetime.now(tz=timezone.utc)
+        for entity_id, horizon in horizons.items():
             try:
-                hourly = HomeAssistantAdapter.__request(
-                    url=forecast_url, token=token, post=True, data={"entity_id": entity_id, "type": "hourly"}, check_ssl=check_ssl, request_attempts=request_attempts
+                entries = service_response[entity_id]["forecast"]
+            except (KeyError, TypeError):
+                results[entity_id] = RequestError(
+                    error_code=response.status_code, url=forecast_url, method="POST",
+                    body=f"No {forecast_type} forecast of {entity_id} in the response"
+                )
+                continue
+            results[entity_id] = HomeAssistantAdapter.truncate_to_horizon(
+                entries=entries, horizon=horizon, slot_length=slot_length, now=now
+            )
+        return results
+
+    @staticmethod
+    def __hourly_entries(entries: List[dict], views: bool) -> List[HomeAssistantHourlyForecast]:
+        # views=True wraps the decoded entries instead of copying them into dataclasses
+        if views:
+            return [HomeAssistantHourlyForecastView(entry) for entry in entries]
+        return [HomeAssistantHourlyForecast(**HomeAssistantAdapter.filter_attributes(entry, 'hourly')) for entry in entries]
+
+    @staticmethod
+    def __daily_entries(entries: List[dict], views: bool) -> List[HomeAssistantDailyForecast]:
+        if views:
+            return [HomeAssistantDailyForecastView(entry) for entry in entries]
+        return [HomeAssistantDailyForecast(**HomeAssistantAdapter.filter_attributes(entry, 'daily')) for entry in entries]
+
+    @staticmethod
+    def get_hourly_forecast(server_url: str, entity_id: str, token: str, check_ssl: bool, request_attempts: int,
+                            horizon: Union[int, None] = None, cancellation: Union[CancellationToken, None] = None,
+                            views: bool = False) -> Tuple[List[HomeAssistantHourlyForecast], int]:
+        entries, skipped = HomeAssistantAdapter.__get_forecast_entries(
+            server_url=server_url, entity_id=entity_id, token=token, check_ssl=check_ssl,
+            request_attempts=request_attempts, forecast_type='hourly', horizon=horizon, slot_length=timedelta(hours=1),
+            cancellation=cancellation
+        )
+        return HomeAssistantAdapter.__hourly_entries(entries=entries, views=views), skipped
+
+    @staticmethod
+    def get_hourly_forecasts(server_url: str, horizons: Dict[str, Union[int, None]], token: str, check_ssl: bool,
+                             request_attempts: int, cancellation: Union[CancellationToken, None] = None,
+                             views: bool = False) \
+            -> Dict[str, Union[Tuple[List[HomeAssistantHourlyForecast], int], RequestError]]:
+        # one request for the entities given with their horizons; an entity Home Assistant has no forecast for gets
+        # its RequestError instead of failing the others
+        results = HomeAssistantAdapter.__get_batched_forecast_entries(
+            server_url=server_url, horizons=horizons, token=token, check_ssl=check_ssl,
+            request_attempts=request_attempts, forecast_type='hourly', slot_length=timedelta(hours=1),
+            cancellation=cancellation
+        )
+        return {
+            entity_id: result if isinstance(result, RequestError)
+            else (HomeAssistantAdapter.__hourly_entries(entries=result[0], views=views), result[1])
+            for entity_id, result in results.items()
+        }
+
+    @staticmethod
+    def get_daily_forecast(server_url: str, entity_id: str, token: str, check_ssl: bool, request_attempts: int,
+                           horizon: Union[int, None] = None, cancellation: Union[CancellationToken, None] = None,
+                           views: bool = False) -> Tuple[List[HomeAssistantDailyForecast], int]:
+        entries, skipped = HomeAssistantAdapter.__get_forecast_entries(
+            server_url=server_url, entity_id=entity_id, token=token, check_ssl=check_ssl,
+            request_attempts=request_attempts, forecast_type='daily', horizon=horizon, slot_length=timedelta(days=1),
+            cancellation=cancellation
+        )
+        return HomeAssistantAdapter.__daily_entries(entries=entries, views=views), skipped
+
+    @staticmethod
+    def get_daily_forecasts(server_url: str, horizons: Dict[str, Union[int, None]], token: str, check_ssl: bool,
+                            request_attempts: int, cancellation: Union[CancellationToken, None] = None,
+                            views: bool = False) \
+            -> Dict[str, Union[Tuple[List[HomeAssistantDailyForecast], int], RequestError]]:
+        results = HomeAssistantAdapter.__get_batched_forecast_entries(
+            server_url=server_url, horizons=horizons, token=token, check_ssl=check_ssl,
+            request_attempts=request_attempts, forecast_type='daily', slot_length=timedelta(days=1),
+            cancellation=cancellation
+        )
+        return {
+            entity_id: result if isinstance(result, RequestError)
+            else (HomeAssistantAdapter.__daily_entries(entries=result[0], views=views), result[1])
+            for entity_id, result in results.items()
+        }
+
+    @staticmethod
+    def get_forecast(server_url: str, entity_id: str, token: str, check_ssl: bool, request_attempts: int,
+                     hourly_horizon: Union[int, None] = None, daily_horizon: Union[int, None] = None,
+                     cancellation: Union[CancellationToken, None] = None) -> HomeAssistantForecast:
+        current = HomeAssistantAdapter.get_current_forecast(
+            server_url=server_url, entity_id=entity_id, token=token, check_ssl=check_ssl,
+            request_attempts=request_attempts, cancellation=cancellation
+        )
+
+        hourly, skipped_hourly = [], 0
+        if current.supported_features & HomeAssistantWeatherFeature.FORECAST_HOURLY:
+            try:
+                hourly, skipped_hourly = HomeAssistantAdapter.get_hourly_forecast(
+                    server_url=server_url, entity_id=entity_id, token=token, check_ssl=check_ssl,
+                    request_attempts=request_attempts, horizon=hourly_horizon, cancellation=cancellation
                 )
-                hourly_forecast_attributes = [HomeAssistantAdapter.filter_attributes(hourly_forecast, 'hourly') for hourly_forecast in hourly.json()["service_response"][entity_id]["forecast"]]
             except RequestError:
-                hourly_forecast_attributes = []
+                hourly = []
 
-        daily_forecast_attributes = []
-        if supported_features & FORECAST_DAILY:
+        daily, skipped_daily = [], 0
+        if current.supported_features & HomeAssistantWeatherFeature.FORECAST_DAILY:
             try:
-                daily = HomeAssistantAdapter.__request(
-                    url=forecast_url, token=token, post=True, data={"entity_id": entity_id, "type": "daily"}, check_ssl=check_ssl, request_attempts=request_attempts
+                daily, skipped_daily = HomeAssistantAdapter.get_daily_forecast(
+                    server_url=server_url, entity_id=entity_id, token=token, check_ssl=check_ssl,
+                    request_attempts=request_attempts, horizon=daily_horizon, cancellation=cancellation
                 )
-                daily_forecast_attributes = [HomeAssistantAdapter.filter_attributes(daily_forecast, 'daily') for daily_forecast in daily.json()["service_response"][entity_id]["forecast"]]
             except RequestError:
-                daily_forecast_attributes = []
+                daily = []
 
         return HomeAssistantForecast(
-            current=HomeAssistantCurrentForecast(**current_forecast_attributes),
-            hourly=[
-                HomeAssistantHourlyForecast(**hourly_forecast)
-                for hourly_forecast in hourly_forecast_attributes
-            ],
-            daily=[
-                HomeAssistantDailyForecast(**daily_forecast)
-                for daily_forecast in daily_forecast_attributes
-            ],
+            current=current,
+            hourly=hourly,
+            daily=daily,
+            skipped_hourly=skipped_hourly,
+            skipped_daily=skipped_daily,
         )
 
     @staticmethod
-    def get_sun_info(server_url: str, entity_id: str, token: str, check_ssl: bool, request_attempts: int) -> HomeAssistantSunInfo:
+    def get_sensor_states(server_url: str, entity_ids: List[str], token: str, check_ssl: bool, request_attempts: int,
+                          cancellation: Union[CancellationToken, None] = None) -> Dict[str, HomeAssistantSensorState]:
+        # state and unit of the entities in one request, through the states API any user's token may read (the
+        # template API would need an admin). A single sensor is read on its own, several are filtered out of
+        # /api/states. An entity Home Assistant doesn't know reads as unavailable.
+        missing = HomeAssistantSensorState(state=None, unit=None)
+        if len(entity_ids) == 1:
+            entity_id = entity_ids[0]
+            try:
+                response = HomeAssistantAdapter.__request(
+                    url=urllib.parse.urljoin(base=server_url, url=f"/api/states/{entity_id}"), token=token,
+                    check_ssl=check_ssl, request_attempts=request_attempts, cancellation=cancellation
+                )
+            except RequestError as e:
+                if e.error_code != 404:
+                    raise
+                return {entity_id: missing}
+            states = [response.json()]
+        else:
+            response = HomeAssistantAdapter.__request(
+                url=urllib.parse.urljoin(base=server_url, url="/api/states"), token=token, check_ssl=check_ssl,
+                request_attempts=request_attempts, cancellation=cancellation
+            )
+            states = response.json()
+        try:
+            found = {
+                state["entity_id"]: HomeAssistantSensorState(
+                    state=state.get("state"), unit=(state.get("attributes") or {}).get("unit_of_measurement")
+                )
+                for state in states if state.get("entity_id") in entity_ids
+            }
+        except (AttributeError, TypeError):
+            raise RequestError(error_code=response.status_code, url=response.url, method="GET", body=response.text)
+        return {entity_id: found.get(entity_id, missing) for entity_id in entity_ids}
+
+    @staticmethod
+    def get_sun_info(server_url: str, entity_id: str, token: str, check_ssl: bool, request_attempts: int,
+                     cancellation: Union[CancellationToken, None] = None) -> HomeAssistantSunInfo:
         sun_url = urllib.parse.urljoin(base=server_url, url=f"/api/states/{entity_id}")
-        sun = HomeAssistantAdapter.__request(url=sun_url, token=token, check_ssl=check_ssl, request_attempts=request_attempts)
+        sun = HomeAssistantAdapter.__request(url=sun_url, token=token, check_ssl=check_ssl, request_attempts=request_attempts, cancellation=cancellation)
         sun_data = sun.json()
         return HomeAssistantSunInfo(**sun_data["attributes"], state=HomeAssistantSunState(sun_data["state"]))
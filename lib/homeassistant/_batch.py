@@ -0,0 +1,83 @@
+import threading
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, Hashable, List, Tuple, Union
+
+from ._errors import RequestError
+
+_Horizons = Dict[str, Union[int, None]]
+_Fetch = Callable[[_Horizons], Dict[str, Union[Tuple[list, int], RequestError]]]
+
+
+class HomeAssistantForecastBatch:
+    """One forecast series (hourly or daily) of the locations refreshed together, fetched in a single request.
+
+    Every participant either requests its entity or declines, exactly once; the request goes out when the last one has
+    done so. Each participant gets a future of its own (entries, skipped), or the RequestError of its entity alone.
+    fetch takes the horizon by entity id, e.g. HomeAssistantAdapter.get_hourly_forecasts."""
+
+    def __init__(self, participants: int, fetch: _Fetch) -> None:
+        self._fetch = fetch
+        self._lock = threading.Lock()
+        self._waiting = participants
+        self._horizons: _Horizons = {}
+        self._requests: List[Tuple[str, Union[int, None], Future]] = []
+
+    def request(self, entity_id: str, horizon: Union[int, None]) -> Future:
+        future = Future()
+        with self._lock:
+            # locations sharing an entity share its entries as well, fetched for the longest horizon
+            if entity_id in self._horizons:
+                known = self._horizons[entity_id]
+                horizon_needed = None if known is None or horizon is None else max(known, horizon)
+            else:
+                horizon_needed = horizon
+            self._horizons[entity_id] = horizon_needed
+            self._requests.append((entity_id, horizon, future))
+        self.__arrive()
+        return future
+
+    def decline(self) -> None:
+        self.__arrive()
+
+    def __arrive(self) -> None:
+        with self._lock:
+            if self._waiting <= 0:
+                return
+            self._waiting -= 1
+            if self._waiting or not self._requests:
+                return
+        # the last participant to arrive doesn't wait for the request of all the others
+        threading.Thread(target=self.__send, daemon=True).start()
+
+    def __send(self) -> None:
+        try:
+            results = self._fetch(self._horizons)
+        except Exception as e:  # a failed request or a cut fails everyone waiting for it
+            for _, _, future in self._requests:
+                future.set_exception(e)
+            return
+        for entity_id, horizon, future in self._requests:
+            result = results[entity_id]
+            if isinstance(result, RequestError):
+                future.set_exception(result)
+                continue
+            entries, skipped = result
+            if horizon is not None and len(entries) > horizon:
+                entries, skipped = entries[:horizon], skipped + len(entries) - horizon
+            future.set_result((entries, skipped))
+
+
+class HomeAssistantSharedRequests:
+    """Requests the locations refreshed together would all send alike, e.g. the sun entity of their server: the first
+    location to submit one sends it on its own pool, the others get the same future."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._futures: Dict[Hashable, Future] = {}
+
+    def submit(self, key: Hashable, pool: Executor, fetch: Callable[..., Any], **kwargs) -> Future:
+        with self._lock:
+            future = self._futures.get(key)
+            if future is None:
+                future = self._futures[key] = pool.submit(fetch, **kwargs)
+        return future
@@ -7,3 +7,9 @@ class RequestError(Exception):
     url: str
     method: str
     body: str
+
+
+@dataclass
+class SnapshotError(Exception):
+    path: str
+    reason: str
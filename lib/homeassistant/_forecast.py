@@ -1,7 +1,9 @@
 from dataclasses import dataclass
-from enum import Enum
+from enum import Enum, IntFlag
 from typing import List, Union
 
+from lib.util.slots import dataclass_slots
+
 
 class HomeAssistantWeatherCondition(str, Enum):
     CLEAR_NIGHT = "clear-night"
@@ -21,14 +23,23 @@ class HomeAssistantWeatherCondition(str, Enum):
     EXCEPTIONAL = "exceptional"
 
 
+class HomeAssistantWeatherFeature(IntFlag):
+    # Based on Home Assistant's WeatherEntityFeature IntFlag
+    FORECAST_DAILY = 1
+    FORECAST_HOURLY = 2
+    FORECAST_TWICE_DAILY = 4
+
+
 @dataclass
 class _HomeAssistantForecastCommon:
+    __slots__ = ()
     wind_bearing: float
     wind_speed: float
     temperature: float
     humidity: float
 
 
+@dataclass_slots
 @dataclass
 class HomeAssistantForecastMeta:
     temperature_unit: str
@@ -43,6 +54,7 @@ class HomeAssistantForecastMeta:
 
 @dataclass
 class _HomeAssistantFutureForecast:
+    __slots__ = ()
     condition: HomeAssistantWeatherCondition
     datetime: str
     precipitation: float
@@ -51,6 +63,7 @@ class _HomeAssistantFutureForecast:
         self.condition = HomeAssistantWeatherCondition(self.condition)
 
 
+@dataclass_slots
 @dataclass
 class HomeAssistantCurrentForecast(_HomeAssistantForecastCommon, HomeAssistantForecastMeta):
     condition: HomeAssistantWeatherCondition
@@ -58,25 +71,31 @@ class HomeAssistantCurrentForecast(_HomeAssistantForecastCommon, HomeAssistantFo
     cloud_coverage: float
     pressure: float
     uv_index: float
+    last_updated: Union[str, None] = None
 
     def __post_init__(self):
         self.condition = HomeAssistantWeatherCondition(self.condition)
 
 
+@dataclass_slots
 @dataclass
 class HomeAssistantHourlyForecast(_HomeAssistantForecastCommon, _HomeAssistantFutureForecast):
     cloud_coverage: float
     uv_index: float
 
 
+@dataclass_slots
 @dataclass
 class HomeAssistantDailyForecast(_HomeAssistantForecastCommon, _HomeAssistantFutureForecast):
     templow: float
     uv_index: Union[float, None] = None
 
 
+@dataclass_slots
 @dataclass
 class HomeAssistantForecast:
     current: HomeAssistantCurrentForecast
     hourly: List[HomeAssistantHourlyForecast]
     daily: List[HomeAssistantDailyForecast]
+    skipped_hourly: int = 0     # entries dropped before "now" or past the configured horizon
+    skipped_daily: int = 0
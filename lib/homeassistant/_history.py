@@ -0,0 +1,251 @@
+import bisect
+import json
+import os
+import struct
+import time
+import zlib
+from collections import abc
+from datetime import datetime, timezone
+from enum import IntEnum
+from typing import Callable, Dict, Iterable, List, Sequence, Union
+
+from lib.util.cancellation import CancellationToken
+from lib.util.single_flight import SingleFlight
+
+from ._forecast import HomeAssistantCurrentForecast, HomeAssistantHourlyForecast, HomeAssistantDailyForecast
+from ._snapshot import _CONDITIONS, _CONDITION_CODES, _pack_datetime, _pack_value, _unpack_value
+
+# One segment file per UTC day of the flush, fixed-width little-endian records appended in batches:
+#   recorded_at i64, valid_at i64, entity crc32, kind, condition code, float32 columns (NaN = missing)
+_RECORD = struct.Struct("<qqIBBxx10f")
+_COLUMNS = ("temperature", "templow", "humidity", "dew_point", "pressure", "wind_speed", "wind_bearing",
+            "precipitation", "cloud_coverage", "uv_index")
+_SEGMENT_SUFFIX = ".seg"
+_INDEX_FILE = "index.json"
+_LOCK_FILE = "history.lock"
+_NO_CONDITION = 0xFF
+
+
+class HomeAssistantHistoryKind(IntEnum):
+    OBSERVATION = 0     # current conditions, valid_at is the time Home Assistant last updated them
+    HOURLY = 1          # issued forecast, valid_at is the forecast slot
+    DAILY = 2
+
+
+def _entity_hash(entity_id: str) -> int:
+    return zlib.crc32(entity_id.encode("utf-8"))
+
+
+class HomeAssistantForecastHistory:
+    """Append-only archive of observed current conditions and issued forecasts in the add-on profile.
+
+    Records are buffered until flush(), which appends the whole batch to the segment of the current day with a single
+    fsync. Segments are dropped oldest first once there are more days or bytes than the retention allows. index.json
+    keeps the time range of every segment for range queries; it is only a cache and is rebuilt from the segments if
+    it's missing or doesn't match them."""
+
+    LOCK_LEASE = 10.0
+    # a lease held past its term is broken by the next acquire, so waiting any longer than that never helps
+    LOCK_WAIT = LOCK_LEASE + 1.0
+
+    def __init__(self, directory: str, retention_days: int, max_bytes: int,
+                 clock: Callable[[], float] = time.time,
+                 sleep: Callable[[float], bool] = lambda seconds: time.sleep(seconds) or False) -> None:
+        # sleep returns True to give up waiting for the lock, e.g. when Kodi shuts down
+        self.directory = directory
+        self.retention_days = retention_days
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._sleep = sleep
+        self._pending: List[bytes] = []
+        self._lock = SingleFlight(
+            path=os.path.join(directory, _LOCK_FILE), lease=self.LOCK_LEASE, poll_interval=0.05, clock=clock
+        )
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def record_current(self, entity_id: str, current: HomeAssistantCurrentForecast) -> None:
+        recorded_at = int(self._clock())
+        valid_at = recorded_at
+        if current.last_updated:
+            try:
+                valid_at = _pack_datetime(current.last_updated)[0]
+            except ValueError:
+                pass
+        self.__add(recorded_at, valid_at, entity_id, HomeAssistantHistoryKind.OBSERVATION, current.condition, current)
+
+    def record_forecast(self, entity_id: str, kind: HomeAssistantHistoryKind,
+                        entries: Iterable[Union[HomeAssistantHourlyForecast, HomeAssistantDailyForecast]]) -> None:
+        recorded_at = int(self._clock())
+        for entry in entries:
+            try:
+                valid_at = _pack_datetime(entry.datetime)[0]
+            except (TypeError, ValueError):
+                continue
+            self.__add(recorded_at, valid_at, entity_id, kind, entry.condition, entry)
+
+    def __add(self, recorded_at: int, valid_at: int, entity_id: str, kind: HomeAssistantHistoryKind,
+              condition: Union[str, None], values: object) -> None:
+        try:
+            record = _RECORD.pack(
+                recorded_at, valid_at, _entity_hash(entity_id), kind,
+                _CONDITION_CODES.get(condition, _NO_CONDITION) if condition is not None else _NO_CONDITION,
+                *(_pack_value(getattr(values, column, None)) for column in _COLUMNS)
+            )
+        except struct.error:
+            return  # e.g. a textual wind bearing, not worth losing the rest of the batch for
+        self._pending.append(record)
+
+    def flush(self, cancellation: Union[CancellationToken, None] = None) -> int:
+        # appends everything recorded since the last flush, returns the number of records written. If another process
+        # holds the archive for too long, or the wait is cancelled, the records stay pending for the next flush.
+        if not self._pending:
+            return 0
+        os.makedirs(self.directory, exist_ok=True)
+        token = self.__acquire(cancellation=cancellation)
+        if token is None:
+            return 0
+        try:
+            batch, self._pending = self._pending, []
+            index = self.__load_index()
+            name = datetime.fromtimestamp(self._clock(), tz=timezone.utc).strftime("%Y-%m-%d") + _SEGMENT_SUFFIX
+            path = os.path.join(self.directory, name)
+            with open(path, "ab") as f:
+                # a crash may have left half a record at the end, records must stay aligned
+                size = f.seek(0, os.SEEK_END)
+                if size % _RECORD.size:
+                    f.truncate(size - size % _RECORD.size)
+                    f.seek(0, os.SEEK_END)
+                f.write(b"".join(batch))
+                f.flush()
+                os.fsync(f.fileno())
+            times = [_RECORD.unpack_from(record)[0] for record in batch]
+            entry = index.get(name)
+            if not entry or not entry["count"] or entry["count"] * _RECORD.size != size - size % _RECORD.size:
+                entry = self.__scan(path)
+            else:
+                entry = {
+                    "first": min(entry["first"], *times), "last": max(entry["last"], *times),
+                    "count": entry["count"] + len(batch),
+                    "sorted": entry["sorted"] and entry["last"] <= times[0] and times == sorted(times),
+                }
+            index[name] = entry
+            self.__enforce_retention(index=index, today=name)
+            self.__save_index(index)
+            return len(batch)
+        finally:
+            self._lock.release(token=token, key="history", completed=False)
+
+    def __acquire(self, cancellation: Union[CancellationToken, None]) -> Union[str, None]:
+        # always tried once, a refresh cut short still gets its records out while nobody else holds the archive
+        deadline = time.monotonic() + self.LOCK_WAIT
+        while True:
+            token = self._lock.acquire(key="history")
+            if token is not None or time.monotonic() >= deadline:
+                return token
+            if cancellation is not None and cancellation.cancelled:
+                return None
+            if self._sleep(self._lock.poll_interval):
+                return None
+
+    def query(self, start: float, end: float, entity_id: Union[str, None] = None,
+              kinds: Union[Sequence[HomeAssistantHistoryKind], None] = None) -> Dict[str, list]:
+        # columns of every record recorded within [start, end), in segment order
+        columns: Dict[str, list] = {name: [] for name in ("recorded_at", "valid_at", "kind", "condition", *_COLUMNS)}
+        entity = _entity_hash(entity_id) if entity_id is not None else None
+        index = self.__load_index()
+        for name in sorted(index):
+            entry = index[name]
+            if entry["count"] == 0 or entry["last"] < start or entry["first"] >= end:
+                continue
+            try:
+                with open(os.path.join(self.directory, name), "rb") as f:
+                    content = f.read(entry["count"] * _RECORD.size)
+            except OSError:
+                continue
+            count = len(content) // _RECORD.size
+            first, last = 0, count
+            if entry["sorted"]:
+                times = _RecordTimes(content, count)
+                first, last = bisect.bisect_left(times, start), bisect.bisect_left(times, end)
+            for i in range(first, last):
+                recorded_at, valid_at, record_entity, kind, condition, *values = _RECORD.unpack_from(
+                    content, i * _RECORD.size
+                )
+                if not start <= recorded_at < end or (entity is not None and record_entity != entity):
+                    continue
+                if kinds is not None and kind not in kinds:
+                    continue
+                columns["recorded_at"].append(recorded_at)
+                columns["valid_at"].append(valid_at)
+                columns["kind"].append(HomeAssistantHistoryKind(kind))
+                columns["condition"].append(_CONDITIONS[condition] if condition < len(_CONDITIONS) else None)
+                for column, value in zip(_COLUMNS, values):
+                    columns[column].append(_unpack_value(value))
+        return columns
+
+    def __segments(self) -> List[str]:
+        try:
+            return sorted(name for name in os.listdir(self.directory) if name.endswith(_SEGMENT_SUFFIX))
+        except OSError:
+            return []
+
+    def __scan(self, path: str) -> Dict[str, Union[int, bool]]:
+        with open(path, "rb") as f:
+            content = f.read()
+        times = [recorded_at for recorded_at, *_ in _RECORD.iter_unpack(content[:len(content) - len(content) % _RECORD.size])]
+        return {
+            "first": min(times, default=0), "last": max(times, default=0), "count": len(times),
+            "sorted": times == sorted(times),
+        }
+
+    def __load_index(self) -> Dict[str, Dict[str, Union[int, bool]]]:
+        try:
+            with open(os.path.join(self.directory, _INDEX_FILE), "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = None
+        segments = self.__segments()
+        if not isinstance(index, dict) or sorted(index) != segments:
+            index = {name: self.__scan(os.path.join(self.directory, name)) for name in segments}
+        return index
+
+    def __save_index(self, index: Dict[str, Dict[str, Union[int, bool]]]) -> None:
+        path = os.path.join(self.directory, _INDEX_FILE)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(temporary_path, path)
+
+    def __enforce_retention(self, index: Dict[str, Dict[str, Union[int, bool]]], today: str) -> None:
+        # a ring buffer of segments: the oldest go first, the one just written always stays
+        cutoff = datetime.strptime(today[:-len(_SEGMENT_SUFFIX)], "%Y-%m-%d").toordinal() - self.retention_days
+        names = [name for name in sorted(index) if name != today]
+        size = sum(entry["count"] for entry in index.values()) * _RECORD.size
+        for name in names:
+            try:
+                expired = datetime.strptime(name[:-len(_SEGMENT_SUFFIX)], "%Y-%m-%d").toordinal() <= cutoff
+            except ValueError:
+                expired = True
+            if not expired and size <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            size -= index.pop(name)["count"] * _RECORD.size
+
+
+class _RecordTimes(abc.Sequence):
+    # recorded_at of every record, read on demand for bisect
+    def __init__(self, content: bytes, count: int) -> None:
+        self._content = content
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> int:
+        return _RECORD.unpack_from(self._content, index * _RECORD.size)[0]
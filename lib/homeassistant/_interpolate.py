@@ -0,0 +1,96 @@
+import bisect
+import dataclasses
+from datetime import datetime
+from typing import Callable, Iterable, List, Tuple, Union
+
+from ._forecast import HomeAssistantCurrentForecast, HomeAssistantHourlyForecast
+
+# scalar attributes of the current conditions that follow the hourly trend
+_LINEAR_FIELDS = ("temperature", "humidity", "wind_speed", "dew_point", "pressure", "cloud_coverage")
+
+
+class HomeAssistantCurrentInterpolator:
+    """Estimates the current conditions between two fetches from the last observation and the hourly forecast.
+
+    The observation is moved along the trend of the bracketing hourly entries, i.e. a value is the observed one plus
+    how much the linearly interpolated forecast changed since the fetch; the observation and the forecast rarely
+    agree, the offset between them is kept. The wind bearing turns along the shorter arc and the condition switches
+    to the one of the nearest hourly slot once that slot differs from the one of the fetch. The series has to be
+    sorted by time, like Home Assistant returns it; moments outside of it can't be estimated."""
+
+    def __init__(self, hourly: Iterable[HomeAssistantHourlyForecast]) -> None:
+        self._times: List[float] = []
+        self._entries: List[HomeAssistantHourlyForecast] = []
+        for entry in hourly:
+            try:
+                moment = datetime.fromisoformat(entry.datetime).timestamp()
+            except (TypeError, ValueError):
+                continue
+            self._times.append(moment)
+            self._entries.append(entry)
+
+    def estimate(self, current: HomeAssistantCurrentForecast, observed_at: float, now: float) \
+            -> Union[HomeAssistantCurrentForecast, None]:
+        # observed_at and now are epoch seconds; None if the series doesn't bracket both of them
+        if not (self.__brackets(observed_at) and self.__brackets(now)):
+            return None
+        changes = {}
+        for name in _LINEAR_FIELDS:
+            changes[name] = self.__shift(
+                observed=getattr(current, name), sample=lambda moment: self.__linear(moment, name),
+                observed_at=observed_at, now=now
+            )
+        if isinstance(current.wind_bearing, (int, float)):
+            start, end = self.__bearing(observed_at), self.__bearing(now)
+            if start is not None and end is not None:
+                changes["wind_bearing"] = round(current.wind_bearing + _turn(start, end)) % 360
+        slot = self.__nearest(now)
+        if slot != self.__nearest(observed_at) and self._entries[slot].condition is not None:
+            changes["condition"] = self._entries[slot].condition
+        return dataclasses.replace(current, **changes)
+
+    def __brackets(self, moment: float) -> bool:
+        return bool(self._times) and self._times[0] <= moment <= self._times[-1]
+
+    def __around(self, moment: float) \
+            -> Tuple[HomeAssistantHourlyForecast, HomeAssistantHourlyForecast, float]:
+        # the entries before and after the moment and how far between them it is
+        after = min(bisect.bisect_right(self._times, moment), len(self._times) - 1)
+        before = max(after - 1, 0)
+        span = self._times[after] - self._times[before]
+        fraction = (moment - self._times[before]) / span if span > 0 else 0.0
+        return self._entries[before], self._entries[after], fraction
+
+    def __linear(self, moment: float, name: str) -> Union[float, None]:
+        before, after, fraction = self.__around(moment)
+        start, end = getattr(before, name, None), getattr(after, name, None)
+        if start is None or end is None:
+            return None
+        return start + (end - start) * fraction
+
+    def __bearing(self, moment: float) -> Union[float, None]:
+        before, after, fraction = self.__around(moment)
+        start, end = before.wind_bearing, after.wind_bearing
+        if not isinstance(start, (int, float)) or not isinstance(end, (int, float)):
+            return None
+        return (start + _turn(start, end) * fraction) % 360
+
+    def __nearest(self, moment: float) -> int:
+        after = min(bisect.bisect_left(self._times, moment), len(self._times) - 1)
+        if after > 0 and moment - self._times[after - 1] <= self._times[after] - moment:
+            return after - 1
+        return after
+
+    @staticmethod
+    def __shift(observed: Union[float, None], sample: Callable[[float], Union[float, None]], observed_at: float,
+                now: float) -> Union[float, None]:
+        start, end = sample(observed_at), sample(now)
+        if observed is None or start is None or end is None:
+            return observed
+        # whole numbers stay whole, e.g. the humidity
+        return round(observed + end - start, None if isinstance(observed, int) else 1)
+
+
+def _turn(start: float, end: float) -> float:
+    # signed angle of the shorter arc from start to end, in -180..180
+    return (end - start + 180) % 360 - 180
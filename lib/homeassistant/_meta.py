@@ -0,0 +1,67 @@
+import threading
+from dataclasses import fields
+from typing import Dict, Tuple, Type
+
+from lib.unit.speed import Speed, SpeedUnits
+from lib.unit.temperature import Temperature, TemperatureUnits
+
+from ._forecast import HomeAssistantForecastMeta, HomeAssistantWeatherFeature
+
+# the metadata fields only, a current forecast carries its weather values as well
+_META_FIELDS = tuple(field.name for field in fields(HomeAssistantForecastMeta))
+
+
+def _meta_attributes(meta: HomeAssistantForecastMeta) -> tuple:
+    return tuple(getattr(meta, name) for name in _META_FIELDS)
+
+
+class HomeAssistantResolvedForecastMeta:
+    """The metadata of a weather entity with its unit strings resolved to unit classes, which convert a value by
+    calling them, and its supported features to flags; see HomeAssistantForecastMetaCache."""
+    __slots__ = ("attributes", "temperature_unit", "wind_speed_unit", "precipitation_unit", "pressure_unit",
+                 "has_hourly_forecast", "has_daily_forecast")
+
+    def __init__(self, meta: HomeAssistantForecastMeta) -> None:
+        self.attributes = _meta_attributes(meta)
+        self.temperature_unit: Type[Temperature] = TemperatureUnits[meta.temperature_unit]
+        self.wind_speed_unit: Type[Speed] = SpeedUnits[meta.wind_speed_unit]
+        self.precipitation_unit: str = meta.precipitation_unit
+        self.pressure_unit: str = meta.pressure_unit
+        features = meta.supported_features or 0
+        self.has_hourly_forecast = bool(features & HomeAssistantWeatherFeature.FORECAST_HOURLY)
+        self.has_daily_forecast = bool(features & HomeAssistantWeatherFeature.FORECAST_DAILY)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, HomeAssistantResolvedForecastMeta) and self.attributes == other.attributes
+
+    def __hash__(self) -> int:
+        return hash(self.attributes)
+
+    def __repr__(self) -> str:
+        return f"HomeAssistantResolvedForecastMeta{self.attributes!r}"
+
+
+class HomeAssistantForecastMetaCache:
+    """Resolved metadata by server and entity id. The metadata of an entity almost never changes: a states response
+    with the same attributes returns the cached instance, one with changed attributes replaces it."""
+
+    def __init__(self) -> None:
+        self._entries: Dict[Tuple[str, str], HomeAssistantResolvedForecastMeta] = {}
+        self._lock = threading.Lock()     # locations refresh in parallel
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, server_url: str, entity_id: str,
+                meta: HomeAssistantForecastMeta) -> HomeAssistantResolvedForecastMeta:
+        key = (server_url, entity_id)
+        attributes = _meta_attributes(meta)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached.attributes == attributes:
+                self.hits += 1
+                return cached
+            self.misses += 1
+        resolved = HomeAssistantResolvedForecastMeta(meta)
+        with self._lock:
+            self._entries[key] = resolved
+        return resolved
@@ -0,0 +1,94 @@
+import re
+from dataclasses import dataclass, replace
+from typing import Dict, List, Mapping, Tuple, Type, Union
+
+from lib.unit.speed import SpeedBft, SpeedFtps, SpeedInps, SpeedKph, SpeedKts, SpeedMph, SpeedMps
+from lib.unit.temperature import TemperatureCelsius, TemperatureFahrenheit, TemperatureKelvin
+
+from ._forecast import HomeAssistantCurrentForecast
+
+_ENTITY_ID = re.compile(r"^\w+\.\w+$")     # an entity id names a state, nothing else may
+_PERCENT = "%"
+
+# unit strings as Home Assistant reports them (UnitOfTemperature, UnitOfSpeed), which differ from the unit names of
+# lib.unit, e.g. "kn" for knots; units without a counterpart in lib.unit are left out and never converted
+_TEMPERATURE_UNITS: Mapping[str, Type] = {
+    "°C": TemperatureCelsius, "°F": TemperatureFahrenheit, "K": TemperatureKelvin,
+}
+_SPEED_UNITS: Mapping[str, Type] = {
+    "km/h": SpeedKph, "m/s": SpeedMps, "mph": SpeedMph, "kn": SpeedKts, "ft/s": SpeedFtps, "in/s": SpeedInps,
+    "Beaufort": SpeedBft,
+}
+
+
+@dataclass(frozen=True)
+class HomeAssistantSensorState:
+    state: Union[str, None]
+    unit: Union[str, None]      # unit_of_measurement, None if the sensor has none
+
+
+def _value(sensor: HomeAssistantSensorState) -> Union[float, None]:
+    # unavailable, unknown or missing sensors leave the value of the weather entity in place
+    try:
+        return float(sensor.state)
+    except (TypeError, ValueError):
+        return None
+
+
+def _convert(value: float, unit: Union[str, None], target: str, units: Mapping[str, Type]) -> Union[float, None]:
+    if unit is None or unit == target:
+        return value
+    if unit not in units or target not in units:
+        return None
+    return round(units[target].from_si_value(units[unit](value).si_value()).value, 2)
+
+
+def _same_unit(value: float, unit: Union[str, None], target: str) -> Union[float, None]:
+    return value if unit is None or unit == target else None
+
+
+# field of the current conditions: converts a sensor value with its unit into the unit of the weather entity
+_FIELDS = {
+    "temperature": lambda value, unit, current: _convert(value, unit, current.temperature_unit, _TEMPERATURE_UNITS),
+    "dew_point": lambda value, unit, current: _convert(value, unit, current.temperature_unit, _TEMPERATURE_UNITS),
+    "humidity": lambda value, unit, current: round(value) if unit in (None, _PERCENT) else None,
+    "wind_speed": lambda value, unit, current: _convert(value, unit, current.wind_speed_unit, _SPEED_UNITS),
+    # there are no pressure units to convert between, only a sensor reporting the unit of the entity is used
+    "pressure": lambda value, unit, current: _same_unit(value, unit, current.pressure_unit),
+}
+
+
+class HomeAssistantCurrentOverlay:
+    """Values of the current conditions taken from local sensors instead of the weather entity, e.g. the thermometer
+    on the balcony instead of a station of the weather provider miles away."""
+
+    FIELDS = tuple(_FIELDS)
+
+    def __init__(self, sensors: Mapping[str, str]) -> None:
+        # entity id of the sensor by field of HomeAssistantCurrentForecast, fields without a sensor are left out
+        for field, entity_id in sensors.items():
+            if field not in _FIELDS:
+                raise ValueError(f"No sensor overlay for {field}")
+            if not _ENTITY_ID.match(entity_id):
+                raise ValueError(f"Invalid entity id {entity_id!r}")
+        self.sensors = dict(sensors)
+
+    @property
+    def entity_ids(self) -> List[str]:
+        return sorted(set(self.sensors.values()))
+
+    def apply(self, current: HomeAssistantCurrentForecast, states: Mapping[str, HomeAssistantSensorState]) \
+            -> Tuple[HomeAssistantCurrentForecast, List[str]]:
+        # returns the merged conditions and the fields replaced; current itself is left alone
+        values: Dict[str, float] = {}
+        for field, entity_id in self.sensors.items():
+            sensor = states.get(entity_id)
+            value = _value(sensor) if sensor is not None else None
+            if value is None:
+                continue
+            converted = _FIELDS[field](value, sensor.unit, current)
+            if converted is not None:
+                values[field] = converted
+        if not values:
+            return current, []
+        return replace(current, **values), sorted(values)
@@ -0,0 +1,291 @@
+import hashlib
+import hmac
+import ipaddress
+import json
+import threading
+import time
+import urllib.parse
+from dataclasses import asdict, is_dataclass
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Tuple, Union
+
+import requests
+from requests import RequestException
+
+from lib.util.cancellation import CancellationToken
+
+from ._adapter import HomeAssistantAdapter
+from ._errors import RequestError
+from ._forecast import HomeAssistantCurrentForecast, HomeAssistantHourlyForecast, HomeAssistantDailyForecast
+from ._sun import HomeAssistantSunInfo, HomeAssistantSunState
+from ._views import HomeAssistantHourlyForecastView, HomeAssistantDailyForecastView
+
+_RELAY_PATH = "/relay/v1/"
+_VERSION_RESOURCE = "version"
+_LONG_POLL_MARGIN = 10  # seconds a long-poll may take past its wait before the client gives up
+
+
+class HomeAssistantRelayResource(str, Enum):
+    CURRENT = "current"
+    HOURLY = "hourly"
+    DAILY = "daily"
+    SUN = "sun"
+
+
+def _encode(value: Any) -> bytes:
+    if is_dataclass(value):
+        value = asdict(value)
+    elif isinstance(value, list):
+        value = [asdict(entry) if is_dataclass(entry) else entry.asdict() for entry in value]
+    return json.dumps(value, default=lambda o: o.value, sort_keys=True).encode("utf-8")
+
+
+class _RelayRequestHandler(BaseHTTPRequestHandler):
+    server: "_RelayHTTPServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass    # Kodi's log is written by the owner of the relay, not by the HTTP server
+
+    def do_GET(self) -> None:
+        relay = self.server.relay
+        url = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        if relay.token and not hmac.compare_digest(
+                self.headers.get("Authorization", "").encode(), f"Bearer {relay.token}".encode()
+        ):
+            self.__reply(401)
+            return
+        if not url.path.startswith(_RELAY_PATH):
+            self.__reply(404)
+            return
+        try:
+            wait = min(float(query.get("wait", ["0"])[0]), relay.max_wait)
+        except ValueError:
+            wait = 0.0
+        resource = urllib.parse.unquote(url.path[len(_RELAY_PATH):])
+        if resource == _VERSION_RESOURCE:
+            try:
+                after = int(query.get("after", ["-1"])[0])
+            except ValueError:
+                after = -1
+            self.__reply(200, body=json.dumps({"version": relay.wait_for_version(after=after, wait=wait)}).encode())
+            return
+        kind, _, entity_id = resource.partition("/")
+        found = relay.wait_for_change(
+            kind=kind, entity_id=entity_id, etag=self.headers.get("If-None-Match"), wait=wait
+        )
+        if found is None:
+            self.__reply(404)
+        elif found[0] == self.headers.get("If-None-Match"):
+            self.__reply(304, etag=found[0])
+        else:
+            self.__reply(200, etag=found[0], body=found[1])
+
+    def __reply(self, status: int, etag: Union[str, None] = None, body: bytes = b"") -> None:
+        self.send_response(status)
+        if etag is not None:
+            self.send_header("ETag", etag)
+        if status != 304:
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(body)
+
+
+class _RelayHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    relay: "HomeAssistantRelayServer"
+
+
+def _is_loopback(host: str) -> bool:
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return host == "localhost"
+
+
+class HomeAssistantRelayServer:
+    # Serves the decoded forecasts of one instance to the other Kodi boxes of a fleet, so only one of them talks to
+    # Home Assistant. Every resource carries an ETag; clients revalidate with If-None-Match and may long-poll with
+    # ?wait=<seconds> until it changes. /relay/v1/version?after=<n> long-polls for a change of any resource.
+    #
+    # Only a relay bound to the loopback interface may go without a token; anything reachable from the network
+    # would hand out the forecasts, and with them where the user lives, to everyone on it.
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, token: str = "", max_wait: float = 30.0) -> None:
+        if not token and not _is_loopback(host):
+            raise ValueError(f"A relay serving {host} needs a token")
+        self.token = token
+        self.max_wait = max_wait
+        self._resources: Dict[Tuple[str, str], Tuple[str, bytes]] = {}
+        self._version = 0
+        self._changed = threading.Condition()
+        self._http = _RelayHTTPServer((host, port), _RelayRequestHandler)
+        self._http.relay = self
+        self._thread: Union[threading.Thread, None] = None
+
+    @property
+    def port(self) -> int:
+        return self._http.server_address[1]
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._http.serve_forever, kwargs={"poll_interval": 0.1}, name="ha-weather-relay", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._http.shutdown()
+        self._http.server_close()
+        with self._changed:
+            self._changed.notify_all()
+
+    def publish(self, kind: HomeAssistantRelayResource, entity_id: str, value: Any) -> bool:
+        # returns True if the resource changed; an unchanged one keeps its ETag and wakes nobody
+        body = _encode(value)
+        etag = '"{}"'.format(hashlib.sha1(body).hexdigest()[:20])
+        with self._changed:
+            current = self._resources.get((kind.value, entity_id))
+            if current is not None and current[0] == etag:
+                return False
+            self._resources[(kind.value, entity_id)] = (etag, body)
+            self._version += 1
+            self._changed.notify_all()
+        return True
+
+    def wait_for_change(self, kind: str, entity_id: str, etag: Union[str, None],
+                        wait: float) -> Union[Tuple[str, bytes], None]:
+        deadline = time.monotonic() + wait
+        with self._changed:
+            while True:
+                found = self._resources.get((kind, entity_id))
+                remaining = deadline - time.monotonic()
+                if found is None or found[0] != etag or remaining <= 0:
+                    return found
+                self._changed.wait(timeout=remaining)
+
+    def wait_for_version(self, after: int, wait: float) -> int:
+        with self._changed:
+            self._changed.wait_for(lambda: self._version > after, timeout=wait)
+            return self._version
+
+
+class HomeAssistantRelayClient:
+    # Drop-in source with the signatures of HomeAssistantAdapter, reading from a HomeAssistantRelayServer instead of
+    # Home Assistant. Responses are cached by URL and revalidated with their ETag.
+    __session = requests.Session()
+    __cache: Dict[str, Tuple[str, Any]] = {}
+    __cache_lock = threading.Lock()
+
+    @staticmethod
+    def __request(server_url: str, resource: str, token: str, check_ssl: bool, request_attempts: int,
+                  cancellation: Union[CancellationToken, None] = None,
+                  params: Union[Dict[str, Any], None] = None) -> Any:
+        url = urllib.parse.urljoin(base=server_url, url=_RELAY_PATH + urllib.parse.quote(resource))
+        error_code, body = -1, "Unknown error"
+        for i in range(max(1, int(request_attempts or 1))):
+            timeout = None
+            if cancellation is not None:
+                cancellation.raise_if_cancelled()
+                timeout = cancellation.timeout()
+            if params and "wait" in params:
+                timeout = params["wait"] + _LONG_POLL_MARGIN
+            headers = {"Authorization": f"Bearer {token}"}
+            with HomeAssistantRelayClient.__cache_lock:
+                cached = HomeAssistantRelayClient.__cache.get(url)
+            if cached is not None:
+                headers["If-None-Match"] = cached[0]
+            started = time.perf_counter()
+            try:
+                r = HomeAssistantRelayClient.__session.get(
+                    url=url, headers=headers, params=params, verify=check_ssl, timeout=timeout
+                )
+            except RequestException:
+                HomeAssistantAdapter.notify_request_listener("GET", url, -1, started)
+                continue
+            HomeAssistantAdapter.notify_request_listener("GET", url, r.status_code, started)
+            if r.status_code == 304 and cached is not None:
+                return cached[1]
+            if r.ok:
+                content = r.json()
+                if r.headers.get("ETag"):
+                    with HomeAssistantRelayClient.__cache_lock:
+                        HomeAssistantRelayClient.__cache[url] = (r.headers["ETag"], content)
+                return content
+            error_code, body = r.status_code, r.text
+        if cancellation is not None:
+            cancellation.raise_if_cancelled()
+        raise RequestError(error_code=error_code, url=url, method="GET", body=body)
+
+    @staticmethod
+    def get_current_forecast(server_url: str, entity_id: str, token: str, check_ssl: bool,
+                             request_attempts: int,
+                             cancellation: Union[CancellationToken, None] = None) -> HomeAssistantCurrentForecast:
+        content = HomeAssistantRelayClient.__request(
+            server_url=server_url, resource=f"{HomeAssistantRelayResource.CURRENT.value}/{entity_id}", token=token,
+            check_ssl=check_ssl, request_attempts=request_attempts, cancellation=cancellation
+        )
+        return HomeAssistantCurrentForecast(**content)
+
+    @staticmethod
+    def __get_forecast_entries(server_url: str, entity_id: str, token: str, check_ssl: bool, request_attempts: int,
+                               kind: HomeAssistantRelayResource, horizon: Union[int, None], slot_length: timedelta,
+                               cancellation: Union[CancellationToken, None]) -> Tuple[List[dict], int]:
+        # the relay serves everything its owner fetched, each client applies its own horizon
+        content = HomeAssistantRelayClient.__request(
+            server_url=server_url, resource=f"{kind.value}/{entity_id}", token=token, check_ssl=check_ssl,
+            request_attempts=request_attempts, cancellation=cancellation
+        )
+        return HomeAssistantAdapter.truncate_to_horizon(
+            entries=content, horizon=horizon, slot_length=slot_length, now=datetime.now(tz=timezone.utc)
+        )
+
+    @staticmethod
+    def get_hourly_forecast(server_url: str, entity_id: str, token: str, check_ssl: bool, request_attempts: int,
+                            horizon: Union[int, None] = None, cancellation: Union[CancellationToken, None] = None,
+                            views: bool = False) -> Tuple[List[HomeAssistantHourlyForecast], int]:
+        entries, skipped = HomeAssistantRelayClient.__get_forecast_entries(
+            server_url=server_url, entity_id=entity_id, token=token, check_ssl=check_ssl,
+            request_attempts=request_attempts, kind=HomeAssistantRelayResource.HOURLY, horizon=horizon,
+            slot_length=timedelta(hours=1), cancellation=cancellation
+        )
+        if views:
+            return [HomeAssistantHourlyForecastView(entry) for entry in entries], skipped
+        return [HomeAssistantHourlyForecast(**entry) for entry in entries], skipped
+
+    @staticmethod
+    def get_daily_forecast(server_url: str, entity_id: str, token: str, check_ssl: bool, request_attempts: int,
+                           horizon: Union[int, None] = None, cancellation: Union[CancellationToken, None] = None,
+                           views: bool = False) -> Tuple[List[HomeAssistantDailyForecast], int]:
+        entries, skipped = HomeAssistantRelayClient.__get_forecast_entries(
+            server_url=server_url, entity_id=entity_id, token=token, check_ssl=check_ssl,
+            request_attempts=request_attempts, kind=HomeAssistantRelayResource.DAILY, horizon=horizon,
+            slot_length=timedelta(days=1), cancellation=cancellation
+        )
+        if views:
+            return [HomeAssistantDailyForecastView(entry) for entry in entries], skipped
+        return [HomeAssistantDailyForecast(**entry) for entry in entries], skipped
+
+    @staticmethod
+    def get_sun_info(server_url: str, entity_id: str, token: str, check_ssl: bool, request_attempts: int,
+                     cancellation: Union[CancellationToken, None] = None) -> HomeAssistantSunInfo:
+        content = dict(HomeAssistantRelayClient.__request(
+            server_url=server_url, resource=f"{HomeAssistantRelayResource.SUN.value}/{entity_id}", token=token,
+            check_ssl=check_ssl, request_attempts=request_attempts, cancellation=cancellation
+        ))
+        return HomeAssistantSunInfo(**{**content, "state": HomeAssistantSunState(content["state"])})
+
+    @staticmethod
+    def wait_for_change(server_url: str, token: str, check_ssl: bool, after: int, wait: float) -> int:
+        # long-polls the relay until any resource changes past version "after", returns the new version
+        content = HomeAssistantRelayClient.__request(
+            server_url=server_url, resource=_VERSION_RESOURCE, token=token, check_ssl=check_ssl, request_attempts=1,
+            params={"after": after, "wait": wait}
+        )
+        return content["version"]
@@ -0,0 +1,128 @@
+import math
+from datetime import datetime, tzinfo
+from typing import Dict, Iterable, List, Sequence, Tuple, Union
+
+from ._forecast import HomeAssistantHourlyForecast, HomeAssistantDailyForecast, HomeAssistantWeatherCondition
+
+_C = HomeAssistantWeatherCondition
+# ties between equally frequent conditions go to the one further down this list
+_SEVERITY: Dict[HomeAssistantWeatherCondition, int] = {condition: severity for severity, condition in enumerate((
+    _C.CLEAR_NIGHT, _C.SUNNY, _C.PARTLY_CLOUDY, _C.CLOUDY, _C.WINDY, _C.WINDY_CLOUDY, _C.FOG, _C.RAINY, _C.SNOWY_RAINY,
+    _C.SNOWY, _C.POURING, _C.HAIL, _C.LIGHTNING, _C.LIGHTNING_RAINY, _C.EXCEPTIONAL,
+))}
+
+
+class _Bucket:
+    __slots__ = ("key", "start", "hours", "entries", "high", "low", "precipitation", "humidity", "humidities",
+                 "wind_speed", "wind_speeds", "east", "north", "bearings", "uv_index", "conditions")
+
+    def __init__(self, key: Tuple[int, int], start: datetime, hours: int) -> None:
+        self.key = key
+        self.start = start
+        self.hours = hours
+        self.entries = 0
+        self.high: Union[float, None] = None
+        self.low: Union[float, None] = None
+        self.precipitation: Union[float, None] = None
+        self.humidity = 0.0
+        self.humidities = 0
+        self.wind_speed = 0.0
+        self.wind_speeds = 0
+        self.east = 0.0
+        self.north = 0.0
+        self.bearings = 0
+        self.uv_index: Union[float, None] = None
+        self.conditions: Dict[HomeAssistantWeatherCondition, int] = {}
+
+    def add(self, entry: HomeAssistantHourlyForecast) -> None:
+        self.entries += 1
+        if entry.temperature is not None:
+            self.high = entry.temperature if self.high is None else max(self.high, entry.temperature)
+            self.low = entry.temperature if self.low is None else min(self.low, entry.temperature)
+        if entry.precipitation is not None:
+            self.precipitation = (self.precipitation or 0.0) + entry.precipitation
+        if entry.humidity is not None:
+            self.humidity += entry.humidity
+            self.humidities += 1
+        if entry.wind_speed is not None:
+            self.wind_speed += entry.wind_speed
+            self.wind_speeds += 1
+        if isinstance(entry.wind_bearing, (int, float)):
+            # bearings are averaged as unit vectors, the mean of 350° and 10° is north and not south
+            self.east += math.sin(math.radians(entry.wind_bearing))
+            self.north += math.cos(math.radians(entry.wind_bearing))
+            self.bearings += 1
+        if entry.uv_index is not None:
+            self.uv_index = entry.uv_index if self.uv_index is None else max(self.uv_index, entry.uv_index)
+        if entry.condition is not None:
+            condition = HomeAssistantWeatherCondition(entry.condition)
+            if self.hours == 24 and condition == HomeAssistantWeatherCondition.CLEAR_NIGHT:
+                condition = HomeAssistantWeatherCondition.SUNNY     # a whole day is shown with the day icon
+            self.conditions[condition] = self.conditions.get(condition, 0) + 1
+
+    def forecast(self) -> HomeAssistantDailyForecast:
+        bearing = None
+        if self.bearings and math.hypot(self.east, self.north) > 1e-6 * self.bearings:
+            bearing = round(math.degrees(math.atan2(self.east, self.north))) % 360
+        condition = max(
+            self.conditions, key=lambda c: (self.conditions[c], _SEVERITY.get(c, 0)), default=None
+        )
+        return HomeAssistantDailyForecast(
+            wind_bearing=bearing,
+            wind_speed=round(self.wind_speed / self.wind_speeds, 1) if self.wind_speeds else None,
+            temperature=self.high,
+            humidity=round(self.humidity / self.humidities) if self.humidities else None,
+            condition=condition,
+            datetime=self.start.isoformat(),
+            precipitation=round(self.precipitation, 2) if self.precipitation is not None else None,
+            templow=self.low,
+            uv_index=self.uv_index,
+        )
+
+
+class HomeAssistantForecastResampler:
+    """Aggregates an hourly forecast into buckets of several hours, e.g. daily or 6-hourly forecasts.
+
+    Buckets start at local midnight and never cross it, every size has to divide a day. Each bucket is a
+    HomeAssistantDailyForecast: temperature is the highest and templow the lowest temperature, precipitation is
+    summed, humidity and wind speed are averaged, the bearing is the circular mean and the condition the one of most
+    hours; a bucket without any condition is left out. The series is read once for all sizes and has to be sorted by
+    time, like Home Assistant returns it."""
+
+    def __init__(self, bucket_hours: Sequence[int] = (24,), tz: Union[tzinfo, None] = None) -> None:
+        for hours in bucket_hours:
+            if hours <= 0 or 24 % hours:
+                raise ValueError(f"{hours} hour buckets don't divide a day")
+        self.bucket_hours = tuple(bucket_hours)
+        self.tz = tz    # None is the local time of the system, like the converter uses
+
+    def resample(self, hourly: Iterable[HomeAssistantHourlyForecast]) -> Dict[int, List[HomeAssistantDailyForecast]]:
+        # The first bucket is kept however few hours are left of it, it's the rest of today. Any later one needs at
+        # least half of its hours, the end of the series doesn't make up a day of its own.
+        resampled: Dict[int, List[HomeAssistantDailyForecast]] = {hours: [] for hours in self.bucket_hours}
+        open_buckets: Dict[int, _Bucket] = {}
+        for entry in hourly:
+            try:
+                local = datetime.fromisoformat(entry.datetime).astimezone(tz=self.tz)
+            except (TypeError, ValueError):
+                continue
+            for hours in self.bucket_hours:
+                key = (local.toordinal(), local.hour // hours)
+                bucket = open_buckets.get(hours)
+                if bucket is None or bucket.key != key:
+                    if bucket is not None:
+                        self.__close(bucket=bucket, into=resampled[hours])
+                    bucket = open_buckets[hours] = _Bucket(
+                        key=key, start=local.replace(hour=key[1] * hours, minute=0, second=0, microsecond=0),
+                        hours=hours
+                    )
+                bucket.add(entry)
+        for hours, bucket in open_buckets.items():
+            self.__close(bucket=bucket, into=resampled[hours])
+        return resampled
+
+    @staticmethod
+    def __close(bucket: _Bucket, into: List[HomeAssistantDailyForecast]) -> None:
+        if not bucket.conditions or (into and bucket.entries * 2 < bucket.hours):
+            return
+        into.append(bucket.forecast())
@@ -0,0 +1,249 @@
+import bisect
+import math
+import mmap
+import os
+import struct
+from collections.abc import Sequence
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Tuple, Union
+
+from ._errors import SnapshotError
+from ._forecast import (
+    HomeAssistantForecast, HomeAssistantCurrentForecast, HomeAssistantHourlyForecast, HomeAssistantDailyForecast,
+    HomeAssistantWeatherCondition
+)
+
+# Layout, little-endian, version 1:
+#   header   magic, version, key string, entry counts and skipped counts
+#   current  one fixed-width record, units and names as string table indices
+#   hourly   fixed-width records: epoch seconds, UTC offset, condition code, float32 values
+#   daily    same layout as hourly, templow takes the place of cloud coverage
+#   strings  u32 count, u32 end offsets, utf-8 blob
+# Missing values are stored as NaN, a missing string as _NO_STRING.
+_MAGIC = b"HAWS"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHxxIIIII")
+_CURRENT = struct.Struct("<B3xI8f8I")
+_ENTRY = struct.Struct("<qhBx7f")
+_COUNT = struct.Struct("<I")
+_NO_STRING = 0xFFFFFFFF
+_NAIVE = -0x8000   # UTC offset of a datetime without time zone
+# codes are positions in this tuple, new conditions may only be appended
+_CONDITIONS: Tuple[HomeAssistantWeatherCondition, ...] = tuple(HomeAssistantWeatherCondition)
+_CONDITION_CODES = {condition: code for code, condition in enumerate(_CONDITIONS)}
+
+_CURRENT_VALUES = ("wind_bearing", "wind_speed", "temperature", "humidity", "dew_point", "cloud_coverage", "pressure",
+                   "uv_index")
+_CURRENT_STRINGS = ("temperature_unit", "pressure_unit", "wind_speed_unit", "visibility_unit", "precipitation_unit",
+                    "attribution", "friendly_name")
+_HOURLY_VALUES = ("wind_bearing", "wind_speed", "temperature", "humidity", "precipitation", "cloud_coverage",
+                  "uv_index")
+_DAILY_VALUES = ("wind_bearing", "wind_speed", "temperature", "humidity", "precipitation", "templow", "uv_index")
+
+
+def _pack_value(value: Union[float, None]) -> float:
+    return math.nan if value is None else value
+
+
+def _unpack_value(value: float) -> Union[float, None]:
+    if math.isnan(value):
+        return None
+    # float32 keeps about seven significant digits, give back the decimal Home Assistant sent
+    return float(f"{value:.7g}")
+
+
+def _pack_datetime(value: str) -> Tuple[int, int]:
+    moment = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if moment.tzinfo is None:
+        return int(moment.replace(tzinfo=timezone.utc).timestamp()), _NAIVE
+    return int(moment.timestamp()), int(moment.utcoffset().total_seconds() // 60)
+
+
+def _unpack_datetime(epoch: int, offset: int) -> str:
+    if offset == _NAIVE:
+        return datetime.fromtimestamp(epoch, tz=timezone.utc).replace(tzinfo=None).isoformat()
+    return datetime.fromtimestamp(epoch, tz=timezone(timedelta(minutes=offset))).isoformat()
+
+
+class _StringTable:
+    def __init__(self) -> None:
+        self._indices: Dict[str, int] = {}
+
+    def add(self, value: Union[str, None]) -> int:
+        if value is None:
+            return _NO_STRING
+        return self._indices.setdefault(value, len(self._indices))
+
+    def pack(self) -> bytes:
+        blobs = [value.encode("utf-8") for value in self._indices]
+        ends, end = [], 0
+        for blob in blobs:
+            end += len(blob)
+            ends.append(end)
+        return struct.pack(f"<I{len(ends)}I", len(ends), *ends) + b"".join(blobs)
+
+
+class HomeAssistantSnapshotRecords(Sequence):
+    """Lazy view of the hourly or daily records of a snapshot, an entry is only decoded when it is indexed."""
+
+    def __init__(self, buffer: Any, offset: int, count: int, factory: Callable[..., Any],
+                 values: Tuple[str, ...], path: str = "") -> None:
+        self.path = path    # of the snapshot, for the SnapshotError of a corrupt record
+        self._buffer = buffer
+        self._offset = offset
+        self._count = count
+        self._factory = factory
+        self._values = values
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        epoch, offset, condition, *values = _ENTRY.unpack_from(self._buffer, self._offset + index * _ENTRY.size)
+        if condition >= len(_CONDITIONS):
+            raise SnapshotError(path=self.path, reason=f"corrupt: unknown condition code {condition}")
+        try:
+            timestamp = _unpack_datetime(epoch, offset)
+        except (OverflowError, OSError, ValueError) as e:     # a time no datetime can hold
+            raise SnapshotError(path=self.path, reason=f"corrupt: {e}")
+        return self._factory(
+            condition=_CONDITIONS[condition], datetime=timestamp,
+            **{name: _unpack_value(value) for name, value in zip(self._values, values)}
+        )
+
+    def epoch(self, index: int) -> int:
+        return _ENTRY.unpack_from(self._buffer, self._offset + index * _ENTRY.size)[0]
+
+    def first_from(self, epoch: float) -> int:
+        # index of the first entry starting at or after epoch, records are stored in forecast order
+        return bisect.bisect_left(_EpochKeys(self), epoch)
+
+
+class _EpochKeys(Sequence):
+    def __init__(self, records: HomeAssistantSnapshotRecords) -> None:
+        self._records = records
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __getitem__(self, index):
+        return self._records.epoch(index)
+
+
+class HomeAssistantForecastSnapshot:
+    """Versioned binary snapshot of a decoded HomeAssistantForecast, loaded through mmap.
+
+    The header, the current conditions and the string table are decoded on open, hourly and daily entries only when
+    they are accessed, so a cold start reads slot N without decoding the whole file."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        try:
+            with open(path, "rb") as f:
+                self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as e:    # an empty file can't be mapped
+            raise SnapshotError(path=path, reason=str(e))
+        try:
+            self.__decode()
+        except (struct.error, SnapshotError, UnicodeDecodeError, IndexError, ValueError) as e:
+            self._buffer.close()
+            if isinstance(e, SnapshotError):
+                raise
+            raise SnapshotError(path=path, reason=f"corrupt: {e}")
+
+    def __enter__(self) -> "HomeAssistantForecastSnapshot":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._buffer.close()
+
+    def __decode(self) -> None:
+        magic, version, key, hourly, daily, self.skipped_hourly, self.skipped_daily = _HEADER.unpack_from(self._buffer, 0)
+        if magic != _MAGIC:
+            raise SnapshotError(path=self.path, reason="not a forecast snapshot")
+        if version != _VERSION:
+            raise SnapshotError(path=self.path, reason=f"unsupported version {version}")
+        hourly_offset = _HEADER.size + _CURRENT.size
+        daily_offset = hourly_offset + hourly * _ENTRY.size
+        strings = self.__decode_strings(offset=daily_offset + daily * _ENTRY.size)
+        self.key = strings[key] if key != _NO_STRING else None
+        condition, supported_features, *fields = _CURRENT.unpack_from(self._buffer, _HEADER.size)
+        values, names = fields[:len(_CURRENT_VALUES)], fields[len(_CURRENT_VALUES):]
+        self.current = HomeAssistantCurrentForecast(
+            condition=_CONDITIONS[condition], supported_features=supported_features,
+            last_updated=strings[names[-1]] if names[-1] != _NO_STRING else None,
+            **{name: _unpack_value(value) for name, value in zip(_CURRENT_VALUES, values)},
+            **{name: strings[index] if index != _NO_STRING else None for name, index in zip(_CURRENT_STRINGS, names)}
+        )
+        self.hourly = HomeAssistantSnapshotRecords(
+            buffer=self._buffer, offset=hourly_offset, count=hourly, factory=HomeAssistantHourlyForecast,
+            values=_HOURLY_VALUES, path=self.path
+        )
+        self.daily = HomeAssistantSnapshotRecords(
+            buffer=self._buffer, offset=daily_offset, count=daily, factory=HomeAssistantDailyForecast,
+            values=_DAILY_VALUES, path=self.path
+        )
+
+    def __decode_strings(self, offset: int) -> List[str]:
+        count, = _COUNT.unpack_from(self._buffer, offset)
+        ends = struct.unpack_from(f"<{count}I", self._buffer, offset + _COUNT.size)
+        blob = offset + _COUNT.size + count * _COUNT.size
+        if count and blob + ends[-1] > len(self._buffer):
+            raise SnapshotError(path=self.path, reason="truncated string table")
+        strings, start = [], 0
+        for end in ends:
+            strings.append(self._buffer[blob + start:blob + end].decode("utf-8"))
+            start = end
+        return strings
+
+    def to_forecast(self) -> HomeAssistantForecast:
+        return HomeAssistantForecast(
+            current=self.current, hourly=list(self.hourly), daily=list(self.daily),
+            skipped_hourly=self.skipped_hourly, skipped_daily=self.skipped_daily
+        )
+
+    @staticmethod
+    def encode(forecast: HomeAssistantForecast, key: Union[str, None] = None) -> bytes:
+        strings = _StringTable()
+        key_index = strings.add(key)
+        current = forecast.current
+        names = [strings.add(getattr(current, name)) for name in _CURRENT_STRINGS]
+        parts = [
+            _HEADER.pack(_MAGIC, _VERSION, key_index, len(forecast.hourly), len(forecast.daily),
+                         forecast.skipped_hourly, forecast.skipped_daily),
+            _CURRENT.pack(
+                _CONDITION_CODES[HomeAssistantWeatherCondition(current.condition)], current.supported_features or 0,
+                *(_pack_value(getattr(current, name)) for name in _CURRENT_VALUES),
+                *names, strings.add(current.last_updated)
+            ),
+        ]
+        for entries, values in ((forecast.hourly, _HOURLY_VALUES), (forecast.daily, _DAILY_VALUES)):
+            for entry in entries:
+                parts.append(_ENTRY.pack(
+                    *_pack_datetime(entry.datetime), _CONDITION_CODES[HomeAssistantWeatherCondition(entry.condition)],
+                    *(_pack_value(getattr(entry, name)) for name in values)
+                ))
+        parts.append(strings.pack())
+        return b"".join(parts)
+
+    @staticmethod
+    def write(path: str, forecast: HomeAssistantForecast, key: Union[str, None] = None) -> None:
+        # written next to the target and moved over it, a reader never maps a half-written snapshot
+        try:
+            content = HomeAssistantForecastSnapshot.encode(forecast=forecast, key=key)
+        except (struct.error, TypeError, ValueError, KeyError) as e:
+            # e.g. a textual wind bearing, which has no place in a float32 record
+            raise SnapshotError(path=path, reason=f"not encodable: {e}")
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "wb") as f:
+            f.write(content)
+        os.replace(temporary_path, path)
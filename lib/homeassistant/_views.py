@@ -0,0 +1,88 @@
+from dataclasses import fields
+from typing import Any, Dict, Iterable, List, Tuple, Type, TypeVar, Union
+
+from lib.util.lazy import cached_slot
+
+from ._forecast import HomeAssistantHourlyForecast, HomeAssistantDailyForecast, HomeAssistantWeatherCondition
+
+_View = TypeVar("_View", bound="_HomeAssistantForecastView")
+
+
+class _EntryField:
+    # reads one key of the wrapped entry, a missing key reads as None like in filter_attributes
+    def __init__(self, name: str) -> None:
+        self._name = name
+
+    def __get__(self, instance: Union["_HomeAssistantForecastView", None], owner: type) -> Any:
+        if instance is None:
+            return self
+        return instance._entry.get(self._name)
+
+
+def _entry_fields(cls: Type[_View]) -> Type[_View]:
+    # the view has the fields of its dataclass, read straight from the decoded JSON
+    for name in cls.FIELDS:
+        if not hasattr(cls, name):
+            setattr(cls, name, _EntryField(name))
+    return cls
+
+
+class _HomeAssistantForecastView:
+    # Read-only forecast entry on top of the dict decoded from the response. Nothing is copied, values are read
+    # when accessed and the condition enum is created once, on first access.
+    #
+    # The dict holds every key Home Assistant sent and costs more than a dataclass would, so the series kept past
+    # their conversion are released into dataclasses; views only live as long as the response.
+    __slots__ = ("_entry", "_condition")
+    FIELDS: Tuple[str, ...] = ()
+
+    def __init__(self, entry: Dict[str, Any]) -> None:
+        self._entry = entry
+
+    @cached_slot
+    def condition(self) -> Union[HomeAssistantWeatherCondition, None]:
+        condition = self._entry.get("condition")
+        return HomeAssistantWeatherCondition(condition) if condition is not None else None
+
+    @property
+    def content_key(self) -> tuple:
+        # equal to the values of the dataclass in field order, so both kinds of entries share memo keys
+        return tuple(self._entry.get(name) for name in self.FIELDS)
+
+    def asdict(self) -> Dict[str, Any]:
+        return dict(zip(self.FIELDS, self.content_key))
+
+    @staticmethod
+    def release_all(entries: Iterable[object]) -> List[object]:
+        # the entries with every view replaced by its dataclass, anything else is kept as it is
+        return [entry.to_forecast() if isinstance(entry, _HomeAssistantForecastView) else entry for entry in entries]
+
+    def __eq__(self, other: object) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.content_key == other.content_key
+
+    __hash__ = None     # mutable like the dataclasses it stands in for
+
+    def __repr__(self) -> str:
+        return "{}({})".format(
+            type(self).__name__, ", ".join(f"{name}={value!r}" for name, value in zip(self.FIELDS, self.content_key))
+        )
+
+
+@_entry_fields
+class HomeAssistantHourlyForecastView(_HomeAssistantForecastView):
+    __slots__ = ()
+    FIELDS = tuple(field.name for field in fields(HomeAssistantHourlyForecast))
+
+    def to_forecast(self) -> HomeAssistantHourlyForecast:
+        return HomeAssistantHourlyForecast(**self.asdict())
+
+
+@_entry_fields
+class HomeAssistantDailyForecastView(_HomeAssistantForecastView):
+    __slots__ = ()
+    FIELDS = tuple(field.name for field in fields(HomeAssistantDailyForecast))
+
+    def to_forecast(self) -> HomeAssistantDailyForecast:
+        return HomeAssistantDailyForecast(**self.asdict())
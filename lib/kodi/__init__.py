@@ -1,7 +1,10 @@
 from ._adapter import KodiWeatherPluginAdapter
 from ._forecast import (
     KodiConditionCode, KodiCurrentForecastData, KodiDailyForecastData, KodiHourlyForecastData, KodiForecastData,
-    KodiGeneralForecastData, KodiWindDirectionCode
+    KodiGeneralForecastData, KodiSummaryForecastData, KodiWindDirectionCode
 )
-from ._settings import KodiPluginSetting
-from ._values import KodiLogLevel
+from ._logging import KodiRefreshSummary
+from ._monitor import KodiPluginMonitor
+from ._projection import KodiOutputProfile, KodiPropertyProjection
+from ._settings import KodiPluginSetting, KodiPluginSettingsSnapshot
+from ._values import KodiLogLevel, KodiLogCategory
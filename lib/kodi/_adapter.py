@@ -1,7 +1,9 @@
+import json
 import os.path
 from abc import abstractmethod
+from collections import deque
 from datetime import datetime, timezone
-from typing import Type, Union
+from typing import Callable, Deque, Dict, Iterable, List, Sequence, Set, Tuple, Type, Union
 
 import xbmc
 import xbmcaddon
@@ -10,26 +12,72 @@ import xbmcvfs
 
 from lib.unit.speed import Speed, SpeedUnits, SpeedKph
 from lib.unit.temperature import Temperature, TemperatureUnits, TemperatureCelsius
+from lib.util.memo import BoundedMemo
 
 from ._forecast import KodiForecastData, KodiHourlyForecastData, KodiDailyForecastData
 from ._properties import _KodiWeatherProperties, _KodiHourlyWeatherProperties, _KodiDailyWeatherProperties, \
-    _KodiDailyWeatherPropertiesCompat
-from ._settings import KodiPluginSetting, _Setting_Type
-from ._values import _KodiMagicValues, KodiLogLevel
+    _KodiDailyWeatherPropertiesCompat, _NestedProperties
+from ._logging import KodiRefreshSummary
+from ._projection import KodiOutputProfile, KodiPropertyProjection
+from ._settings import KodiPluginSetting, KodiPluginSettingsSnapshot, _Setting_Type
+from ._values import _KodiMagicValues, KodiLogLevel, KodiLogCategory
+from ._writer import _KodiPropertyWriter
+
+
+_RENDERED_HOURLY = "hourly"
+_RENDERED_DAILY = "daily"
+_RENDERED_FETCHED_AT = "fetched_at"
+_RENDER_MEMO_SIZE = 2 * (_KodiWeatherProperties.MAX_HOURLIES + _KodiWeatherProperties.MAX_DAILIES)
+# the rendered entry, kept alive with its values, then its property values by attribute name and the Day0..6 set
+_RenderedEntry = Tuple[object, Tuple[Tuple[str, str], ...], Tuple[Tuple[str, str], ...]]
 
 
 class KodiWeatherPluginAdapter:
+    MAX_LOCATIONS = _KodiWeatherProperties.MAX_LOCATIONS
 
     def __init__(self) -> None:
         self._window = xbmcgui.Window(_KodiMagicValues.WEATHER_WINDOW_ID)   # kwargs unsupported
+        self._monitor = xbmc.Monitor()
         self._kodi_addon = xbmcaddon.Addon()
         self.__addon_id = self._kodi_addon.getAddonInfo(id=_KodiMagicValues.ADDON_INFO_ADDON_ID)
+        self.__profile_path: Union[str, None] = None
         self._allow_logging = False     # override this after construction if needed
+        self._verbose_log_categories: Set[KodiLogCategory] = {KodiLogCategory.GENERAL}     # same as above
+        self._log_buffer: Deque[Tuple[KodiLogCategory, str, tuple]] = deque(maxlen=_KodiMagicValues.LOG_BUFFER_SIZE)
+        self.refresh_summary = KodiRefreshSummary()
+        self._property_writer = _KodiPropertyWriter(
+            window=self._window, on_written=self.__on_property_written, on_error=self.__on_property_error
+        )
+        # everything written to the weather window, replayed on the next start by restore_rendered_properties
+        self._rendered: Dict[str, str] = {}
+        self._rendered_slots: Dict[str, List[float]] = {_RENDERED_HOURLY: [], _RENDERED_DAILY: []}
+        self._render_memo: BoundedMemo[_RenderedEntry] = BoundedMemo(capacity=_RENDER_MEMO_SIZE)
+        self.projection = KodiPropertyProjection(profile=KodiOutputProfile.FULL)   # see set_output_profile
+
+    @property
+    def addon_id(self) -> str:
+        return self.__addon_id
+
+    def abort_requested(self) -> bool:
+        return self._monitor.abortRequested()
+
+    def wait_for_abort(self, seconds: float) -> bool:
+        return self._monitor.waitForAbort(seconds)
 
     @property
     def cwd(self) -> str:
         return self._kodi_addon.getAddonInfo(id=_KodiMagicValues.ADDON_INFO_PATH_ID)
 
+    @property
+    def profile_path(self) -> str:
+        # resolved and created once, every file of the add-on profile asks for it
+        if self.__profile_path is None:
+            path = xbmcvfs.translatePath(self._kodi_addon.getAddonInfo(id=_KodiMagicValues.ADDON_INFO_PROFILE_ID))
+            if not xbmcvfs.exists(path):
+                xbmcvfs.mkdirs(path)
+            self.__profile_path = path
+        return self.__profile_path
+
     @property
     def temperature_unit(self) -> Type[Temperature]:
         return TemperatureUnits[xbmc.getRegion(id=_KodiMagicValues.REGION_TEMPERATURE_UNIT_ID)]
@@ -68,9 +116,57 @@ class KodiWeatherPluginAdapter:
         except TypeError:
             return self._kodi_addon.getSetting(id=setting.setting_id)
 
-    def log(self, message: str, level: KodiLogLevel = KodiLogLevel.DEBUG):
-        if self._allow_logging:
-            xbmc.log(msg=f"[{self.__addon_id}] {message}", level=level.value)
+    def _load_settings(self, settings: Iterable[KodiPluginSetting], reload: bool = False) -> KodiPluginSettingsSnapshot:
+        if reload:
+            # a long-lived Addon instance keeps serving the values it was created with
+            self._kodi_addon = xbmcaddon.Addon()
+        return KodiPluginSettingsSnapshot(
+            {setting.setting_id: setting.coerce(self._get_setting(setting=setting)) for setting in settings}
+        )
+
+    def log(self, message: str, *args, level: KodiLogLevel = KodiLogLevel.DEBUG,
+            category: KodiLogCategory = KodiLogCategory.GENERAL) -> None:
+        # arguments are %-formatted only once we know the line is going to be written
+        if not self._allow_logging:
+            return
+        if level == KodiLogLevel.DEBUG and category not in self._verbose_log_categories:
+            self._log_buffer.append((category, message, args))
+            return
+        if level in (KodiLogLevel.ERROR, KodiLogLevel.CRITICAL):
+            self._flush_log_buffer()
+        self._write_log(message=message, args=args, level=level)
+
+    def _write_log(self, message: str, args: tuple, level: KodiLogLevel) -> None:
+        xbmc.log(msg="[%s] %s" % (self.__addon_id, message % args if args else message), level=level.value)
+
+    def _flush_log_buffer(self) -> None:
+        if not self._log_buffer:
+            return
+        self._write_log(
+            message="Last %d detailed events before the error:", args=(len(self._log_buffer),), level=KodiLogLevel.INFO
+        )
+        while self._log_buffer:
+            category, message, args = self._log_buffer.popleft()
+            # the buffered message is formatted on its own, a literal '%' in it must not shift the arguments
+            self._write_log(
+                message="(%s) %s", args=(category.value, message % args if args else message), level=KodiLogLevel.INFO
+            )
+
+    def begin_refresh(self) -> KodiRefreshSummary:
+        self._log_buffer.clear()
+        self.refresh_summary = KodiRefreshSummary()
+        return self.refresh_summary
+
+    def end_refresh(self, success: bool) -> None:
+        self.flush_properties()
+        self.log(
+            "Refresh summary: success=%s %s", success, self.refresh_summary,
+            level=KodiLogLevel.INFO if success else KodiLogLevel.WARNING
+        )
+
+    def record_request(self, method: str, url: str, status_code: int, elapsed: float) -> None:
+        self.refresh_summary.count_request()
+        self.log("%s %s -> %d (%.0f ms)", method, url, status_code, elapsed * 1000, category=KodiLogCategory.HTTP)
 
     @abstractmethod
     def required_settings_done(self) -> bool:
@@ -84,15 +180,121 @@ class KodiWeatherPluginAdapter:
         )
     
     def _set_window_property(self, key: str, value: str) -> None:
-        self._window.setProperty(
-            key=key,
-            value=value
+        self._rendered[key] = value
+        self._property_writer.put(key=key, value=value)
+
+    @property
+    def _rendered_context(self) -> str:
+        # rendered values depend on the language and region settings of Kodi, not only on the add-on settings
+        return "|".join((
+            xbmc.getLanguage(), self.time_format, self.short_date_format, self.long_date_format,
+            xbmc.getRegion(id=_KodiMagicValues.REGION_TEMPERATURE_UNIT_ID),
+            xbmc.getRegion(id=_KodiMagicValues.REGION_WIND_SPEED_UNIT_ID),
+        ))
+
+    def save_rendered_properties(self, path: str, key: str, fetched_at: float) -> None:
+        # fetched_at is the epoch time of the data the properties show, the restore rejects them once too old
+        state = {
+            "key": f"{key}|{self._rendered_context}",
+            _RENDERED_FETCHED_AT: fetched_at,
+            "properties": dict(self._rendered),
+            **{name: list(slots) for name, slots in self._rendered_slots.items()},
+        }
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temporary_path, path)
+
+    def restore_rendered_properties(self, path: str, key: str, max_age: float,
+                                    now: Union[datetime, None] = None) -> Union[float, None]:
+        # Replays the properties of the last refresh into an empty weather window, without converting or formatting
+        # anything. Only what time made wrong is redone: elapsed hours and days move the later slots up, Updated is
+        # set anew. Returns the epoch time the restored data was fetched at, None if there was nothing to restore
+        # for this key and context or the data is older than max_age seconds.
+        if self._window.getProperty(_KodiWeatherProperties.GENERAL.WEATHER_IS_FETCHED):
+            return None     # Kodi kept running, the window holds newer data than the file
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(state, dict) or state.get("key") != f"{key}|{self._rendered_context}":
+            return None
+        now = now or datetime.now(tz=timezone.utc)
+        fetched_at = state.get(_RENDERED_FETCHED_AT)
+        if not isinstance(fetched_at, (int, float)) or not 0 <= now.timestamp() - fetched_at <= max_age:
+            return None
+        properties: Dict[str, str] = state.get("properties", {})
+        hourly, daily = state.get(_RENDERED_HOURLY, []), state.get(_RENDERED_DAILY, [])
+        today = now.astimezone().date()
+        past_hours = sum(1 for start in hourly if start + 3600 <= now.timestamp())
+        past_days = sum(1 for start in daily if datetime.fromtimestamp(start).date() < today)
+        self.__shift_slots(properties, _KodiWeatherProperties.hourlies(count=len(hourly)), past_hours)
+        self.__shift_slots(properties, _KodiWeatherProperties.dailies(count=len(daily)), past_days)
+        self.__shift_slots(properties, _KodiWeatherProperties.dailies_compat()[:len(daily)], past_days)
+        for updated in (_KodiWeatherProperties.GENERAL.UPDATED, _KodiWeatherProperties.GENERAL.FORECAST_UPDATED):
+            if updated in properties:
+                properties[updated] = now.isoformat()
+        for property_key, value in properties.items():
+            if value:   # the window is empty, cleared slots need no write
+                self._set_window_property(key=property_key, value=value)
+        self._rendered_slots[_RENDERED_HOURLY] = hourly[past_hours:]
+        self._rendered_slots[_RENDERED_DAILY] = daily[past_days:]
+        return fetched_at
+
+    @staticmethod
+    def __shift_slots(properties: Dict[str, str], slots: Sequence[_NestedProperties], count: int) -> None:
+        # slot i takes the values of slot i + count, the slots freed at the end are cleared
+        if count <= 0:
+            return
+        for index, slot in enumerate(slots):
+            source = slots[index + count] if index + count < len(slots) else None
+            for name in (name for name in dir(slot) if name.isupper()):
+                key = getattr(slot, name)
+                if key in properties:
+                    properties[key] = properties.get(getattr(source, name), "") if source is not None else ""
+
+    def __on_property_written(self, key: str, value: str) -> None:
+        self.refresh_summary.properties_written += 1
+        self.log("%s := %s", key, value, category=KodiLogCategory.PROPERTIES)
+
+    def __on_property_error(self, key: str, error: Exception) -> None:
+        self.log("Could not set %s: %s", key, error, level=KodiLogLevel.ERROR)
+
+    def flush_properties(self) -> None:
+        self._property_writer.flush()
+
+    def clear_weather_properties(self, hourly_slots: int, daily_slots: int) -> None:
+        # the slots configured and the tail a longer series written earlier left behind, not every slot there is
+        hourlies = self.__written_slots(
+            slots=_KodiWeatherProperties.hourlies(count=_KodiWeatherProperties.MAX_HOURLIES),
+            count=max(hourly_slots, len(self._rendered_slots[_RENDERED_HOURLY]))
+        )
+        dailies = self.__written_slots(
+            slots=_KodiWeatherProperties.dailies(count=_KodiWeatherProperties.MAX_DAILIES),
+            count=max(daily_slots, len(self._rendered_slots[_RENDERED_DAILY]))
         )
-        self.log(message=f"{key} := {value}", level=KodiLogLevel.DEBUG)
+        for key in self.projection.keys(hourlies=hourlies, dailies=dailies):
+            self._set_window_property(key=key, value="")
 
-    def clear_weather_properties(self) -> None:
-        for property_set in _KodiWeatherProperties.all():
-            for key in property_set.values:
+    def __written_slots(self, slots: Sequence[Union[_KodiHourlyWeatherProperties, _KodiDailyWeatherProperties]],
+                        count: int) -> int:
+        # the window outlives the script, a slot past count may still show what an earlier run wrote there
+        count = min(count, len(slots))
+        while count < len(slots) and (
+                self._rendered.get(slots[count].OUTLOOK) or self._window.getProperty(slots[count].OUTLOOK)
+        ):
+            count += 1
+        return count
+
+    def set_output_profile(self, profile: KodiOutputProfile) -> None:
+        # properties the previous profile wrote and the new one doesn't would go stale, they are cleared
+        if profile == self.projection.profile:
+            return
+        previous = set(self.projection.keys())
+        self.projection = KodiPropertyProjection(profile=profile)
+        for key in previous.difference(self.projection.keys()):
+            if self._rendered.get(key):
                 self._set_window_property(key=key, value="")
 
     @staticmethod
@@ -102,77 +304,52 @@ class KodiWeatherPluginAdapter:
         return (value_format + " {}").format(unit.value, unit.unit)
 
     def set_weather_properties(self, forecast: KodiForecastData, remove_seconds: bool=False) -> None:
+        self.set_current_properties(forecast=forecast, remove_seconds=remove_seconds)
+        self.set_hourly_properties(forecast=forecast)
+        self.set_daily_properties(forecast=forecast)
+        self.set_general_properties(forecast=forecast)
+        self.set_location_properties(locations=[forecast.General.location])
+
+    def set_location_properties(self, locations: Sequence[str]) -> None:
+        # titles of all configured locations, in the order of the location index Kodi passes to the script
+        locations = locations[:_KodiWeatherProperties.MAX_LOCATIONS]
+        for index, key in enumerate(_KodiWeatherProperties.locations()):
+            self._set_window_property(key=key, value=locations[index] if index < len(locations) else "")
+        self._set_window_property(key=_KodiWeatherProperties.GENERAL.LOCATIONS, value=str(len(locations)))
+
+    def set_current_properties(self, forecast: KodiForecastData, remove_seconds: bool=False) -> None:
         percent = "{:.0f} %".format
-        true = "true"
-        self._set_window_property(key=_KodiWeatherProperties.GENERAL.LOCATION_1, value=forecast.General.location)
-        self._set_window_property(key=_KodiWeatherProperties.GENERAL.LOCATIONS, value="1")
-        # current
-        self._set_window_property(
-            key=_KodiWeatherProperties.CURRENT.CONDITION,
-            value=forecast.Current.condition_str
-        )
-        self._set_window_property(
-            key=_KodiWeatherProperties.CURRENT.TEMPERATURE,
-            value=self.format_unit(
-                TemperatureCelsius.from_si_value(forecast.Current.temperature.si_value())
-            ) if forecast.Current.temperature.value is not None else ""
-        )   # converted by Kodi from °C
-        self._set_window_property(
-            key=_KodiWeatherProperties.CURRENT.UV_INDEX,
-            value=str(forecast.Current.uv_index)
-        )
-        self._set_window_property(
-            key=_KodiWeatherProperties.CURRENT.OUTLOOK_ICON,
-            value=forecast.Current.outlook_icon
-        )
-        self._set_window_property(
-            key=_KodiWeatherProperties.CURRENT.FANART_CODE,
-            value=str(forecast.Current.fanart_code)
-        )
-        self._set_window_property(
-            key=_KodiWeatherProperties.CURRENT.WIND,
-            value=self.format_unit(
-                SpeedKph.from_si_value(forecast.Current.wind_speed.si_value())
-            ) if forecast.Current.wind_speed.value is not None else ""
-        )   # converted by Kodi from km/h
-        self._set_window_property(
-            key=_KodiWeatherProperties.CURRENT.WIND_DIRECTION,
-            value=self._get_localized_string(string_id=forecast.Current.wind_direction.value)
-        )
-        self._set_window_property(
-            key=_KodiWeatherProperties.CURRENT.HUMIDITY,
-            value=str(forecast.Current.humidity) if forecast.Current.humidity is not None else ""
-        )    # % is added by Kodi
-        self._set_window_property(
-            key=_KodiWeatherProperties.CURRENT.DEW_POINT,
-            value=self.format_unit(
-                TemperatureCelsius.from_si_value(forecast.Current.dew_point.si_value())
-            ) if forecast.Current.dew_point.value is not None else ""
-        )     # converted by Kodi from °C
-        self._set_window_property(
-            key=_KodiWeatherProperties.CURRENT.FEELS_LIKE,
-            value=self.format_unit(
-                TemperatureCelsius.from_si_value(forecast.Current.feels_like.si_value())
-            ) if forecast.Current.feels_like.value is not None else ""
-        )   # converted by Kodi from °C
-        self._set_window_property(
-            key=_KodiWeatherProperties.CURRENT.WIND_CHILL,
-            value=self.format_unit(
-                self.temperature_unit.from_si_value(forecast.Current.feels_like.si_value())
-            ) if forecast.Current.feels_like.value is not None else ""
-        )
-        self._set_window_property(
-            key=_KodiWeatherProperties.CURRENT.PRECIPITATION,
-            value=forecast.Current.precipitation or ""
-        )
-        self._set_window_property(
-            key=_KodiWeatherProperties.CURRENT.CLOUDINESS,
-            value=percent(forecast.Current.cloudiness)
-        )
-        self._set_window_property(
-            key=_KodiWeatherProperties.CURRENT.PRESSURE,
-            value=forecast.Current.pressure or ""
-        )
+        current = forecast.Current
+        fields = self.projection.fields(_KodiWeatherProperties.CURRENT)
+        # values are only formatted for the properties of the output profile
+        for name, value in (
+            ("CONDITION", lambda: current.condition_str),
+            ("TEMPERATURE", lambda: self.format_unit(
+                TemperatureCelsius.from_si_value(current.temperature.si_value())
+            ) if current.temperature.value is not None else ""),    # converted by Kodi from °C
+            ("UV_INDEX", lambda: str(current.uv_index)),
+            ("OUTLOOK_ICON", lambda: current.outlook_icon),
+            ("FANART_CODE", lambda: str(current.fanart_code)),
+            ("WIND", lambda: self.format_unit(
+                SpeedKph.from_si_value(current.wind_speed.si_value())
+            ) if current.wind_speed.value is not None else ""),     # converted by Kodi from km/h
+            ("WIND_DIRECTION", lambda: self._get_localized_string(string_id=current.wind_direction.value)),
+            ("HUMIDITY", lambda: str(current.humidity) if current.humidity is not None else ""),  # % is added by Kodi
+            ("DEW_POINT", lambda: self.format_unit(
+                TemperatureCelsius.from_si_value(current.dew_point.si_value())
+            ) if current.dew_point.value is not None else ""),      # converted by Kodi from °C
+            ("FEELS_LIKE", lambda: self.format_unit(
+                TemperatureCelsius.from_si_value(current.feels_like.si_value())
+            ) if current.feels_like.value is not None else ""),     # converted by Kodi from °C
+            ("WIND_CHILL", lambda: self.format_unit(
+                self.temperature_unit.from_si_value(current.feels_like.si_value())
+            ) if current.feels_like.value is not None else ""),
+            ("PRECIPITATION", lambda: current.precipitation or ""),
+            ("CLOUDINESS", lambda: percent(current.cloudiness)),
+            ("PRESSURE", lambda: current.pressure or ""),
+        ):
+            if name in fields:
+                self._set_window_property(key=getattr(_KodiWeatherProperties.CURRENT, name), value=value())
         self._set_window_property(
             key=_KodiWeatherProperties.GENERAL.SUNRISE,
             value=forecast.Current.sunrise.strftime(self.time_format.replace(":%S", "") if remove_seconds else self.time_format)
@@ -181,170 +358,192 @@ class KodiWeatherPluginAdapter:
             key=_KodiWeatherProperties.GENERAL.SUNSET,
             value=forecast.Current.sunset.strftime(self.time_format.replace(":%S", "") if remove_seconds else self.time_format)
         )
+        # the flag goes last on purpose: skins show a set once its flag is up, and the single writer applies the
+        # queue in order, so by then every value above is on the window; raised first it would show half a set
+        self._set_window_property(
+            key=_KodiWeatherProperties.GENERAL.CURRENT_IS_FETCHED,
+            value="true"
+        )
+
+    def __render_context(self) -> tuple:
+        # everything besides the entry itself a rendered value depends on
+        return (
+            self.time_format, self.long_date_format, self.short_date_format, self.temperature_unit,
+            self.wind_speed_unit, xbmc.getLanguage(), self.projection.profile
+        )
+
+    def __rendered(self, entry: Union[KodiHourlyForecastData, KodiDailyForecastData], context: tuple,
+                   render: Callable[[], _RenderedEntry]) -> _RenderedEntry:
+        # converted entries are shared between refreshes while unchanged, so is what they render to. The memo holds
+        # the entry, its id can't be reused for another one while it is cached.
+        return self._render_memo.get(key=(id(entry), context), create=render)
+
+    def __render_hourly(self, hourly_forecast: KodiHourlyForecastData, context: tuple) -> _RenderedEntry:
+        time_format, long_date_format, short_date_format, temperature_unit, wind_speed_unit, _, _ = context
+        percent = "{:.0f} %".format
+        return hourly_forecast, self.__project(group=_KodiWeatherProperties.HOURLY_1, values=(
+            ("TIME", lambda: hourly_forecast.timestamp.strftime(time_format)),
+            ("LONG_DATE", lambda: hourly_forecast.timestamp.strftime(long_date_format)),
+            ("SHORT_DATE", lambda: hourly_forecast.timestamp.strftime(short_date_format)),
+            ("OUTLOOK", lambda: hourly_forecast.condition_str),
+            ("OUTLOOK_ICON", lambda: hourly_forecast.outlook_icon),
+            ("FANART_CODE", lambda: str(hourly_forecast.fanart_code)),
+            ("WIND_SPEED", lambda: self.format_unit(
+                wind_speed_unit.from_si_value(hourly_forecast.wind_speed.si_value())
+            ) if hourly_forecast.wind_speed.value is not None else ""),
+            ("WIND_DIRECTION", lambda: self._get_localized_string(string_id=hourly_forecast.wind_direction.value)),
+            ("HUMIDITY", lambda: percent(hourly_forecast.humidity) if hourly_forecast.humidity is not None else ""),
+            ("TEMPERATURE", lambda: self.format_unit(
+                temperature_unit.from_si_value(hourly_forecast.temperature.si_value())
+            ) if hourly_forecast.temperature.value is not None else ""),
+            ("DEW_POINT", lambda: self.format_unit(
+                temperature_unit.from_si_value(hourly_forecast.dew_point.si_value())
+            ) if hourly_forecast.dew_point.value is not None else ""),
+            ("FEELS_LIKE", lambda: self.format_unit(
+                temperature_unit.from_si_value(hourly_forecast.feels_like.si_value())
+            ) if hourly_forecast.feels_like.value is not None else ""),
+            ("PRESSURE", lambda: hourly_forecast.pressure or ""),
+            ("PRECIPITATION", lambda: hourly_forecast.precipitation or ""),
+        )), ()
+
+    def __render_daily(self, daily_forecast: KodiDailyForecastData, context: tuple) -> _RenderedEntry:
+        time_format, long_date_format, short_date_format, temperature_unit, wind_speed_unit, _, _ = context
+        short_day = lambda: self._get_localized_string(
+            string_id=daily_forecast.timestamp.isoweekday() + _KodiMagicValues.MESSAGE_OFFSET_DAY_SHORT)
+        return daily_forecast, self.__project(group=_KodiWeatherProperties.DAILY_1, values=(
+            ("SHORT_DATE", lambda: daily_forecast.timestamp.strftime(short_date_format)),
+            ("SHORT_DAY", short_day),
+            ("LONG_DAY", lambda: self._get_localized_string(
+                string_id=daily_forecast.timestamp.isoweekday() + _KodiMagicValues.MESSAGE_OFFSET_DAY_LONG)),
+            ("HIGH_TEMPERATURE", lambda: self.format_unit(
+                temperature_unit.from_si_value(daily_forecast.temperature.si_value())
+            ) if daily_forecast.temperature.value is not None else ""),
+            ("LOW_TEMPERATURE", lambda: self.format_unit(
+                temperature_unit.from_si_value(daily_forecast.low_temperature.si_value())
+            ) if daily_forecast.low_temperature.value is not None else ""),
+            ("OUTLOOK", lambda: daily_forecast.condition_str),
+            ("OUTLOOK_ICON", lambda: daily_forecast.outlook_icon),
+            ("FANART_CODE", lambda: str(daily_forecast.fanart_code)),
+            ("WIND_SPEED", lambda: self.format_unit(
+                wind_speed_unit.from_si_value(daily_forecast.wind_speed.si_value())
+            ) if daily_forecast.wind_speed.value is not None else ""),
+            ("WIND_DIRECTION", lambda: self._get_localized_string(string_id=daily_forecast.wind_direction.value)),
+            ("PRECIPITATION", lambda: daily_forecast.precipitation or ""),
+        )), self.__project(group=_KodiWeatherProperties.DAY0, values=(
+            ("TITLE", short_day),
+            ("HIGH_TEMP", lambda: self.format_unit(
+                TemperatureCelsius.from_si_value(daily_forecast.temperature.si_value())
+            ) if daily_forecast.temperature.value is not None else ""),     # converted by skins from °C
+            ("LOW_TEMP", lambda: self.format_unit(
+                TemperatureCelsius.from_si_value(daily_forecast.low_temperature.si_value())
+            ) if daily_forecast.low_temperature.value is not None else ""),     # converted by skins from °C
+            ("OUTLOOK", lambda: daily_forecast.condition_str),
+            ("OUTLOOK_ICON", lambda: daily_forecast.outlook_icon),
+            ("FANART_CODE", lambda: str(daily_forecast.fanart_code)),
+        ))
+
+    def __project(self, group: _NestedProperties, values: Sequence[Tuple[str, Callable[[], str]]]) \
+            -> Tuple[Tuple[str, str], ...]:
+        # renders only the values the output profile writes, by attribute name
+        fields = self.projection.fields(group)
+        return tuple((name, value()) for name, value in values if name in fields)
+
+    def __count_renders(self, name: str, hits: int, misses: int) -> None:
+        self.refresh_summary.count_memo(
+            name=name, hits=self._render_memo.hits - hits, misses=self._render_memo.misses - misses
+        )
 
-        # hourly
+    def set_hourly_properties(self, forecast: KodiForecastData) -> None:
+        if not self.projection.writes_hourly:
+            return
+        context = self.__render_context()
+        hits, misses = self._render_memo.hits, self._render_memo.misses
         for hourly_forecast, hourly_properties in zip(
                 forecast.HourlyForecasts,
-                _KodiWeatherProperties.hourlies()
+                _KodiWeatherProperties.hourlies(count=len(forecast.HourlyForecasts))
         ):
             hourly_forecast: KodiHourlyForecastData
             hourly_properties: _KodiHourlyWeatherProperties
-            self._set_window_property(
-                key=hourly_properties.TIME,
-                value=hourly_forecast.timestamp.strftime(self.time_format)
-            )
-            self._set_window_property(
-                key=hourly_properties.LONG_DATE,
-                value=hourly_forecast.timestamp.strftime(self.long_date_format)
-            )
-            self._set_window_property(
-                key=hourly_properties.SHORT_DATE,
-                value=hourly_forecast.timestamp.strftime(self.short_date_format)
-            )
-            self._set_window_property(
-                key=hourly_properties.OUTLOOK,
-                value=hourly_forecast.condition_str
-            )
-            self._set_window_property(
-                key=hourly_properties.OUTLOOK_ICON,
-                value=hourly_forecast.outlook_icon
-            )
-            self._set_window_property(
-                key=hourly_properties.FANART_CODE,
-                value=str(hourly_forecast.fanart_code)
-            )
-            self._set_window_property(
-                key=hourly_properties.WIND_SPEED,
-                value=self.format_unit(
-                    self.wind_speed_unit.from_si_value(hourly_forecast.wind_speed.si_value())
-                ) if hourly_forecast.wind_speed.value is not None else ""
-            )
-            self._set_window_property(
-                key=hourly_properties.WIND_DIRECTION,
-                value=self._get_localized_string(string_id=hourly_forecast.wind_direction.value)
-            )
-            self._set_window_property(
-                key=hourly_properties.HUMIDITY,
-                value=percent(hourly_forecast.humidity) if hourly_forecast.humidity is not None else ""
-            )
-            self._set_window_property(
-                key=hourly_properties.TEMPERATURE,
-                value=self.format_unit(
-                    self.temperature_unit.from_si_value(hourly_forecast.temperature.si_value())
-                ) if hourly_forecast.temperature.value is not None else ""
-            )
-            self._set_window_property(
-                key=hourly_properties.DEW_POINT,
-                value=self.format_unit(
-                    self.temperature_unit.from_si_value(hourly_forecast.dew_point.si_value())
-                ) if hourly_forecast.dew_point.value is not None else ""
-            )
-            self._set_window_property(
-                key=hourly_properties.FEELS_LIKE,
-                value=self.format_unit(
-                    self.temperature_unit.from_si_value(hourly_forecast.feels_like.si_value())
-                ) if hourly_forecast.feels_like.value is not None else ""
-            )
-            self._set_window_property(
-                key=hourly_properties.PRESSURE,
-                value=hourly_forecast.pressure or ""
-            )
-            self._set_window_property(
-                key=hourly_properties.PRECIPITATION,
-                value=hourly_forecast.precipitation or ""
+            _, rendered, _ = self.__rendered(
+                entry=hourly_forecast, context=context,
+                render=lambda: self.__render_hourly(hourly_forecast=hourly_forecast, context=context)
             )
+            for name, value in rendered:
+                self._set_window_property(key=getattr(hourly_properties, name), value=value)
+        self.__count_renders(name="render.hourly", hits=hits, misses=misses)
+        self._set_window_property(     # last, see set_current_properties
+            key=_KodiWeatherProperties.GENERAL.HOURLY_IS_FETCHED,
+            value="true"
+        )
+        self._rendered_slots[_RENDERED_HOURLY] = [entry.timestamp.timestamp() for entry in forecast.HourlyForecasts]
 
-        # daily
-        for daily_forecast, daily_properties, daily_properties_compat in zip(
+    def set_daily_properties(self, forecast: KodiForecastData) -> None:
+        if not self.projection.writes_daily:
+            return
+        context = self.__render_context()
+        hits, misses = self._render_memo.hits, self._render_memo.misses
+        dailies_compat = _KodiWeatherProperties.dailies_compat()
+        for index, (daily_forecast, daily_properties) in enumerate(zip(
             forecast.DailyForecasts,
-            _KodiWeatherProperties.dailies(),
-            _KodiWeatherProperties.dailies_compat(),
-        ):
+            _KodiWeatherProperties.dailies(count=len(forecast.DailyForecasts)),
+        )):
             daily_forecast: KodiDailyForecastData
             daily_properties: _KodiDailyWeatherProperties
-            daily_properties_compat: _KodiDailyWeatherPropertiesCompat
-            self._set_window_property(
-                key=daily_properties.SHORT_DATE,
-                value=daily_forecast.timestamp.strftime(self.short_date_format)
-            )
-            self._set_window_property(
-                key=daily_properties.SHORT_DAY,
-                value=self._get_localized_string(
-                    string_id=daily_forecast.timestamp.isoweekday() + _KodiMagicValues.MESSAGE_OFFSET_DAY_SHORT)
-            )
-            self._set_window_property(
-                key=daily_properties.LONG_DAY,
-                value=self._get_localized_string(
-                    string_id=daily_forecast.timestamp.isoweekday() + _KodiMagicValues.MESSAGE_OFFSET_DAY_LONG)
-            )
-            self._set_window_property(
-                key=daily_properties.HIGH_TEMPERATURE,
-                value=self.format_unit(
-                    self.temperature_unit.from_si_value(daily_forecast.temperature.si_value())
-                ) if daily_forecast.temperature.value is not None else ""
-            )
-            self._set_window_property(
-                key=daily_properties.LOW_TEMPERATURE,
-                value=self.format_unit(
-                    self.temperature_unit.from_si_value(daily_forecast.low_temperature.si_value())
-                ) if daily_forecast.low_temperature.value is not None else ""
+            _, rendered, rendered_compat = self.__rendered(
+                entry=daily_forecast, context=context,
+                render=lambda: self.__render_daily(daily_forecast=daily_forecast, context=context)
             )
-            self._set_window_property(
-                key=daily_properties.OUTLOOK,
-                value=daily_forecast.condition_str
-            )
-            self._set_window_property(
-                key=daily_properties.OUTLOOK_ICON,
-                value=daily_forecast.outlook_icon
-            )
-            self._set_window_property(
-                key=daily_properties.FANART_CODE,
-                value=str(daily_forecast.fanart_code)
-            )
-            self._set_window_property(
-                key=daily_properties.WIND_SPEED,
-                value=self.format_unit(
-                    self.wind_speed_unit.from_si_value(daily_forecast.wind_speed.si_value())
-                ) if daily_forecast.wind_speed.value is not None else ""
-            )
-            self._set_window_property(
-                key=daily_properties.WIND_DIRECTION,
-                value=self._get_localized_string(string_id=daily_forecast.wind_direction.value)
-            )
-            self._set_window_property(
-                key=daily_properties.PRECIPITATION,
-                value=daily_forecast.precipitation or ""
-            )
-            self._set_window_property(
-                key=daily_properties_compat.TITLE,
-                value=self._get_localized_string(
-                    string_id=daily_forecast.timestamp.isoweekday() + _KodiMagicValues.MESSAGE_OFFSET_DAY_SHORT)
-            )
-            self._set_window_property(
-                key=daily_properties_compat.HIGH_TEMP,
-                value=self.format_unit(
-                    TemperatureCelsius.from_si_value(daily_forecast.temperature.si_value())
-                ) if daily_forecast.temperature.value is not None else ""
-            )   # converted by skins from °C
-            self._set_window_property(
-                key=daily_properties_compat.LOW_TEMP,
-                value=self.format_unit(
-                    TemperatureCelsius.from_si_value(daily_forecast.low_temperature.si_value())
-                ) if daily_forecast.low_temperature.value is not None else ""
-            )   # converted by skins from °C
-            self._set_window_property(
-                key=daily_properties_compat.OUTLOOK,
-                value=daily_forecast.condition_str
-            )
-            self._set_window_property(
-                key=daily_properties_compat.OUTLOOK_ICON,
-                value=daily_forecast.outlook_icon
-            )
-            self._set_window_property(
-                key=daily_properties_compat.FANART_CODE,
-                value=str(daily_forecast.fanart_code)
-            )
-        # general
+            for name, value in rendered:
+                self._set_window_property(key=getattr(daily_properties, name), value=value)
+            if index >= len(dailies_compat):
+                continue    # the Day0..6 compat set has no slots past a week
+            daily_properties_compat: _KodiDailyWeatherPropertiesCompat = dailies_compat[index]
+            for name, value in rendered_compat:
+                self._set_window_property(key=getattr(daily_properties_compat, name), value=value)
+        self.__count_renders(name="render.daily", hits=hits, misses=misses)
+        self._set_window_property(     # last, see set_current_properties
+            key=_KodiWeatherProperties.GENERAL.DAILY_IS_FETCHED,
+            value="true"
+        )
+        self._rendered_slots[_RENDERED_DAILY] = [entry.timestamp.timestamp() for entry in forecast.DailyForecasts]
+
+    def set_summary_properties(self, forecast: KodiForecastData) -> None:
+        summary = forecast.Summary
+        if summary is None or not self.projection.writes_summary:
+            return
+        fields = self.projection.fields(_KodiWeatherProperties.SUMMARY)
+        temperature_unit = self.temperature_unit
+        temperature = lambda value: self.format_unit(
+            temperature_unit.from_si_value(value.si_value())
+        ) if value is not None and value.value is not None else ""
+        clock = lambda moment: moment.strftime(self.time_format) if moment is not None else ""
+
+        def rain_starts_in() -> str:
+            if summary.rain_start is None:
+                return ""
+            # relative to the time of writing, an hour that already started reads as raining now
+            minutes = (summary.rain_start - datetime.now(tz=timezone.utc)).total_seconds() / 60
+            return "{:.0f}".format(max(0.0, minutes))
+
+        for name, value in (
+            ("RAIN_START", lambda: clock(summary.rain_start)),
+            ("RAIN_STARTS_IN", rain_starts_in),
+            ("TODAY_HIGH_TEMPERATURE", lambda: temperature(summary.today_high)),
+            ("TODAY_LOW_TEMPERATURE", lambda: temperature(summary.today_low)),
+            ("TODAY_MAX_UV_INDEX", lambda: "{:g}".format(summary.today_max_uv_index)
+                if summary.today_max_uv_index is not None else ""),
+            ("TODAY_MAX_UV_TIME", lambda: clock(summary.today_max_uv_time)),
+            ("TONIGHT_LOW_TEMPERATURE", lambda: temperature(summary.tonight_low)),
+            ("TONIGHT_FROST", lambda: "true" if summary.frost_tonight else "false"),
+            ("WEEK_HIGH_TEMPERATURE", lambda: temperature(summary.week_high)),
+            ("WEEK_LOW_TEMPERATURE", lambda: temperature(summary.week_low)),
+            ("WEEK_RAINY_DAYS", lambda: str(summary.rainy_days)),
+        ):
+            if name in fields:
+                self._set_window_property(key=getattr(_KodiWeatherProperties.SUMMARY, name), value=value())
+
+    def set_general_properties(self, forecast: KodiForecastData) -> None:
+        true = "true"
         self._set_window_property(
             key=_KodiWeatherProperties.GENERAL.LOCATION,
             value=forecast.General.location
@@ -401,15 +600,3 @@ class KodiWeatherPluginAdapter:
             key=_KodiWeatherProperties.GENERAL.WEATHER_IS_FETCHED,
             value=true
         )
-        self._set_window_property(
-            key=_KodiWeatherProperties.GENERAL.CURRENT_IS_FETCHED,
-            value=true
-        )
-        self._set_window_property(
-            key=_KodiWeatherProperties.GENERAL.HOURLY_IS_FETCHED,
-            value=true
-        )
-        self._set_window_property(
-            key=_KodiWeatherProperties.GENERAL.DAILY_IS_FETCHED,
-            value=true
-        )
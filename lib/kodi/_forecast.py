@@ -1,10 +1,13 @@
 from dataclasses import dataclass
 from datetime import datetime
 from enum import IntEnum
-from typing import List
+from typing import List, Union
 
 from lib.unit.speed import Speed
 from lib.unit.temperature import Temperature
+from lib.util.slots import dataclass_slots
+
+_FREEZING_POINT = 273.15    # K
 
 
 class KodiConditionCode(IntEnum):
@@ -157,6 +160,7 @@ class KodiWindDirectionCode(IntEnum):
 
 @dataclass
 class _KodiForecastCommon:
+    __slots__ = ()
     temperature: Temperature
     wind_speed: Speed
     wind_direction: KodiWindDirectionCode   # eg: NNE
@@ -165,6 +169,7 @@ class _KodiForecastCommon:
 
 @dataclass
 class _KodiDetailedForecastCommon:
+    __slots__ = ()
     humidity: float     # unit: %
     feels_like: Temperature
     dew_point: Temperature
@@ -172,6 +177,7 @@ class _KodiDetailedForecastCommon:
 
 @dataclass
 class _KodiConditionedForecastCommon:
+    __slots__ = ()
     condition: KodiConditionCode
 
     @property
@@ -189,15 +195,18 @@ class _KodiConditionedForecastCommon:
 
 @dataclass
 class _KodiFutureForecastCommon:
+    __slots__ = ()
     timestamp: datetime
 
 
+@dataclass_slots
 @dataclass
 class KodiGeneralForecastData:
     location: str
     attribution: str
 
 
+@dataclass_slots
 @dataclass
 class KodiCurrentForecastData(_KodiForecastCommon, _KodiDetailedForecastCommon, _KodiConditionedForecastCommon):
     uv_index: int
@@ -207,6 +216,7 @@ class KodiCurrentForecastData(_KodiForecastCommon, _KodiDetailedForecastCommon,
     sunset: datetime
 
 
+@dataclass_slots
 @dataclass
 class KodiHourlyForecastData(
     _KodiFutureForecastCommon, _KodiForecastCommon, _KodiDetailedForecastCommon, _KodiConditionedForecastCommon
@@ -214,14 +224,36 @@ class KodiHourlyForecastData(
     pressure: str       # with unit
 
 
+@dataclass_slots
 @dataclass
 class KodiDailyForecastData(_KodiFutureForecastCommon, _KodiForecastCommon, _KodiConditionedForecastCommon):
     low_temperature: Temperature
 
 
+@dataclass_slots
+@dataclass
+class KodiSummaryForecastData:
+    # derived from the converted series, the temperatures are the converted values and share their unit
+    rain_start: Union[datetime, None]           # start of the first wet hour, None if the hourly forecast stays dry
+    today_high: Union[Temperature, None]
+    today_low: Union[Temperature, None]
+    today_max_uv_index: Union[float, None]
+    today_max_uv_time: Union[datetime, None]
+    tonight_low: Union[Temperature, None]       # from the next sunset (or now, at night) to the next sunrise
+    week_high: Union[Temperature, None]
+    week_low: Union[Temperature, None]
+    rainy_days: int
+
+    @property
+    def frost_tonight(self) -> bool:
+        return self.tonight_low is not None and self.tonight_low.si_value() <= _FREEZING_POINT
+
+
+@dataclass_slots
 @dataclass
 class KodiForecastData:
     General: KodiGeneralForecastData
     Current: KodiCurrentForecastData
     HourlyForecasts: List[KodiHourlyForecastData]
-    DailyForecasts: List[KodiDailyForecastData]
\ No newline at end of file
+    DailyForecasts: List[KodiDailyForecastData]
+    Summary: Union[KodiSummaryForecastData, None] = None
\ No newline at end of file
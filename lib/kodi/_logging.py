@@ -0,0 +1,51 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+
+class KodiRefreshSummary:
+    def __init__(self) -> None:
+        self._started = time.perf_counter()
+        self._stages: Dict[str, float] = OrderedDict()
+        self.requests = 0
+        self.properties_written = 0
+        self.cut_stages: List[str] = []
+        self.memo: Dict[str, Tuple[int, int]] = OrderedDict()    # hits and misses of incremental stages
+        self._lock = threading.Lock()
+
+    def count_request(self) -> None:
+        # requests may be issued from several fetch workers at once
+        with self._lock:
+            self.requests += 1
+
+    def count_memo(self, name: str, hits: int, misses: int) -> None:
+        with self._lock:
+            previous_hits, previous_misses = self.memo.get(name, (0, 0))
+            self.memo[name] = (previous_hits + hits, previous_misses + misses)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._stages[name] = self._stages.get(name, 0.0) + time.perf_counter() - started
+
+    @property
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._started) * 1000
+
+    def __str__(self) -> str:
+        stages = " ".join("{}={:.0f}ms".format(name, seconds * 1000) for name, seconds in self._stages.items())
+        summary = "total={:.0f}ms {} requests={} properties={}".format(
+            self.elapsed_ms, stages, self.requests, self.properties_written
+        )
+        if self.memo:
+            summary += " memo={}".format(",".join(
+                "{}:{}/{}".format(name, hits, hits + misses) for name, (hits, misses) in self.memo.items()
+            ))
+        if self.cut_stages:
+            summary += " cut={}".format(",".join(self.cut_stages))
+        return summary
@@ -0,0 +1,20 @@
+from typing import Callable, Union
+
+import xbmc
+
+
+class KodiPluginMonitor(xbmc.Monitor):
+    def __init__(self, on_settings_changed: Union[Callable[[], None], None] = None,
+                 on_notification: Union[Callable[[str, str, str], None], None] = None) -> None:
+        super().__init__()
+        self.__on_settings_changed = on_settings_changed
+        self.__on_notification = on_notification
+
+    def onSettingsChanged(self) -> None:
+        if self.__on_settings_changed is not None:
+            self.__on_settings_changed()
+
+    def onNotification(self, sender: str, method: str, data: str) -> None:
+        # NotifyAll(sender, message) arrives here as method "Other.<message>"
+        if self.__on_notification is not None:
+            self.__on_notification(sender, method, data)
@@ -0,0 +1,93 @@
+from enum import IntEnum
+from typing import Dict, FrozenSet, Iterator, Type
+
+from ._properties import (
+    _KodiWeatherProperties, _NestedProperties, _KodiGeneralWeatherProperties, _KodiCurrentWeatherProperties,
+    _KodiSummaryWeatherProperties, _KodiHourlyWeatherProperties, _KodiDailyWeatherProperties,
+    _KodiDailyWeatherPropertiesCompat
+)
+
+
+class KodiOutputProfile(IntEnum):
+    FULL = 0        # every property, for skins reading anything
+    ESTUARY = 1     # what Kodi's default skin shows
+    MINIMAL = 2     # current conditions and a daily outlook, e.g. for home screen widgets
+
+
+def _names(group: Type[_NestedProperties]) -> FrozenSet[str]:
+    return frozenset(name for name in dir(group) if name.isupper())
+
+
+def _without(group: Type[_NestedProperties], *names: str) -> FrozenSet[str]:
+    return _names(group) - frozenset(names)
+
+
+_ALL_GROUPS = (
+    _KodiGeneralWeatherProperties, _KodiCurrentWeatherProperties, _KodiSummaryWeatherProperties,
+    _KodiHourlyWeatherProperties, _KodiDailyWeatherProperties, _KodiDailyWeatherPropertiesCompat,
+)
+# property names per group, a group that is left out isn't written at all; the general properties are always written
+_PROFILES: Dict[KodiOutputProfile, Dict[Type[_NestedProperties], FrozenSet[str]]] = {
+    KodiOutputProfile.FULL: {group: _names(group) for group in _ALL_GROUPS},
+    KodiOutputProfile.ESTUARY: {
+        _KodiGeneralWeatherProperties: _names(_KodiGeneralWeatherProperties),
+        _KodiCurrentWeatherProperties: _names(_KodiCurrentWeatherProperties),
+        _KodiHourlyWeatherProperties: _without(
+            _KodiHourlyWeatherProperties, "LONG_DATE", "DEW_POINT", "FEELS_LIKE", "PRESSURE"
+        ),
+        _KodiDailyWeatherProperties: _without(_KodiDailyWeatherProperties, "LONG_DAY"),
+        # Estuary's weather window still reads the week from Day0..6
+        _KodiDailyWeatherPropertiesCompat: _names(_KodiDailyWeatherPropertiesCompat),
+    },
+    KodiOutputProfile.MINIMAL: {
+        _KodiGeneralWeatherProperties: _names(_KodiGeneralWeatherProperties),
+        _KodiCurrentWeatherProperties: frozenset((
+            "CONDITION", "TEMPERATURE", "HUMIDITY", "WIND", "OUTLOOK_ICON", "FANART_CODE",
+        )),
+        _KodiDailyWeatherProperties: frozenset((
+            "SHORT_DAY", "HIGH_TEMPERATURE", "LOW_TEMPERATURE", "OUTLOOK", "OUTLOOK_ICON", "FANART_CODE",
+        )),
+    },
+}
+# values of the current conditions that cost a computation, by the properties showing them
+_CURRENT_FIELDS: Dict[str, FrozenSet[str]] = {
+    "feels_like": frozenset(("FEELS_LIKE", "WIND_CHILL")),
+    "dew_point": frozenset(("DEW_POINT",)),
+}
+
+
+class KodiPropertyProjection:
+    """The weather properties an output profile consumes.
+
+    The adapter renders and writes only those, and the conversion skips the values none of them shows."""
+
+    def __init__(self, profile: KodiOutputProfile) -> None:
+        self.profile = profile
+        self._fields = _PROFILES[profile]
+
+    def fields(self, group: _NestedProperties) -> FrozenSet[str]:
+        return self._fields.get(type(group), frozenset())
+
+    def keys(self, hourlies: int = _KodiWeatherProperties.MAX_HOURLIES,
+             dailies: int = _KodiWeatherProperties.MAX_DAILIES) -> Iterator[str]:
+        for group in _KodiWeatherProperties.all(hourlies=hourlies, dailies=dailies):
+            fields = self.fields(group)
+            for name in fields:
+                yield getattr(group, name)
+
+    @property
+    def writes_hourly(self) -> bool:
+        return _KodiHourlyWeatherProperties in self._fields
+
+    @property
+    def writes_daily(self) -> bool:
+        return _KodiDailyWeatherProperties in self._fields
+
+    @property
+    def writes_summary(self) -> bool:
+        return _KodiSummaryWeatherProperties in self._fields
+
+    def needs_current(self, field: str) -> bool:
+        # field of KodiCurrentForecastData; the cheap ones are always converted
+        names = _CURRENT_FIELDS.get(field)
+        return names is None or bool(names & self.fields(_KodiWeatherProperties.CURRENT))
@@ -19,6 +19,10 @@ class _NestedProperties:
 class _KodiGeneralWeatherProperties(_NestedProperties):
     LOCATION = "Location"
     LOCATION_1 = "Location1"
+    LOCATION_2 = "Location2"
+    LOCATION_3 = "Location3"
+    LOCATION_4 = "Location4"
+    LOCATION_5 = "Location5"
     LOCATIONS = "Locations"
     CURRENT_LOCATION = "Current.Location"
     WEATHER_PROVIDER = "WeatherProvider"
@@ -57,6 +61,21 @@ class _KodiCurrentWeatherProperties(_NestedProperties):
     WIND_CHILL = "WindChill"
 
 
+class _KodiSummaryWeatherProperties(_NestedProperties):
+    # not part of Kodi's weather properties, derived by the add-on for skins and widgets
+    RAIN_START = "Rain.Start"
+    RAIN_STARTS_IN = "Rain.StartsIn"            # minutes
+    TODAY_HIGH_TEMPERATURE = "Today.HighTemperature"
+    TODAY_LOW_TEMPERATURE = "Today.LowTemperature"
+    TODAY_MAX_UV_INDEX = "Today.MaxUVIndex"
+    TODAY_MAX_UV_TIME = "Today.MaxUVTime"
+    TONIGHT_LOW_TEMPERATURE = "Tonight.LowTemperature"
+    TONIGHT_FROST = "Tonight.Frost"
+    WEEK_HIGH_TEMPERATURE = "Week.HighTemperature"
+    WEEK_LOW_TEMPERATURE = "Week.LowTemperature"
+    WEEK_RAINY_DAYS = "Week.RainyDays"
+
+
 class _KodiHourlyWeatherProperties(_NestedProperties):
     TIME = "Time"
     LONG_DATE = "LongDate"
@@ -98,8 +117,13 @@ class _KodiDailyWeatherPropertiesCompat(_NestedProperties):
 
 
 class _KodiWeatherProperties:
+    MAX_HOURLIES = 72
+    MAX_DAILIES = 10
+    MAX_LOCATIONS = 5   # Kodi's weather settings offer up to five locations
+
     GENERAL = _KodiGeneralWeatherProperties("")
     CURRENT = _KodiCurrentWeatherProperties("Current.")
+    SUMMARY = _KodiSummaryWeatherProperties("Summary.")
 
     HOURLY_1 = _KodiHourlyWeatherProperties("Hourly.1.")
     HOURLY_2 = _KodiHourlyWeatherProperties("Hourly.2.")
@@ -125,6 +149,8 @@ class _KodiWeatherProperties:
     HOURLY_22 = _KodiHourlyWeatherProperties("Hourly.22.")
     HOURLY_23 = _KodiHourlyWeatherProperties("Hourly.23.")
     HOURLY_24 = _KodiHourlyWeatherProperties("Hourly.24.")
+    # slots past the classic 24 hours, only written when a longer horizon is configured
+    _HOURLIES_EXTENDED = tuple(_KodiHourlyWeatherProperties(f"Hourly.{i}.") for i in range(25, MAX_HOURLIES + 1))
 
     DAILY_1 = _KodiDailyWeatherProperties("Daily.1.")
     DAILY_2 = _KodiDailyWeatherProperties("Daily.2.")
@@ -133,6 +159,7 @@ class _KodiWeatherProperties:
     DAILY_5 = _KodiDailyWeatherProperties("Daily.5.")
     DAILY_6 = _KodiDailyWeatherProperties("Daily.6.")
     DAILY_7 = _KodiDailyWeatherProperties("Daily.7.")
+    _DAILIES_EXTENDED = tuple(_KodiDailyWeatherProperties(f"Daily.{i}.") for i in range(8, MAX_DAILIES + 1))
 
     DAY0 = _KodiDailyWeatherPropertiesCompat("Day0.")
     DAY1 = _KodiDailyWeatherPropertiesCompat("Day1.")
@@ -143,7 +170,17 @@ class _KodiWeatherProperties:
     DAY6 = _KodiDailyWeatherPropertiesCompat("Day6.")
 
     @classmethod
-    def hourlies(cls) -> Sequence[_KodiHourlyWeatherProperties]:
+    def locations(cls) -> Sequence[str]:
+        return (
+            cls.GENERAL.LOCATION_1,
+            cls.GENERAL.LOCATION_2,
+            cls.GENERAL.LOCATION_3,
+            cls.GENERAL.LOCATION_4,
+            cls.GENERAL.LOCATION_5,
+        )
+
+    @classmethod
+    def hourlies(cls, count: int = 24) -> Sequence[_KodiHourlyWeatherProperties]:
         return (
             cls.HOURLY_1,
             cls.HOURLY_2,
@@ -169,10 +206,11 @@ class _KodiWeatherProperties:
             cls.HOURLY_22,
             cls.HOURLY_23,
             cls.HOURLY_24,
-        )
+            *cls._HOURLIES_EXTENDED,
+        )[:count]
 
     @classmethod
-    def dailies(cls) -> Sequence[_KodiDailyWeatherProperties]:
+    def dailies(cls, count: int = 7) -> Sequence[_KodiDailyWeatherProperties]:
         return (
             cls.DAILY_1,
             cls.DAILY_2,
@@ -181,7 +219,8 @@ class _KodiWeatherProperties:
             cls.DAILY_5,
             cls.DAILY_6,
             cls.DAILY_7,
-        )
+            *cls._DAILIES_EXTENDED,
+        )[:count]
 
     @classmethod
     def dailies_compat(cls) -> Sequence[_KodiDailyWeatherPropertiesCompat]:
@@ -196,11 +235,13 @@ class _KodiWeatherProperties:
         )
 
     @classmethod
-    def all(cls) -> Sequence[_NestedProperties]:
+    def all(cls, hourlies: int = MAX_HOURLIES, dailies: int = MAX_DAILIES) -> Sequence[_NestedProperties]:
+        # every group, or only the first slots of the hourly and daily series
         return (
             _KodiWeatherProperties.GENERAL,
             _KodiWeatherProperties.CURRENT,
-            *cls.hourlies(),
-            *cls.dailies(),
-            *cls.dailies_compat(),
+            _KodiWeatherProperties.SUMMARY,
+            *cls.hourlies(count=hourlies),
+            *cls.dailies(count=dailies),
+            *cls.dailies_compat()[:dailies],
         )
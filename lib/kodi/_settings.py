@@ -1,5 +1,7 @@
+import hashlib
 from dataclasses import dataclass
-from typing import Type, Union
+from types import MappingProxyType
+from typing import Mapping, Sequence, Type, Union
 
 _Setting_Type = Union[bool, int, float, str]
 
@@ -8,3 +10,42 @@ _Setting_Type = Union[bool, int, float, str]
 class KodiPluginSetting:
     setting_id: str
     setting_type: Type[_Setting_Type]
+
+    @classmethod
+    def all(cls) -> Sequence['KodiPluginSetting']:
+        return tuple(value for value in vars(cls).values() if isinstance(value, KodiPluginSetting))
+
+    def coerce(self, value) -> _Setting_Type:
+        # getSetting() fallback returns strings, e.g. "true" or "5"
+        if isinstance(value, self.setting_type) or not isinstance(value, str):
+            return value
+        try:
+            if self.setting_type == bool:
+                return value.lower() == "true"
+            return self.setting_type(value)
+        except ValueError:
+            return self.setting_type()
+
+
+class KodiPluginSettingsSnapshot:
+    __slots__ = ("__values", "__content_hash")
+
+    def __init__(self, values: Mapping[str, _Setting_Type]) -> None:
+        self.__values = MappingProxyType(dict(values))
+        self.__content_hash = hashlib.sha1(repr(sorted(self.__values.items())).encode("utf-8")).hexdigest()
+
+    def get(self, setting: KodiPluginSetting) -> _Setting_Type:
+        return self.__values[setting.setting_id]
+
+    @property
+    def content_hash(self) -> str:
+        return self.__content_hash
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, KodiPluginSettingsSnapshot) and self.__content_hash == other.content_hash
+
+    def __hash__(self) -> int:
+        return hash(self.__content_hash)
+
+    def __repr__(self) -> str:
+        return f"KodiPluginSettingsSnapshot({self.__content_hash[:8]})"
@@ -6,6 +6,7 @@ import xbmc
 class _KodiMagicValues:
     WEATHER_WINDOW_ID = 12600  # see https://kodi.wiki/view/Weather_addons at "Required output"
     ADDON_INFO_PATH_ID = "path"
+    ADDON_INFO_PROFILE_ID = "profile"
     ADDON_INFO_ADDON_ID = "id"
     ADDON_INFO_NAME_ID = "name"
     REGION_TEMPERATURE_UNIT_ID = "tempunit"
@@ -15,6 +16,7 @@ class _KodiMagicValues:
     REGION_LONG_DATE_FORMAT_ID = "datelong"
     MESSAGE_OFFSET_DAY_SHORT = 10
     MESSAGE_OFFSET_DAY_LONG = 40
+    LOG_BUFFER_SIZE = 64
 
 
 class KodiLogLevel(Enum):
@@ -23,3 +25,10 @@ class KodiLogLevel(Enum):
     WARNING = xbmc.LOGWARNING
     ERROR = xbmc.LOGERROR
     CRITICAL = xbmc.LOGFATAL
+
+
+class KodiLogCategory(Enum):
+    GENERAL = "general"
+    HTTP = "http"
+    CONVERT = "convert"
+    PROPERTIES = "properties"
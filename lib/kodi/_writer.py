@@ -0,0 +1,44 @@
+import queue
+import threading
+from typing import Callable, Tuple, Union
+
+import xbmcgui
+
+
+class _KodiPropertyWriter:
+    # The only place that calls Window.setProperty; everyone else enqueues, so that fetch workers never touch the GUI
+    def __init__(self, window: xbmcgui.Window, on_written: Callable[[str, str], None],
+                 on_error: Callable[[str, Exception], None]) -> None:
+        self.__window = window
+        self.__on_written = on_written
+        self.__on_error = on_error
+        self.__queue: "queue.Queue[Tuple[str, str]]" = queue.Queue()
+        self.__thread: Union[threading.Thread, None] = None
+        self.__lock = threading.Lock()
+
+    def put(self, key: str, value: str) -> None:
+        self.__ensure_started()
+        self.__queue.put((key, value))
+
+    def flush(self) -> None:
+        # blocks until every property enqueued so far is visible on the window
+        self.__queue.join()
+
+    def __ensure_started(self) -> None:
+        if self.__thread is not None:
+            return
+        with self.__lock:
+            if self.__thread is None:
+                self.__thread = threading.Thread(target=self.__run, name="weather.ha property writer", daemon=True)
+                self.__thread.start()
+
+    def __run(self) -> None:
+        while True:
+            key, value = self.__queue.get()
+            try:
+                self.__window.setProperty(key=key, value=value)
+                self.__on_written(key, value)
+            except Exception as e:  # the writer has to outlive a single bad property
+                self.__on_error(key, e)
+            finally:
+                self.__queue.task_done()
@@ -1,11 +1,29 @@
 from abc import abstractmethod
+from typing import Any, Dict, Union
 
 
 class _ValueWithUnit:
+    # Immutable value type. Subclasses declare "__slots__ = ()" so instances stay a single slot, and every unit class
+    # shares one instance for a missing value, e.g. TemperatureCelsius(None) is always the same object.
+    __slots__ = ("value",)
     unit: str
+    __missing: Dict[type, "_ValueWithUnit"] = {}
 
-    def __init__(self, value: float):
-        self.value = value
+    def __new__(cls, value: Union[float, None]) -> "_ValueWithUnit":
+        if value is not None:
+            return super().__new__(cls)
+        try:
+            return _ValueWithUnit.__missing[cls]
+        except KeyError:
+            missing = _ValueWithUnit.__missing[cls] = super().__new__(cls)
+            object.__setattr__(missing, "value", None)
+            return missing
+
+    def __init__(self, value: Union[float, None]):
+        object.__setattr__(self, "value", value)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
 
     def __repr__(self) -> str:
         return "{} {}".format(self.value, self.unit)
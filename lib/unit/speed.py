@@ -5,6 +5,7 @@ from ._util import _ValueWithUnit
 
 
 class Speed(_ValueWithUnit):
+    __slots__ = ()
 
     @staticmethod
     @abstractmethod
@@ -42,6 +43,7 @@ _beaufort_mps_conversion_table = {
 
 
 class SpeedKph(Speed):
+    __slots__ = ()
     unit = "km/h"
 
     def si_value(self) -> float:
@@ -55,6 +57,7 @@ class SpeedKph(Speed):
 
 
 class SpeedMpmin(Speed):
+    __slots__ = ()
     unit = "m/min"
 
     def si_value(self) -> float:
@@ -66,6 +69,7 @@ class SpeedMpmin(Speed):
 
 
 class SpeedMps(Speed):
+    __slots__ = ()
     unit = "m/s"
 
     def si_value(self) -> float:
@@ -77,6 +81,7 @@ class SpeedMps(Speed):
 
 
 class SpeedFtph(Speed):
+    __slots__ = ()
     unit = "ft/h"
 
     def si_value(self) -> float:
@@ -92,6 +97,7 @@ class SpeedFtph(Speed):
 
 
 class SpeedFtpm(Speed):
+    __slots__ = ()
     unit = "ft/min"
 
     def si_value(self) -> float:
@@ -107,6 +113,7 @@ class SpeedFtpm(Speed):
 
 
 class SpeedFtps(Speed):
+    __slots__ = ()
     unit = "ft/s"
 
     def si_value(self) -> float:
@@ -118,6 +125,7 @@ class SpeedFtps(Speed):
 
 
 class SpeedMph(Speed):
+    __slots__ = ()
     unit = "mph"
 
     def si_value(self) -> float:
@@ -133,6 +141,7 @@ class SpeedMph(Speed):
 
 
 class SpeedKts(Speed):
+    __slots__ = ()
     unit = "kts"    # kts = nm/h
 
     def si_value(self) -> float:
@@ -148,6 +157,7 @@ class SpeedKts(Speed):
 
 
 class SpeedBft(Speed):
+    __slots__ = ()
     unit = "Beaufort"
 
     def si_value(self) -> float:
@@ -162,6 +172,7 @@ class SpeedBft(Speed):
 
 
 class SpeedInps(Speed):
+    __slots__ = ()
     unit = "inch/s"
 
     def si_value(self) -> float:
@@ -173,6 +184,7 @@ class SpeedInps(Speed):
 
 
 class SpeedYdps(Speed):
+    __slots__ = ()
     unit = "yard/s"
 
     def si_value(self) -> float:
@@ -186,6 +198,7 @@ class SpeedYdps(Speed):
 
 
 class SpeedFpf(Speed):
+    __slots__ = ()
     unit = "Furlong/Fortnight"
 
     def si_value(self) -> float:
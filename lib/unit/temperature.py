@@ -5,6 +5,7 @@ from ._util import _ValueWithUnit
 
 
 class Temperature(_ValueWithUnit):
+    __slots__ = ()
 
     @staticmethod
     @abstractmethod
@@ -14,6 +15,7 @@ class Temperature(_ValueWithUnit):
 
 # Conversions see https://en.wikipedia.org/wiki/Conversion_of_scales_of_temperature
 class TemperatureCelsius(Temperature):
+    __slots__ = ()
     unit = "°C"
 
     def si_value(self) -> float:
@@ -25,6 +27,7 @@ class TemperatureCelsius(Temperature):
 
 
 class TemperatureFahrenheit(Temperature):
+    __slots__ = ()
     unit = "°F"
 
     def si_value(self) -> float:
@@ -36,6 +39,7 @@ class TemperatureFahrenheit(Temperature):
 
 
 class TemperatureKelvin(Temperature):
+    __slots__ = ()
     unit = "K"
 
     def si_value(self) -> float:
@@ -47,6 +51,7 @@ class TemperatureKelvin(Temperature):
 
 
 class TemperatureRankine(Temperature):
+    __slots__ = ()
     unit = "°Ra"
 
     def si_value(self) -> float:
@@ -58,6 +63,7 @@ class TemperatureRankine(Temperature):
 
 
 class TemperatureReaumur(Temperature):
+    __slots__ = ()
     unit = "°Ré"
 
     def si_value(self) -> float:
@@ -69,6 +75,7 @@ class TemperatureReaumur(Temperature):
 
 
 class TemperatureRomer(Temperature):
+    __slots__ = ()
     unit = "°Rø"
 
     def si_value(self) -> float:
@@ -80,6 +87,7 @@ class TemperatureRomer(Temperature):
 
 
 class TemperatureDelisle(Temperature):
+    __slots__ = ()
     unit = "°De"
 
     def si_value(self) -> float:
@@ -91,6 +99,7 @@ class TemperatureDelisle(Temperature):
 
 
 class TemperatureNewton(Temperature):
+    __slots__ = ()
     unit = "°N"
 
     def si_value(self) -> float:
@@ -0,0 +1,56 @@
+import time
+from typing import Callable, Union
+
+
+class OperationCancelled(Exception):
+    def __init__(self, reason: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CancellationToken:
+    REASON_DEADLINE = "deadline"
+    REASON_ABORT = "abort"
+    # requests refuses a timeout of 0, a budget running out between the check and the call gets this much instead
+    MIN_TIMEOUT = 0.01
+
+    def __init__(self, timeout: Union[float, None] = None, is_aborted: Union[Callable[[], bool], None] = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self._deadline = clock() + timeout if timeout is not None else None
+        self._is_aborted = is_aborted
+        self._reason: Union[str, None] = None
+
+    @property
+    def remaining(self) -> Union[float, None]:
+        # seconds left in the budget, None for no deadline
+        if self._deadline is None:
+            return None
+        return max(0.0, self._deadline - self._clock())
+
+    @property
+    def reason(self) -> Union[str, None]:
+        if self._reason is None:
+            if self._is_aborted is not None and self._is_aborted():
+                self._reason = CancellationToken.REASON_ABORT
+            elif self._deadline is not None and self._clock() >= self._deadline:
+                self._reason = CancellationToken.REASON_DEADLINE
+        return self._reason
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def cancel(self, reason: str) -> None:
+        self._reason = reason
+
+    def raise_if_cancelled(self) -> None:
+        if self.cancelled:
+            raise OperationCancelled(reason=self._reason)
+
+    def timeout(self, default: Union[float, None] = None) -> Union[float, None]:
+        # a per-call timeout that never outlives the budget
+        remaining = self.remaining
+        if remaining is None:
+            return default
+        return max(CancellationToken.MIN_TIMEOUT, remaining if default is None else min(default, remaining))
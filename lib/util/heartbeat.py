@@ -0,0 +1,48 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Union
+
+
+class Heartbeat:
+    # Proof of life of a long-running loop for other processes, e.g. the service for the weather entry point. The loop
+    # beats once per iteration; a refresh may take longer than the timeout the readers allow, so while the loop is busy
+    # a thread of its own keeps beating - for a bounded time only, a loop stuck for good has to go silent.
+    def __init__(self, publish: Callable[[str], None], interval: float,
+                 clock: Callable[[], float] = time.time) -> None:
+        self._publish = publish
+        self.interval = interval
+        self._clock = clock
+
+    def beat(self) -> None:
+        self._publish(str(self._clock()))
+
+    @contextmanager
+    def busy(self, limit: float) -> Iterator[None]:
+        # beats every interval until the block is left or limit seconds passed
+        done = threading.Event()
+
+        def run() -> None:
+            deadline = time.monotonic() + limit
+            while not done.wait(min(self.interval, max(0.0, deadline - time.monotonic()))):
+                if time.monotonic() >= deadline:
+                    return
+                self.beat()
+
+        self.beat()
+        thread = threading.Thread(target=run, name="heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            done.set()
+            thread.join()
+            self.beat()
+
+    @staticmethod
+    def alive(value: Union[str, None], timeout: float, now: Union[float, None] = None) -> bool:
+        # value as published, an empty or garbled one reads as no heartbeat at all
+        try:
+            return (time.time() if now is None else now) - float(value) < timeout
+        except (TypeError, ValueError):
+            return False
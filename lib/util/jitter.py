@@ -0,0 +1,9 @@
+import hashlib
+
+
+def device_jitter(device_id: str, key: str, interval: float, spread: float = 0.1, max_jitter: float = 300.0) -> float:
+    # Deterministic offset in [0, min(interval * spread, max_jitter)) seconds. Every device of a fleet lands on its
+    # own spot of the interval, and keeps it across restarts, so boxes on the same schedule don't refresh in lockstep.
+    digest = hashlib.sha256(f"{device_id}:{key}".encode("utf-8")).digest()
+    fraction = int.from_bytes(digest[:8], "big") / 2 ** 64
+    return fraction * min(interval * spread, max_jitter)
@@ -0,0 +1,32 @@
+from typing import Any, Callable, Generic, TypeVar, Union, overload
+
+_Value = TypeVar("_Value")
+
+
+class cached_slot(Generic[_Value]):
+    # Like a property, computed on first access and kept in the slot named after it with a leading underscore, e.g.
+    # "temperature" is cached in "_temperature". Made for classes with __slots__, which have no __dict__ to cache in.
+    def __init__(self, compute: Callable[[Any], _Value]) -> None:
+        self._compute = compute
+        self._slot = "_" + compute.__name__
+        self.__doc__ = compute.__doc__
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self._slot = "_" + name
+
+    @overload
+    def __get__(self, instance: None, owner: type) -> "cached_slot[_Value]": ...
+
+    @overload
+    def __get__(self, instance: object, owner: type) -> _Value: ...
+
+    def __get__(self, instance: Union[object, None], owner: type) -> Union[_Value, "cached_slot[_Value]"]:
+        if instance is None:
+            return self
+        try:
+            return getattr(instance, self._slot)
+        except AttributeError:
+            pass    # not computed yet, an empty slot raises AttributeError
+        value = self._compute(instance)
+        setattr(instance, self._slot, value)
+        return value
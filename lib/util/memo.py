@@ -0,0 +1,36 @@
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, TypeVar
+
+_Value = TypeVar("_Value")
+
+
+class BoundedMemo(Generic[_Value]):
+    # Least recently used cache of computed values. hits/misses count since the last reset_counts(), e.g. per refresh.
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self._values: "OrderedDict[Hashable, _Value]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def get(self, key: Hashable, create: Callable[[], _Value]) -> _Value:
+        try:
+            value = self._values[key]
+        except KeyError:
+            self.misses += 1
+            value = self._values[key] = create()
+            if len(self._values) > self.capacity:
+                self._values.popitem(last=False)
+            return value
+        self.hits += 1
+        self._values.move_to_end(key)
+        return value
+
+    def reset_counts(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self) -> None:
+        self._values.clear()
@@ -0,0 +1,95 @@
+import json
+import os
+import time
+from typing import Any, Callable, Dict, Union
+
+from lib.util.cancellation import CancellationToken, OperationCancelled
+from lib.util.single_flight import SingleFlight
+
+
+class TokenBucket:
+    # Caps requests per minute for every process of the device: the bucket lives in a file of the add-on profile and
+    # is updated under a short lock-file lease. block() stops everybody for a while, e.g. after HTTP 429.
+    LOCK_LEASE = 5.0    # seconds, only held for a read-modify-write of the bucket file
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, path: str, rate_per_minute: float, burst: Union[float, None] = None,
+                 clock: Callable[[], float] = time.time,
+                 sleep: Callable[[float], Any] = time.sleep) -> None:
+        self.path = path
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst if burst is not None else max(1.0, rate_per_minute / 6)  # ten seconds worth
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = SingleFlight(
+            path=path + ".lock", lease=self.LOCK_LEASE, poll_interval=self.POLL_INTERVAL, clock=clock,
+            sleep=lambda seconds: sleep(seconds) or False
+        )
+
+    def acquire(self, cancellation: Union[CancellationToken, None] = None) -> float:
+        # takes one token, waiting for it if needed; returns the seconds waited.
+        # Raises OperationCancelled right away if the wait would not fit into the remaining budget.
+        waited = 0.0
+        while True:
+            wait = self.__update(take=True)
+            if wait <= 0:
+                return waited
+            if cancellation is not None:
+                cancellation.raise_if_cancelled()
+                remaining = cancellation.remaining
+                if remaining is not None and wait > remaining:
+                    cancellation.cancel(CancellationToken.REASON_DEADLINE)
+                    raise OperationCancelled(reason=CancellationToken.REASON_DEADLINE)
+            # short naps keep shutdown responsive while waiting out a long block
+            nap = min(wait, 1.0)
+            self._sleep(nap)
+            waited += nap
+
+    def block(self, seconds: float) -> None:
+        # nobody on this device sends a request for the given time
+        self.__update(take=False, block_until=self._clock() + seconds)
+
+    def blocked_for(self) -> float:
+        return max(0.0, self.__read().get("blocked_until", 0.0) - self._clock())
+
+    def __update(self, take: bool, block_until: float = 0.0) -> float:
+        token = None
+        while token is None:
+            token = self._lock.acquire(key="bucket")
+            if token is None:
+                self._sleep(self.POLL_INTERVAL)
+        try:
+            now = self._clock()
+            state = self.__read()
+            tokens = state.get("tokens", self.burst)
+            updated = state.get("updated", now)
+            blocked_until = max(state.get("blocked_until", 0.0), block_until)
+            if updated > now:
+                updated = now   # the wall clock went back, don't hand out tokens for the future
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            wait = 0.0
+            if blocked_until > now:
+                wait = blocked_until - now
+            elif take:
+                if tokens >= 1:
+                    tokens -= 1
+                else:
+                    wait = (1 - tokens) / self.rate
+            self.__write({"tokens": tokens, "updated": now, "blocked_until": blocked_until})
+            return wait
+        finally:
+            self._lock.release(token=token, key="bucket", completed=False)
+
+    def __read(self) -> Dict[str, float]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return state if isinstance(state, dict) else {}
+
+    def __write(self, state: Dict[str, float]) -> None:
+        temporary_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(temporary_path, self.path)
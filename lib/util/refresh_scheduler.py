@@ -0,0 +1,91 @@
+import time
+from enum import Enum
+from typing import Callable, Dict, Mapping, Set, Union
+
+
+class RefreshTier(Enum):
+    CURRENT = "current"
+    HOURLY = "hourly"
+    DAILY = "daily"
+    SUN = "sun"
+
+
+_Jitter = Callable[[RefreshTier, float], float]
+_RETRY_DELAY = 30.0         # seconds before the first retry of a failed tier, doubled with every further failure
+_MAX_RETRY_DELAY = 900.0    # the delay never grows past this, nor past the interval of the tier
+
+
+class RefreshScheduler:
+    def __init__(self, intervals: Mapping[RefreshTier, float], clock: Callable[[], float] = time.monotonic,
+                 jitter: Union[_Jitter, None] = None) -> None:
+        # intervals in seconds; a tier that was never fetched is always due.
+        # jitter(tier, interval) delays the automatic deadlines, not what an explicit refresh considers due.
+        self._intervals: Dict[RefreshTier, float] = dict(intervals)
+        self._clock = clock
+        self._jitter = jitter
+        self._fetched_at: Dict[RefreshTier, float] = {}
+        # failed tiers back off exponentially instead of being retried on every check of the deadline
+        self._failures: Dict[RefreshTier, int] = {}
+        self._retry_at: Dict[RefreshTier, float] = {}
+        self._started = clock()
+        self._cycles = 0
+        self._requests_saved = 0
+
+    def set_interval(self, tier: RefreshTier, seconds: float) -> None:
+        self._intervals[tier] = seconds
+
+    def deadline(self, tier: RefreshTier) -> float:
+        offset = self._jitter(tier, self._intervals[tier]) if self._jitter is not None else 0.0
+        if tier not in self._fetched_at:
+            deadline = self._started + offset
+        else:
+            deadline = self._fetched_at[tier] + self._intervals[tier] + offset
+        return max(deadline, self._retry_at.get(tier, deadline))
+
+    def next_deadline(self) -> float:
+        return min(self.deadline(tier) for tier in self._intervals)
+
+    def due_tiers(self, now: Union[float, None] = None) -> Set[RefreshTier]:
+        now = self._clock() if now is None else now
+        return {
+            tier for tier in self._intervals
+            if (tier not in self._fetched_at or self._fetched_at[tier] + self._intervals[tier] <= now)
+            and self._retry_at.get(tier, now) <= now
+        }
+
+    def begin_cycle(self, now: Union[float, None] = None) -> Set[RefreshTier]:
+        # every tier that is not due is one request the old fetch-everything refresh would have made
+        due = self.due_tiers(now=now)
+        self._cycles += 1
+        self._requests_saved += len(self._intervals) - len(due)
+        return due
+
+    def mark_fetched(self, tier: RefreshTier, now: Union[float, None] = None) -> None:
+        self._fetched_at[tier] = self._clock() if now is None else now
+        self._failures.pop(tier, None)
+        self._retry_at.pop(tier, None)
+
+    def mark_failed(self, tier: RefreshTier, now: Union[float, None] = None) -> float:
+        # returns the delay until the tier is due again; the jitter keeps a fleet from retrying in lockstep
+        now = self._clock() if now is None else now
+        failures = self._failures.get(tier, 0) + 1
+        self._failures[tier] = failures
+        delay = min(_RETRY_DELAY * 2 ** (failures - 1), _MAX_RETRY_DELAY, self._intervals[tier])
+        delay += self._jitter(tier, delay) if self._jitter is not None else 0.0
+        self._retry_at[tier] = now + delay
+        return delay
+
+    def invalidate(self) -> None:
+        # an explicit invalidation retries failed tiers right away as well
+        self._fetched_at.clear()
+        self._failures.clear()
+        self._retry_at.clear()
+
+    @property
+    def requests_saved(self) -> int:
+        return self._requests_saved
+
+    def requests_saved_per_hour(self, now: Union[float, None] = None) -> float:
+        now = self._clock() if now is None else now
+        hours = max(now - self._started, 1.0) / 3600
+        return self._requests_saved / hours
@@ -0,0 +1,130 @@
+import json
+import os
+import time
+import uuid
+from typing import Any, Callable, Dict, Union
+
+
+class SingleFlight:
+    # Cross-process "only one refresh at a time" built on a lock file holding a lease. Kodi may start the weather
+    # script several times within a second; the first one takes the lease and does the work, the others wait for it
+    # and reuse its result (the window properties are shared by all processes) instead of fetching again.
+    #
+    # A lease from a crashed process simply expires. Breaking a stale lease is rename-then-verify, so in the rare
+    # case of a lost race the worst outcome is one duplicate refresh, never a deadlock.
+    def __init__(self, path: str, lease: float, poll_interval: float = 0.25,
+                 clock: Callable[[], float] = time.time,
+                 sleep: Callable[[float], bool] = lambda seconds: time.sleep(seconds) or False) -> None:
+        # sleep returns True to give up waiting, e.g. when Kodi shuts down
+        self.path = path
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self._clock = clock
+        self._sleep = sleep
+
+    @property
+    def done_path(self) -> str:
+        return self.path + ".done"
+
+    def run(self, key: str, action: Callable[[], bool], fresh_for: float = 0) -> bool:
+        # returns True if this process ran the action, False if a refresh of another process was reused.
+        # Only an action returning True leaves a result for others to reuse.
+        while True:
+            if self.is_fresh(key=key, fresh_for=fresh_for):
+                return False
+            token = self.acquire(key=key)
+            if token is not None:
+                break
+            if self._sleep(self.poll_interval):
+                return False
+        completed = False
+        try:
+            # the previous holder may have finished between the freshness check and taking the lease
+            if self.is_fresh(key=key, fresh_for=fresh_for):
+                return False
+            completed = action()
+            return True
+        finally:
+            self.release(token=token, key=key, completed=completed)
+
+    def is_fresh(self, key: str, fresh_for: float) -> bool:
+        if fresh_for <= 0:
+            return False
+        done = self.__read(self.done_path)
+        if done is None or done.get("key") != key:
+            return False
+        age = self._clock() - done.get("finished", 0)
+        return 0 <= age <= fresh_for
+
+    def acquire(self, key: str) -> Union[str, None]:
+        token = uuid.uuid4().hex
+        lease = {"key": key, "token": token, "pid": os.getpid(), "expires": self._clock() + self.lease}
+        try:
+            fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            held = self.__read(self.path)
+            # unreadable: still being written, or left empty by a crash right after creating it
+            stale = self.__unreadable_expired() if held is None else self.__expired(held)
+            if stale and self.__break():
+                return self.acquire(key=key)
+            return None
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(lease, f)
+        return token
+
+    def release(self, token: str, key: str, completed: bool) -> None:
+        if completed:
+            self.__write(self.done_path, {"key": key, "finished": self._clock()})
+        held = self.__read(self.path)
+        if held is not None and held.get("token") == token:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def __expired(self, lease: Dict[str, Any]) -> bool:
+        remaining = lease.get("expires", 0) - self._clock()
+        # a lease reaching further than a full term means the wall clock went back, don't trust it
+        return remaining <= 0 or remaining > self.lease
+
+    def __unreadable_expired(self) -> bool:
+        try:
+            return time.time() - os.stat(self.path).st_mtime > self.lease    # file times are always wall clock
+        except OSError:
+            return False
+
+    def __break(self) -> bool:
+        grave = f"{self.path}.{uuid.uuid4().hex}.stale"
+        try:
+            os.rename(self.path, grave)
+        except OSError:
+            return False    # released or broken by someone else in the meantime
+        broken = self.__read(grave)
+        if broken is not None and not self.__expired(broken):
+            # a fresh lease was taken between reading and renaming, hand it back
+            try:
+                os.replace(grave, self.path)
+            except OSError:
+                pass
+            return False
+        try:
+            os.remove(grave)
+        except OSError:
+            pass
+        return True
+
+    @staticmethod
+    def __read(path: str) -> Union[Dict[str, Any], None]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                content = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return content if isinstance(content, dict) else None
+
+    @staticmethod
+    def __write(path: str, content: Dict[str, Any]) -> None:
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump(content, f)
+        os.replace(temporary_path, path)
@@ -0,0 +1,22 @@
+from dataclasses import fields
+from itertools import chain
+from typing import Type, TypeVar
+
+_Class = TypeVar("_Class", bound=type)
+
+
+def dataclass_slots(cls: _Class) -> _Class:
+    # dataclass(slots=True) for the Python 3.8 of Kodi 19/20, applied on top of @dataclass. Fields already slotted by
+    # a base aren't repeated; mixins declare "__slots__ = ()" so that only the concrete class holds the values.
+    # Like the original, this creates a new class: methods must not use the zero-argument super().
+    namespace = dict(cls.__dict__)
+    names = tuple(field.name for field in fields(cls))
+    inherited = set(chain.from_iterable(getattr(base, "__slots__", ()) for base in cls.__mro__[1:]))
+    namespace["__slots__"] = tuple(name for name in names if name not in inherited)
+    for name in names:
+        namespace.pop(name, None)   # defaults are class attributes, they live in __init__ already
+    namespace.pop("__dict__", None)
+    namespace.pop("__weakref__", None)
+    slotted: Type = type(cls)(cls.__name__, cls.__bases__, namespace)
+    slotted.__qualname__ = cls.__qualname__
+    return slotted
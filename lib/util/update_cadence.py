@@ -0,0 +1,59 @@
+import json
+import os
+from typing import Any, Dict, Union
+
+
+class UpdateCadenceEstimator:
+    # Learns how often an upstream entity changes from its last_updated timestamps (EWMA of the gaps between
+    # observed updates) and schedules the next poll just after the predicted change.
+    def __init__(self, min_interval: float, max_interval: float, smoothing: float = 0.3, margin: float = 30.0) -> None:
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.smoothing = smoothing
+        self.margin = margin
+        self.cadence: Union[float, None] = None
+        self.last_update: Union[float, None] = None
+        self.misses = 0
+
+    def observe(self, last_update: float) -> bool:
+        # returns True if the entity changed since the previous observation
+        if self.last_update is not None and last_update <= self.last_update:
+            self.misses += 1
+            return False
+        if self.last_update is not None:
+            gap = last_update - self.last_update
+            self.cadence = gap if self.cadence is None else self.smoothing * gap + (1 - self.smoothing) * self.cadence
+        self.last_update = last_update
+        self.misses = 0
+        return True
+
+    def next_poll_delay(self, now: float) -> float:
+        if self.cadence is None or self.last_update is None:
+            delay = self.min_interval
+        else:
+            delay = self.last_update + self.cadence + self.margin - now
+            if delay <= 0 or self.misses:
+                # the predicted update did not show up, back off instead of hammering the entity
+                delay = self.min_interval * 2 ** self.misses
+        return min(self.max_interval, max(self.min_interval, delay))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"cadence": self.cadence, "last_update": self.last_update, "misses": self.misses}
+
+    def load(self, path: str, key: str) -> None:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return
+        if state.get("key") != key:
+            return  # learned for another server or entity
+        self.cadence = state.get("cadence")
+        self.last_update = state.get("last_update")
+        self.misses = state.get("misses", 0)
+
+    def save(self, path: str, key: str) -> None:
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            json.dump({"key": key, **self.to_dict()}, f)
+        os.replace(temporary_path, path)
@@ -1 +1,2 @@
 from ._plugin import KodiHomeAssistantWeatherPlugin
+from ._service import KodiHomeAssistantWeatherService
@@ -1,6 +1,13 @@
+import os.path
+import uuid
+from dataclasses import dataclass
 from enum import IntEnum
+from typing import Callable, Dict, List, Tuple, Union
 
-from lib.kodi import KodiWeatherPluginAdapter, KodiPluginSetting
+from lib.kodi import KodiWeatherPluginAdapter, KodiPluginSetting, KodiLogCategory, KodiPluginMonitor, KodiOutputProfile
+from lib.util.refresh_scheduler import RefreshTier
+
+_DEVICE_ID_FILE = "device_id"
 
 
 class _HomeAssistantWeatherPluginSettings(KodiPluginSetting):
@@ -12,11 +19,58 @@ class _HomeAssistantWeatherPluginSettings(KodiPluginSetting):
         setting_id="ha_weather_forecast_entity_id", setting_type=str
     )
     HOME_ASSISTANT_SUN_ENTITY_ID = KodiPluginSetting(setting_id="ha_sun_entity_id", setting_type=str)
+    OVERLAY_TEMPERATURE = KodiPluginSetting(setting_id="overlay_temperature", setting_type=str)
+    OVERLAY_HUMIDITY = KodiPluginSetting(setting_id="overlay_humidity", setting_type=str)
+    OVERLAY_DEW_POINT = KodiPluginSetting(setting_id="overlay_dew_point", setting_type=str)
+    OVERLAY_PRESSURE = KodiPluginSetting(setting_id="overlay_pressure", setting_type=str)
+    OVERLAY_WIND_SPEED = KodiPluginSetting(setting_id="overlay_wind_speed", setting_type=str)
     LOG_ENABLED = KodiPluginSetting(setting_id="logEnabled", setting_type=bool)
+    LOG_HTTP = KodiPluginSetting(setting_id="logHttp", setting_type=bool)
+    LOG_CONVERT = KodiPluginSetting(setting_id="logConvert", setting_type=bool)
+    LOG_PROPERTIES = KodiPluginSetting(setting_id="logProperties", setting_type=bool)
     CHECK_SSL =  KodiPluginSetting(setting_id="ha_check_ssl", setting_type=bool)
     REQUEST_ATTEMPTS =  KodiPluginSetting(setting_id="ha_request_attempts", setting_type=int)
     ERR_NOT_INFORM = KodiPluginSetting(setting_id="errNotInform", setting_type=bool)
     REMOVE_SECONDS = KodiPluginSetting(setting_id="remove_seconds", setting_type=bool)
+    HOURLY_SLOTS = KodiPluginSetting(setting_id="hourly_slots", setting_type=int)
+    DAILY_SLOTS = KodiPluginSetting(setting_id="daily_slots", setting_type=int)
+    PROGRESSIVE_PUBLISHING = KodiPluginSetting(setting_id="progressive_publishing", setting_type=bool)
+    SERVICE_ENABLED = KodiPluginSetting(setting_id="service_enabled", setting_type=bool)
+    REFRESH_INTERVAL_CURRENT = KodiPluginSetting(setting_id="refresh_interval_current", setting_type=int)
+    REFRESH_INTERVAL_HOURLY = KodiPluginSetting(setting_id="refresh_interval_hourly", setting_type=int)
+    REFRESH_INTERVAL_DAILY = KodiPluginSetting(setting_id="refresh_interval_daily", setting_type=int)
+    REFRESH_INTERVAL_SUN = KodiPluginSetting(setting_id="refresh_interval_sun", setting_type=int)
+    ADAPTIVE_POLLING = KodiPluginSetting(setting_id="adaptive_polling", setting_type=bool)
+    REFRESH_BUDGET = KodiPluginSetting(setting_id="refresh_budget", setting_type=int)
+    REFRESH_FRESHNESS = KodiPluginSetting(setting_id="refresh_freshness", setting_type=int)
+    REQUESTS_PER_MINUTE = KodiPluginSetting(setting_id="requests_per_minute", setting_type=int)
+    HISTORY_DAYS = KodiPluginSetting(setting_id="history_days", setting_type=int)
+    DERIVE_DAILY = KodiPluginSetting(setting_id="derive_daily", setting_type=bool)
+    INTERPOLATION_AGE = KodiPluginSetting(setting_id="interpolation_age", setting_type=int)
+    OUTPUT_PROFILE = KodiPluginSetting(setting_id="output_profile", setting_type=int)
+    RELAY_MODE = KodiPluginSetting(setting_id="relay_mode", setting_type=int)
+    RELAY_URL = KodiPluginSetting(setting_id="relay_url", setting_type=str)
+    RELAY_PORT = KodiPluginSetting(setting_id="relay_port", setting_type=int)
+    RELAY_KEY = KodiPluginSetting(setting_id="relay_key", setting_type=str)
+    LOCATIONS = KodiPluginSetting(setting_id="locations", setting_type=int)
+
+    @classmethod
+    def all(cls) -> Tuple[KodiPluginSetting, ...]:
+        return tuple(super().all()) + tuple(setting for location in _LOCATION_SETTINGS for setting in location)
+
+
+def _location_settings(index: int) -> Tuple[KodiPluginSetting, KodiPluginSetting, KodiPluginSetting]:
+    # title, weather entity and sun entity of an additional location, e.g. loc2_title for the second one
+    return (
+        KodiPluginSetting(setting_id=f"loc{index}_title", setting_type=str),
+        KodiPluginSetting(setting_id=f"loc{index}_weather_forecast_entity_id", setting_type=str),
+        KodiPluginSetting(setting_id=f"loc{index}_sun_entity_id", setting_type=str),
+    )
+
+
+_LOCATION_SETTINGS = tuple(
+    _location_settings(index) for index in range(2, KodiWeatherPluginAdapter.MAX_LOCATIONS + 1)
+)
 
 
 class _HomeAssistantWeatherPluginStrings(IntEnum):
@@ -27,54 +81,256 @@ class _HomeAssistantWeatherPluginStrings(IntEnum):
     ADDON_SHORT_NAME = 30200
 
 
+class _RelayMode(IntEnum):
+    OFF = 0
+    SERVER = 1      # fetches from Home Assistant and serves the other instances
+    CLIENT = 2      # reads from the relay of another instance instead of Home Assistant
+
+
+@dataclass(frozen=True)
+class _HomeAssistantWeatherLocation:
+    index: int              # 1-based, as passed by Kodi
+    title: str              # empty if the name reported by Home Assistant is used
+    forecast_entity: str
+    sun_entity: str
+    # (field of the current conditions, sensor entity id) pairs replacing values of the weather entity
+    overlay: Tuple[Tuple[str, str], ...] = ()
+
+
 class _KodiHomeAssistantWeatherPluginAdapter(KodiWeatherPluginAdapter):
     def __init__(self) -> None:
         super().__init__()
-        self._allow_logging = self._get_setting(setting=_HomeAssistantWeatherPluginSettings.LOG_ENABLED)
+        self.settings = self._load_settings(settings=_HomeAssistantWeatherPluginSettings.all())
+        self.__device_id: Union[str, None] = None     # read or created on first use, see device_id
+        self.__apply_log_settings()
+
+    def __apply_log_settings(self) -> None:
+        self._allow_logging = self.settings.get(_HomeAssistantWeatherPluginSettings.LOG_ENABLED)
+        self._verbose_log_categories = {KodiLogCategory.GENERAL}
+        for category, setting in (
+                (KodiLogCategory.HTTP, _HomeAssistantWeatherPluginSettings.LOG_HTTP),
+                (KodiLogCategory.CONVERT, _HomeAssistantWeatherPluginSettings.LOG_CONVERT),
+                (KodiLogCategory.PROPERTIES, _HomeAssistantWeatherPluginSettings.LOG_PROPERTIES),
+        ):
+            if self.settings.get(setting):
+                self._verbose_log_categories.add(category)
+
+    def reload_settings(self) -> bool:
+        snapshot = self._load_settings(settings=_HomeAssistantWeatherPluginSettings.all(), reload=True)
+        if snapshot == self.settings:
+            return False
+        self.settings = snapshot
+        self.__apply_log_settings()
+        self.log("Settings changed, new snapshot %s", snapshot)
+        return True
+
+    def watch_settings(self, on_notification: Union[Callable[[str, str, str], None], None] = None) -> KodiPluginMonitor:
+        # keep a reference to the returned monitor for as long as the process should follow settings changes
+        return KodiPluginMonitor(on_settings_changed=self.reload_settings, on_notification=on_notification)
 
     def required_settings_done(self) -> bool:
         return (
-            bool(self.home_assistant_token)
-            and bool(self.home_assistant_url)
+            # the relay key is optional, the token only matters when talking to Home Assistant
+            (bool(self.home_assistant_token) or self.relay_mode == _RelayMode.CLIENT)
+            and bool(self.source_url)
             and bool(self.home_assistant_entity_forecast)
             and bool(self.home_assistant_entity_sun)
         )
     @property
     def get_check_ssl(self) -> bool:
-        return self._get_setting(setting=_HomeAssistantWeatherPluginSettings.CHECK_SSL)
+        return self.settings.get(_HomeAssistantWeatherPluginSettings.CHECK_SSL)
 
     @property
     def remove_seconds(self) -> bool:
-        return self._get_setting(setting=_HomeAssistantWeatherPluginSettings.REMOVE_SECONDS)
+        return self.settings.get(_HomeAssistantWeatherPluginSettings.REMOVE_SECONDS)
 
     @property
     def get_err_not_inform(self) -> bool:
-        return self._get_setting(setting=_HomeAssistantWeatherPluginSettings.ERR_NOT_INFORM)
+        return self.settings.get(_HomeAssistantWeatherPluginSettings.ERR_NOT_INFORM)
+
 
+    @property
+    def hourly_slots(self) -> int:
+        return self.settings.get(_HomeAssistantWeatherPluginSettings.HOURLY_SLOTS) or 24
+
+    @property
+    def daily_slots(self) -> int:
+        return self.settings.get(_HomeAssistantWeatherPluginSettings.DAILY_SLOTS) or 7
+
+    @property
+    def progressive_publishing(self) -> bool:
+        return self.settings.get(_HomeAssistantWeatherPluginSettings.PROGRESSIVE_PUBLISHING)
+
+    @property
+    def service_enabled(self) -> bool:
+        return self.settings.get(_HomeAssistantWeatherPluginSettings.SERVICE_ENABLED)
+
+    @property
+    def adaptive_polling(self) -> bool:
+        return self.settings.get(_HomeAssistantWeatherPluginSettings.ADAPTIVE_POLLING)
+
+    @property
+    def refresh_budget(self) -> float:
+        # seconds a single refresh may take before the remaining stages are cut
+        return max(1, self.settings.get(_HomeAssistantWeatherPluginSettings.REFRESH_BUDGET) or 30)
+
+    @property
+    def refresh_freshness(self) -> float:
+        # seconds within which a finished refresh of another invocation is reused, 0 disables reuse
+        return max(0, self.settings.get(_HomeAssistantWeatherPluginSettings.REFRESH_FRESHNESS))
+
+    @property
+    def requests_per_minute(self) -> int:
+        # requests to Home Assistant all processes of this device may send per minute, 0 disables the limit
+        return max(0, self.settings.get(_HomeAssistantWeatherPluginSettings.REQUESTS_PER_MINUTE))
+
+    @property
+    def history_days(self) -> int:
+        # days of observations and issued forecasts kept in the profile, 0 disables the archive
+        return max(0, self.settings.get(_HomeAssistantWeatherPluginSettings.HISTORY_DAYS))
+
+    @property
+    def derive_daily(self) -> bool:
+        # skips the daily request, the days are resampled from the hourly forecast
+        return self.settings.get(_HomeAssistantWeatherPluginSettings.DERIVE_DAILY)
+
+    @property
+    def interpolation_age(self) -> float:
+        # seconds the current conditions are estimated from the hourly forecast before a fetch is forced, 0 disables
+        return max(0, self.settings.get(_HomeAssistantWeatherPluginSettings.INTERPOLATION_AGE) or 0) * 60
+
+    @property
+    def device_id(self) -> str:
+        # random and stable per installation, spreads the refreshes of a fleet sharing one Home Assistant. Kept for
+        # the life of the adapter, so that a profile that can't be written still gives one id per process
+        if self.__device_id is None:
+            self.__device_id = self.__load_device_id()
+        return self.__device_id
+
+    def __load_device_id(self) -> str:
+        path = os.path.join(self.profile_path, _DEVICE_ID_FILE)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                device_id = f.read().strip()
+        except OSError:
+            device_id = ""
+        if not device_id:
+            device_id = uuid.uuid4().hex
+            try:
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(device_id)
+            except OSError:
+                pass    # jitter is then random per process, which still spreads the fleet
+        return device_id
+
+    @property
+    def refresh_intervals(self) -> Dict[RefreshTier, float]:
+        # configured in minutes, scheduled in seconds
+        intervals = {
+            tier: max(1, self.settings.get(setting) or default) * 60
+            for tier, setting, default in (
+                (RefreshTier.CURRENT, _HomeAssistantWeatherPluginSettings.REFRESH_INTERVAL_CURRENT, 5),
+                (RefreshTier.HOURLY, _HomeAssistantWeatherPluginSettings.REFRESH_INTERVAL_HOURLY, 60),
+                (RefreshTier.DAILY, _HomeAssistantWeatherPluginSettings.REFRESH_INTERVAL_DAILY, 360),
+                (RefreshTier.SUN, _HomeAssistantWeatherPluginSettings.REFRESH_INTERVAL_SUN, 720),
+            )
+        }
+        if self.interpolation_age:
+            # between fetches the current conditions are estimated, the age limit is what forces the next fetch
+            intervals[RefreshTier.CURRENT] = self.interpolation_age
+        return intervals
+
+    @property
+    def output_profile(self) -> KodiOutputProfile:
+        try:
+            return KodiOutputProfile(self.settings.get(_HomeAssistantWeatherPluginSettings.OUTPUT_PROFILE))
+        except ValueError:
+            return KodiOutputProfile.FULL
+
+    @property
+    def relay_mode(self) -> _RelayMode:
+        try:
+            return _RelayMode(self.settings.get(_HomeAssistantWeatherPluginSettings.RELAY_MODE))
+        except ValueError:
+            return _RelayMode.OFF
+
+    @property
+    def relay_port(self) -> int:
+        return self.settings.get(_HomeAssistantWeatherPluginSettings.RELAY_PORT) or 8765
+
+    @property
+    def relay_key(self) -> str:
+        return self.settings.get(_HomeAssistantWeatherPluginSettings.RELAY_KEY)
+
+    @property
+    def source_url(self) -> str:
+        # where forecasts are read from: Home Assistant, or the relay of another instance
+        if self.relay_mode == _RelayMode.CLIENT:
+            return self.settings.get(_HomeAssistantWeatherPluginSettings.RELAY_URL)
+        return self.home_assistant_url
+
+    @property
+    def source_token(self) -> str:
+        return self.relay_key if self.relay_mode == _RelayMode.CLIENT else self.home_assistant_token
 
     @property
     def home_assistant_url(self) -> str:
-        return self._get_setting(setting=_HomeAssistantWeatherPluginSettings.HOME_ASSISTANT_SERVER)
+        return self.settings.get(_HomeAssistantWeatherPluginSettings.HOME_ASSISTANT_SERVER)
 
     @property
     def request_attempts(self) -> int:
-        return self._get_setting(setting=_HomeAssistantWeatherPluginSettings.REQUEST_ATTEMPTS)
+        return self.settings.get(_HomeAssistantWeatherPluginSettings.REQUEST_ATTEMPTS)
 
     @property
     def home_assistant_entity_forecast(self) -> str:
-        return self._get_setting(setting=_HomeAssistantWeatherPluginSettings.HOME_ASSISTANT_WEATHER_FORECAST_ENTITY_ID)
+        return self.settings.get(_HomeAssistantWeatherPluginSettings.HOME_ASSISTANT_WEATHER_FORECAST_ENTITY_ID)
 
     @property
     def home_assistant_entity_sun(self) -> str:
-        return self._get_setting(setting=_HomeAssistantWeatherPluginSettings.HOME_ASSISTANT_SUN_ENTITY_ID)
+        return self.settings.get(_HomeAssistantWeatherPluginSettings.HOME_ASSISTANT_SUN_ENTITY_ID)
+
+    @property
+    def current_overlay(self) -> Tuple[Tuple[str, str], ...]:
+        # local sensors are where Kodi is, so they apply to the first location only
+        return tuple((field, entity_id.strip()) for field, entity_id in (
+            ("temperature", self.settings.get(_HomeAssistantWeatherPluginSettings.OVERLAY_TEMPERATURE)),
+            ("humidity", self.settings.get(_HomeAssistantWeatherPluginSettings.OVERLAY_HUMIDITY)),
+            ("dew_point", self.settings.get(_HomeAssistantWeatherPluginSettings.OVERLAY_DEW_POINT)),
+            ("pressure", self.settings.get(_HomeAssistantWeatherPluginSettings.OVERLAY_PRESSURE)),
+            ("wind_speed", self.settings.get(_HomeAssistantWeatherPluginSettings.OVERLAY_WIND_SPEED)),
+        ) if entity_id and entity_id.strip())
 
     @property
     def home_assistant_token(self) -> str:
-        return self._get_setting(setting=_HomeAssistantWeatherPluginSettings.HOME_ASSISTANT_TOKEN)
+        return self.settings.get(_HomeAssistantWeatherPluginSettings.HOME_ASSISTANT_TOKEN)
+
+    @property
+    def locations(self) -> List[_HomeAssistantWeatherLocation]:
+        # the first location is the one configured on the connection page, the others are optional
+        locations = [_HomeAssistantWeatherLocation(
+            index=1, title=self.override_location, forecast_entity=self.home_assistant_entity_forecast,
+            sun_entity=self.home_assistant_entity_sun, overlay=self.current_overlay
+        )]
+        count = self.settings.get(_HomeAssistantWeatherPluginSettings.LOCATIONS) or 1
+        for title, forecast_entity, sun_entity in _LOCATION_SETTINGS[:count - 1]:
+            if not self.settings.get(forecast_entity):
+                continue
+            locations.append(_HomeAssistantWeatherLocation(
+                index=len(locations) + 1,
+                title="" if self.use_home_assistant_location_name else self.settings.get(title),
+                forecast_entity=self.settings.get(forecast_entity),
+                # all locations usually share the one sun entity of the Home Assistant instance
+                sun_entity=self.settings.get(sun_entity) or self.home_assistant_entity_sun,
+            ))
+        return locations
+
+    @property
+    def use_home_assistant_location_name(self) -> bool:
+        return self.settings.get(_HomeAssistantWeatherPluginSettings.USE_HOME_ASSISTANT_LOCATION_NAME)
 
     @property
     def override_location(self) -> str:
-        if not self._get_setting(setting=_HomeAssistantWeatherPluginSettings.USE_HOME_ASSISTANT_LOCATION_NAME):
-            return self._get_setting(setting=_HomeAssistantWeatherPluginSettings.LOCATION_TITLE)
+        if not self.use_home_assistant_location_name:
+            return self.settings.get(_HomeAssistantWeatherPluginSettings.LOCATION_TITLE)
         else:
             return ""
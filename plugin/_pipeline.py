@@ -0,0 +1,608 @@
+import os.path
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as _FutureTimeout
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Set, Tuple, Type, Union
+
+from lib.homeassistant import (
+    HomeAssistantAdapter, RequestError, HomeAssistantSunInfo, HomeAssistantForecastMetaCache,
+    HomeAssistantResolvedForecastMeta, HomeAssistantForecastBatch, HomeAssistantSharedRequests,
+    HomeAssistantCurrentOverlay, HomeAssistantHourlyForecast, HomeAssistantDailyForecast, HomeAssistantCurrentForecast,
+    HomeAssistantRelayClient, HomeAssistantRelayResource, HomeAssistantForecast, HomeAssistantForecastSnapshot,
+    SnapshotError, HomeAssistantForecastHistory, HomeAssistantHistoryKind, HomeAssistantForecastResampler,
+    HomeAssistantCurrentInterpolator, HomeAssistantHourlyForecastView, HomeAssistantDailyForecastView
+)
+from lib.kodi import KodiLogLevel, KodiLogCategory, KodiForecastData, KodiHourlyForecastData, KodiDailyForecastData
+from lib.util.cancellation import CancellationToken, OperationCancelled
+from lib.util.jitter import device_jitter
+from lib.util.memo import BoundedMemo
+from lib.util.refresh_scheduler import RefreshScheduler, RefreshTier
+from lib.util.update_cadence import UpdateCadenceEstimator
+from .util.forecast_converter import ForecastConverter
+from .util.forecast_summary import ForecastSummarizer
+from ._kodi_adapter import _KodiHomeAssistantWeatherPluginAdapter, _HomeAssistantWeatherLocation, _RelayMode
+
+_CADENCE_FILE = "cadence{}.json"    # one file per location index, the first location keeps the original name
+_SNAPSHOT_FILE = "forecast{}.bin"
+_MIN_POLL_INTERVAL = 60     # seconds
+_CONVERSION_MEMO_SIZE = 2 * 168     # a week of hourly entries, and the same week shifted by a refresh
+_DAY_HOURS = 24
+
+
+class _HomeAssistantWeatherPipeline:
+    """Fetches, converts and (while it is the active location) publishes the weather of one location."""
+
+    def __init__(self, kodi_adapter: _KodiHomeAssistantWeatherPluginAdapter, location: _HomeAssistantWeatherLocation,
+                 meta_cache: HomeAssistantForecastMetaCache, tagged: bool = False) -> None:
+        self._kodi_adapter = kodi_adapter
+        self.location = location
+        self._meta_cache = meta_cache
+        self.active = False     # only the location shown by Kodi writes window properties
+        self.history: Union[HomeAssistantForecastHistory, None] = None    # set by the plugin, flushed once per refresh
+        # stage names carry the location once several pipelines share the refresh summary
+        self._tag = f"location{location.index}." if tagged else ""
+        self._scheduler = self.__create_scheduler()
+        self._cadence = self.__load_cadence()
+        self._cancellation = CancellationToken()
+        # series fetched along with the other locations refreshed at the same time, by tier; set per refresh
+        self._batches: Dict[RefreshTier, HomeAssistantForecastBatch] = {}
+        self._shared = HomeAssistantSharedRequests()    # the sun of the server, fetched once for all of them
+        # last fetched data per tier, merged with whatever is due on the next refresh
+        self._ha_current: Union[HomeAssistantCurrentForecast, None] = None
+        # units and features of the entity, resolved whenever the current conditions are fetched or restored
+        self._meta: Union[HomeAssistantResolvedForecastMeta, None] = None
+        self._ha_hourly: List[HomeAssistantHourlyForecast] = []
+        self._ha_daily: List[HomeAssistantDailyForecast] = []
+        self._sun_info: Union[HomeAssistantSunInfo, None] = None
+        self._overlay = self.__create_overlay()
+        self._kodi_forecast: Union[KodiForecastData, None] = None
+        # converted entries by content, most of them survive a refresh unchanged
+        self._hourly_memo: BoundedMemo[KodiHourlyForecastData] = BoundedMemo(capacity=_CONVERSION_MEMO_SIZE)
+        self._daily_memo: BoundedMemo[KodiDailyForecastData] = BoundedMemo(capacity=_CONVERSION_MEMO_SIZE)
+        self._resampler = HomeAssistantForecastResampler(bucket_hours=(_DAY_HOURS,))
+        # epoch seconds of the last fetch of the current conditions, the anchor of the estimates between fetches
+        self._observed_at: Union[float, None] = None
+        self._interpolator: Union[HomeAssistantCurrentInterpolator, None] = None     # built from the hourly series
+        # forecast series restored from the snapshot of a previous process, converted along with the first refresh
+        self._restored: Set[RefreshTier] = set()
+        self.__load_snapshot()
+
+    @property
+    def scheduler(self) -> RefreshScheduler:
+        return self._scheduler
+
+    @property
+    def has_forecast(self) -> bool:
+        return self._kodi_forecast is not None
+
+    @property
+    def fetched_at(self) -> Union[float, None]:
+        # epoch time of the current conditions shown, None if this process never fetched them
+        return self._observed_at
+
+    @property
+    def title(self) -> str:
+        if self._kodi_forecast is not None:
+            return self._kodi_forecast.General.location
+        return self.location.title or self.location.forecast_entity
+
+    def relay_resources(self) -> Iterator[Tuple[HomeAssistantRelayResource, str, Any]]:
+        if self._ha_current is not None:
+            yield HomeAssistantRelayResource.CURRENT, self.location.forecast_entity, self._ha_current
+            yield HomeAssistantRelayResource.HOURLY, self.location.forecast_entity, self._ha_hourly
+            yield HomeAssistantRelayResource.DAILY, self.location.forecast_entity, self._ha_daily
+        if self._sun_info is not None:
+            yield HomeAssistantRelayResource.SUN, self.location.sun_entity, self._sun_info
+
+    def invalidate(self) -> None:
+        self._scheduler.invalidate()
+
+    def reset(self) -> None:
+        # settings changed: new intervals, everything due again
+        for tier, seconds in self._kodi_adapter.refresh_intervals.items():
+            self._scheduler.set_interval(tier=tier, seconds=seconds)
+        self._scheduler.invalidate()
+        self._cadence = self.__load_cadence()
+
+    def publish(self) -> None:
+        # serves a location switch from the cache, inactive locations keep their converted forecast up to date
+        for tier in (RefreshTier.CURRENT, RefreshTier.HOURLY, RefreshTier.DAILY):
+            with self.__stage("publish." + tier.value):
+                self.__publish(tier=tier)
+        with self.__stage("publish.summary"):
+            self._kodi_adapter.set_summary_properties(forecast=self._kodi_forecast)
+        with self.__stage("publish.general"):
+            self._kodi_adapter.set_general_properties(forecast=self._kodi_forecast)
+
+    def interpolate_current(self) -> bool:
+        # estimates the current conditions from the hourly trend between fetches and converts them, True if the
+        # window properties were updated; past the age limit the scheduler fetches the current conditions again
+        if not self._kodi_adapter.interpolation_age or self._kodi_forecast is None or self._observed_at is None:
+            return False
+        now = time.time()
+        if now - self._observed_at >= self._kodi_adapter.interpolation_age:
+            return False
+        if self._interpolator is None:
+            self._interpolator = HomeAssistantCurrentInterpolator(self._ha_hourly)
+        estimate = self._interpolator.estimate(current=self._ha_current, observed_at=self._observed_at, now=now)
+        if estimate is None:
+            return False
+        _, self._kodi_forecast.Current = ForecastConverter.translate_current_forecast(
+            ha_current=estimate, ha_sun_info=self._sun_info, ha_hourly=self._ha_hourly, ha_daily=self._ha_daily,
+            projection=self._kodi_adapter.projection, meta=self._meta
+        )
+        self._kodi_adapter.log(
+            "Estimated the current conditions of %s %.0f s after the fetch: %s %s", self.location.forecast_entity,
+            now - self._observed_at, estimate.temperature, estimate.temperature_unit, category=KodiLogCategory.CONVERT
+        )
+        if self.active:
+            self.__publish(tier=RefreshTier.CURRENT)
+        return self.active
+
+    def refresh(self, cancellation: CancellationToken,
+                batches: Union[Dict[RefreshTier, HomeAssistantForecastBatch], None] = None,
+                shared: Union[HomeAssistantSharedRequests, None] = None) -> bool:
+        self._cancellation = cancellation
+        self._batches = dict(batches or {})
+        self._shared = shared or HomeAssistantSharedRequests()
+        due = self._scheduler.begin_cycle()
+        self._kodi_adapter.log(
+            "Refreshing %s tiers: %s", self.location.forecast_entity, ", ".join(sorted(tier.value for tier in due))
+        )
+        try:
+            return self.__apply(due=due)
+        except RequestError:
+            # whatever wasn't fetched before the failure
+            self.__back_off(tiers=due & self._scheduler.due_tiers())
+            raise
+        finally:
+            # the other locations of a batch wait for this one until it either joined or declined
+            self.__decline_batches()
+
+    @property
+    def _source(self) -> Union[Type[HomeAssistantAdapter], Type[HomeAssistantRelayClient]]:
+        return HomeAssistantRelayClient if self._kodi_adapter.relay_mode == _RelayMode.CLIENT else HomeAssistantAdapter
+
+    def _horizon(self, slots: int) -> Union[int, None]:
+        # a relay keeps everything Home Assistant returns, its clients may be configured for longer horizons
+        return None if self._kodi_adapter.relay_mode == _RelayMode.SERVER else slots
+
+    def _connection(self) -> Dict[str, Any]:
+        return dict(
+            server_url=self._kodi_adapter.source_url,
+            token=self._kodi_adapter.source_token,
+            check_ssl=self._kodi_adapter.get_check_ssl,
+            request_attempts=self._kodi_adapter.request_attempts,
+            cancellation=self._cancellation,
+        )
+
+    def __create_scheduler(self) -> RefreshScheduler:
+        # each device and tier gets its own fixed offset into the interval, a fleet doesn't refresh in lockstep
+        device_id = self._kodi_adapter.device_id
+        return RefreshScheduler(
+            intervals=self._kodi_adapter.refresh_intervals,
+            jitter=lambda tier, interval: device_jitter(
+                device_id=device_id, key=self.__jitter_key(tier), interval=interval
+            )
+        )
+
+    def __create_overlay(self) -> Union[HomeAssistantCurrentOverlay, None]:
+        if not self.location.overlay:
+            return None
+        try:
+            return HomeAssistantCurrentOverlay(sensors=dict(self.location.overlay))
+        except ValueError as e:
+            self._kodi_adapter.log("Ignoring the sensor overlay: %s", e, level=KodiLogLevel.WARNING)
+            return None
+
+    def __jitter_key(self, tier: RefreshTier) -> str:
+        # the forecast series of all locations come due together, so that they are fetched in one batch
+        if tier in (RefreshTier.HOURLY, RefreshTier.DAILY):
+            return tier.value
+        return f"{self.location.forecast_entity}:{tier.value}"
+
+    def __cadence_key(self) -> str:
+        return f"{self._kodi_adapter.home_assistant_url}|{self.location.forecast_entity}"
+
+    def __profile_file(self, name: str) -> str:
+        suffix = "" if self.location.index == 1 else f".{self.location.index}"
+        return os.path.join(self._kodi_adapter.profile_path, name.format(suffix))
+
+    def __cadence_path(self) -> str:
+        return self.__profile_file(_CADENCE_FILE)
+
+    def __load_snapshot(self) -> None:
+        # a cold start keeps the forecast series of the last run, so a refresh cut short still shows them
+        try:
+            snapshot = HomeAssistantForecastSnapshot(self.__profile_file(_SNAPSHOT_FILE))
+        except FileNotFoundError:
+            return
+        except (OSError, SnapshotError) as e:
+            self._kodi_adapter.log("Ignoring the forecast snapshot: %s", e, level=KodiLogLevel.WARNING)
+            return
+        with snapshot:
+            if snapshot.key != self.__cadence_key():
+                return
+            now = time.time()
+            # only the records still ahead are decoded
+            try:
+                hourly = snapshot.hourly[snapshot.hourly.first_from(now - timedelta(hours=1).total_seconds() + 1):]
+                daily = snapshot.daily[snapshot.daily.first_from(now - timedelta(days=1).total_seconds() + 1):]
+            except SnapshotError as e:
+                self._kodi_adapter.log("Ignoring the forecast snapshot: %s", e, level=KodiLogLevel.WARNING)
+                return
+            self._ha_current = snapshot.current
+            self.__resolve_meta()
+            self._ha_hourly, self._ha_daily = hourly, daily
+        self._restored = {RefreshTier.HOURLY, RefreshTier.DAILY}
+
+    def __save_snapshot(self) -> None:
+        try:
+            HomeAssistantForecastSnapshot.write(
+                path=self.__profile_file(_SNAPSHOT_FILE), key=self.__cadence_key(),
+                forecast=HomeAssistantForecast(current=self._ha_current, hourly=self._ha_hourly, daily=self._ha_daily)
+            )
+        except (OSError, SnapshotError) as e:
+            self._kodi_adapter.log("Could not persist the forecast snapshot: %s", e, level=KodiLogLevel.WARNING)
+
+    def __load_cadence(self) -> UpdateCadenceEstimator:
+        cadence = UpdateCadenceEstimator(
+            min_interval=_MIN_POLL_INTERVAL,
+            # no point in polling the current state less often than the hourly forecast
+            max_interval=self._kodi_adapter.refresh_intervals[RefreshTier.HOURLY],
+        )
+        if self._kodi_adapter.adaptive_polling:
+            cadence.load(path=self.__cadence_path(), key=self.__cadence_key())
+        return cadence
+
+    def __learn_cadence(self) -> None:
+        if not self._kodi_adapter.adaptive_polling or not self._ha_current.last_updated:
+            return
+        if self._kodi_adapter.interpolation_age:
+            # the estimates cover the gaps, the current conditions are fetched on the fixed age limit instead
+            return
+        try:
+            last_update = datetime.fromisoformat(self._ha_current.last_updated).timestamp()
+        except ValueError:
+            return
+        changed = self._cadence.observe(last_update=last_update)
+        delay = self._cadence.next_poll_delay(now=time.time())
+        self._scheduler.set_interval(tier=RefreshTier.CURRENT, seconds=delay)
+        self._kodi_adapter.log(
+            "Entity %s %s, learned cadence %s s, next current poll in %.0f s", self.location.forecast_entity,
+            "changed" if changed else "unchanged", self._cadence.cadence, delay
+        )
+        try:
+            self._cadence.save(path=self.__cadence_path(), key=self.__cadence_key())
+        except OSError as e:
+            self._kodi_adapter.log("Could not persist the learned cadence: %s", e, level=KodiLogLevel.WARNING)
+
+    @contextmanager
+    def __stage(self, name: str) -> Iterator[None]:
+        with self._kodi_adapter.refresh_summary.stage(self._tag + name):
+            yield
+
+    def __cut(self, stage: str) -> None:
+        self._kodi_adapter.refresh_summary.cut_stages.append(self._tag + stage)
+
+    def __apply(self, due: Set[RefreshTier]) -> bool:
+        # only tiers that are due are fetched, converted and re-rendered; the rest comes from the previous refresh.
+        # A RequestError of the current conditions or the sun is left to the caller.
+        progressive = self._kodi_adapter.progressive_publishing
+        if self._ha_current is None or self._sun_info is None:
+            due = due | {RefreshTier.CURRENT, RefreshTier.SUN}
+        fetched: Set[RefreshTier] = set()
+        pool = ThreadPoolExecutor(max_workers=4)
+        try:
+            try:
+                pending = self.__fetch_current_and_sun(due=due, pool=pool, fetched=fetched)
+            except (OperationCancelled, _FutureTimeout):
+                pending = {}
+                if self._ha_current is None or self._sun_info is None:
+                    # nothing to show yet, whatever the previous refresh published stays on the window
+                    return False
+
+            published = set()
+            if progressive and due & {RefreshTier.CURRENT, RefreshTier.SUN}:
+                published = self.__convert_and_publish(tiers={RefreshTier.CURRENT}, general=True)
+
+            for tier, future in pending.items():
+                with self.__stage("fetch." + tier.value):
+                    entries = self.__collect_forecast(tier=tier, future=future)
+                if entries is None:
+                    continue
+                fetched.add(tier)
+                tiers = {tier}
+                if tier == RefreshTier.HOURLY:
+                    self._ha_hourly = entries
+                    self._interpolator = None
+                    if self.__derives_daily():
+                        self.__derive_daily()
+                        fetched.add(RefreshTier.DAILY)
+                        tiers.add(RefreshTier.DAILY)
+                else:
+                    self._ha_daily = entries
+                if self.history is not None:
+                    self.history.record_forecast(
+                        entity_id=self.location.forecast_entity, entries=entries,
+                        kind=HomeAssistantHistoryKind.HOURLY if tier == RefreshTier.HOURLY else HomeAssistantHistoryKind.DAILY
+                    )
+                if progressive:
+                    published |= self.__convert_and_publish(tiers=tiers, general=False)
+        finally:
+            # after a cut the workers finish on their own, their requests never outlive the budget
+            pool.shutdown(wait=not self._cancellation.cancelled)
+
+        affected = (self.__affected_tiers(fetched=fetched) | self._restored) - published
+        if RefreshTier.HOURLY in fetched:
+            # precipitation and the condition fallback of the current conditions come from the first forecast slot
+            affected.add(RefreshTier.CURRENT)
+        published |= self.__convert_and_publish(tiers=affected, general=True)
+        self._restored.clear()
+        # the series are kept until the next fetch as dataclasses, the responses they were decoded from are not;
+        # whatever was converted from them this refresh moves over
+        if RefreshTier.HOURLY in fetched:
+            self._ha_hourly = HomeAssistantHourlyForecastView.release_all(self._ha_hourly)
+            if RefreshTier.HOURLY in published:
+                ForecastConverter.rebind_all(self._kodi_forecast.HourlyForecasts, self._ha_hourly)
+        if RefreshTier.DAILY in fetched:
+            self._ha_daily = HomeAssistantDailyForecastView.release_all(self._ha_daily)
+            if RefreshTier.DAILY in published:
+                ForecastConverter.rebind_all(self._kodi_forecast.DailyForecasts, self._ha_daily)
+        if fetched & {RefreshTier.HOURLY, RefreshTier.DAILY}:
+            # the current conditions are refetched on every start, the series are what a cold start is missing
+            self.__save_snapshot()
+        self._kodi_adapter.log(
+            "Weather of %s updated successfully.", self.location.forecast_entity, level=KodiLogLevel.INFO
+        )
+        return True
+
+    def __fetch_current_and_sun(self, due: Set[RefreshTier], pool: ThreadPoolExecutor,
+                                fetched: Set[RefreshTier]) -> Dict[RefreshTier, Future]:
+        entity_id = self.location.forecast_entity
+        connection = self._connection()
+        sun_future = self._shared.submit(
+            key=(connection["server_url"], self.location.sun_entity), pool=pool, fetch=self._source.get_sun_info,
+            entity_id=self.location.sun_entity, **connection
+        ) if RefreshTier.SUN in due else None
+        # the sensors are read while the weather entity is, a relay client gets the conditions merged already
+        overlay_future = pool.submit(
+            HomeAssistantAdapter.get_sensor_states, entity_ids=self._overlay.entity_ids, **self._connection()
+        ) if (
+            RefreshTier.CURRENT in due and self._overlay is not None
+            and self._kodi_adapter.relay_mode != _RelayMode.CLIENT
+        ) else None
+        pending: Dict[RefreshTier, Future] = {}
+        try:
+            if RefreshTier.CURRENT in due:
+                with self.__stage("fetch.current"):
+                    self._ha_current = self._source.get_current_forecast(
+                        entity_id=entity_id, **self._connection()
+                    )
+                if overlay_future is not None:
+                    self.__apply_overlay(future=overlay_future)
+                self.__resolve_meta()
+                self._observed_at = time.time()
+                self._scheduler.mark_fetched(RefreshTier.CURRENT)
+                fetched.add(RefreshTier.CURRENT)
+                if self.history is not None:
+                    self.history.record_current(entity_id=entity_id, current=self._ha_current)
+                self.__learn_cadence()
+        except OperationCancelled:
+            self.__cut("fetch.current")
+            if sun_future is not None:
+                self.__cut("fetch.sun")
+            raise
+        if RefreshTier.HOURLY in due:
+            if self._meta.has_hourly_forecast and self.__needs_hourly():
+                pending[RefreshTier.HOURLY] = self.__request_series(
+                    tier=RefreshTier.HOURLY, pool=pool, fetch=self._source.get_hourly_forecast,
+                    # days are resampled from every hour Home Assistant returns
+                    horizon=None if self.__derives_daily() else self._horizon(self._kodi_adapter.hourly_slots)
+                )
+            else:
+                self._ha_hourly = []
+                self._interpolator = None
+                self._scheduler.mark_fetched(RefreshTier.HOURLY)
+                fetched.add(RefreshTier.HOURLY)
+        if RefreshTier.DAILY in due:
+            if self.__derives_daily():
+                # no request; a pending hourly forecast is resampled once it arrives, otherwise the cached one is
+                # resampled again for the days that passed
+                if RefreshTier.HOURLY not in pending:
+                    self.__derive_daily()
+                self._scheduler.mark_fetched(RefreshTier.DAILY)
+                fetched.add(RefreshTier.DAILY)
+            else:
+                pending[RefreshTier.DAILY] = self.__request_series(
+                    tier=RefreshTier.DAILY, pool=pool, fetch=self._source.get_daily_forecast,
+                    horizon=self._horizon(self._kodi_adapter.daily_slots)
+                )
+        # before waiting for anything, so that no location of a batch waits for a series this one doesn't need
+        self.__decline_batches()
+        if sun_future is not None:
+            try:
+                with self.__stage("fetch.sun"):
+                    self._sun_info = sun_future.result(timeout=self._cancellation.remaining)
+                self._scheduler.mark_fetched(RefreshTier.SUN)
+                fetched.add(RefreshTier.SUN)
+            except (OperationCancelled, _FutureTimeout):
+                self.__cut("fetch.sun")
+                if self._sun_info is None:
+                    raise
+        return pending
+
+    def __request_series(self, tier: RefreshTier, pool: ThreadPoolExecutor, fetch: Any,
+                         horizon: Union[int, None]) -> Future:
+        batch = self._batches.pop(tier, None)
+        if batch is not None:
+            return batch.request(entity_id=self.location.forecast_entity, horizon=horizon)
+        return pool.submit(fetch, entity_id=self.location.forecast_entity, horizon=horizon, views=True, **self._connection())
+
+    def __back_off(self, tiers: Set[RefreshTier]) -> None:
+        for tier in tiers:
+            delay = self._scheduler.mark_failed(tier)
+            self._kodi_adapter.log(
+                "Fetching %s of %s failed, retrying in %.0f s", tier.value, self.location.forecast_entity, delay,
+                level=KodiLogLevel.WARNING
+            )
+
+    def __decline_batches(self) -> None:
+        for batch in self._batches.values():
+            batch.decline()
+        self._batches.clear()
+
+    def __collect_forecast(self, tier: RefreshTier, future: Future) \
+            -> Union[List[HomeAssistantHourlyForecast], List[HomeAssistantDailyForecast], None]:
+        try:
+            entries, skipped = future.result(timeout=self._cancellation.remaining)
+        except (OperationCancelled, _FutureTimeout):
+            self.__cut("fetch." + tier.value)
+            return None
+        except RequestError:
+            # keep the previous series, the tier stays due and is retried once its backoff passed
+            self.__back_off(tiers={tier})
+            return None
+        self._scheduler.mark_fetched(tier)
+        self._kodi_adapter.log(
+            "Dropped %d %s entries outside of the horizon", skipped, tier.value, category=KodiLogCategory.CONVERT
+        )
+        return entries
+
+    def __apply_overlay(self, future: Future) -> None:
+        # merged before anything else sees the current conditions; without the sensors the entity's values are kept
+        try:
+            with self.__stage("fetch.overlay"):
+                states = future.result(timeout=self._cancellation.remaining)
+        except (OperationCancelled, _FutureTimeout):
+            self.__cut("fetch.overlay")
+            return
+        except RequestError as e:
+            self._kodi_adapter.log("Could not read the overlay sensors: %s", e, level=KodiLogLevel.WARNING)
+            return
+        self._ha_current, fields = self._overlay.apply(current=self._ha_current, states=states)
+        self._kodi_adapter.log(
+            "Overlaid %s of %s with local sensors", ", ".join(fields) or "nothing", self.location.forecast_entity,
+            category=KodiLogCategory.CONVERT
+        )
+
+    def __resolve_meta(self) -> None:
+        # the unit classes and feature flags are resolved once per entity, not for every entry converted
+        self._meta = self._meta_cache.resolve(
+            server_url=self._kodi_adapter.source_url, entity_id=self.location.forecast_entity, meta=self._ha_current
+        )
+
+    def __derives_daily(self) -> bool:
+        # on request, or as the fallback for entities without a daily forecast
+        return self._kodi_adapter.derive_daily or not self._meta.has_daily_forecast
+
+    def __needs_hourly(self) -> bool:
+        # the hours feed their properties and the summary, the days resampled from them, the estimates of the current
+        # conditions and the clients of a relay; an output profile with none of those skips the request
+        projection = self._kodi_adapter.projection
+        return (
+            projection.writes_hourly or projection.writes_summary or self.__derives_daily()
+            or bool(self._kodi_adapter.interpolation_age) or self._kodi_adapter.relay_mode == _RelayMode.SERVER
+        )
+
+    def __derive_daily(self) -> None:
+        self._ha_daily = self._resampler.resample(self._ha_hourly)[_DAY_HOURS]
+        self._kodi_adapter.log(
+            "Derived %d daily entries from %d hourly entries", len(self._ha_daily), len(self._ha_hourly),
+            category=KodiLogCategory.CONVERT
+        )
+
+    @staticmethod
+    def __affected_tiers(fetched: Set[RefreshTier]) -> Set[RefreshTier]:
+        affected = set(fetched & {RefreshTier.CURRENT, RefreshTier.HOURLY, RefreshTier.DAILY})
+        if RefreshTier.SUN in fetched:
+            # sunrise/sunset decide the day/night icons of current and hourly conditions
+            affected |= {RefreshTier.CURRENT, RefreshTier.HOURLY}
+        return affected
+
+    def __convert_current(self) -> None:
+        general, current = ForecastConverter.translate_current_forecast(
+            ha_current=self._ha_current, ha_sun_info=self._sun_info, ha_hourly=self._ha_hourly,
+            ha_daily=self._ha_daily, projection=self._kodi_adapter.projection, meta=self._meta
+        )
+        if self.location.title:
+            general.location = self.location.title
+        if self._kodi_forecast is None:
+            self._kodi_forecast = KodiForecastData(General=general, Current=current, HourlyForecasts=[], DailyForecasts=[])
+        else:
+            self._kodi_forecast.General = general
+            self._kodi_forecast.Current = current
+
+    def __convert_and_publish(self, tiers: Set[RefreshTier], general: bool) -> Set[RefreshTier]:
+        # sets are converted and published one batch at a time so that a cut keeps everything finished so far;
+        # inactive locations only convert, their properties are written once Kodi switches to them
+        published = set()
+        for tier in (RefreshTier.CURRENT, RefreshTier.HOURLY, RefreshTier.DAILY):
+            if tier not in tiers:
+                continue
+            if self._cancellation.cancelled:
+                self.__cut("publish." + tier.value)
+                continue
+            with self.__stage("convert." + tier.value):
+                self.__convert(tier=tier)
+            if self.active:
+                with self.__stage("publish." + tier.value):
+                    self.__publish(tier=tier)
+            published.add(tier)
+        if published and self._kodi_adapter.projection.writes_summary and not self._cancellation.cancelled:
+            # derived from the series just converted, one more pass over them and no conversion of its own
+            with self.__stage("convert.summary"):
+                self._kodi_forecast.Summary = ForecastSummarizer.summarize(
+                    forecast=self._kodi_forecast, ha_hourly=self._ha_hourly, now=datetime.now().astimezone()
+                )
+            if self.active:
+                with self.__stage("publish.summary"):
+                    self._kodi_adapter.set_summary_properties(forecast=self._kodi_forecast)
+        if general and self.active:
+            if self._cancellation.cancelled:
+                self.__cut("publish.general")
+            else:
+                with self.__stage("publish.general"):
+                    self._kodi_adapter.set_general_properties(forecast=self._kodi_forecast)
+        return published
+
+    def __convert(self, tier: RefreshTier) -> None:
+        if tier == RefreshTier.CURRENT:
+            self.__convert_current()
+        elif tier == RefreshTier.HOURLY:
+            projection = self._kodi_adapter.projection
+            # nothing reads the converted hours if neither they nor the summaries derived from them are written
+            slots = self._kodi_adapter.hourly_slots if projection.writes_hourly or projection.writes_summary else 0
+            self._hourly_memo.reset_counts()
+            self._kodi_forecast.HourlyForecasts = ForecastConverter.translate_hourly_forecasts(
+                ha_hourly=self._ha_hourly[:slots], meta=self._meta,
+                ha_sun_info=self._sun_info, memo=self._hourly_memo
+            )
+            self.__count_memo(tier=tier, memo=self._hourly_memo)
+        else:
+            self._daily_memo.reset_counts()
+            self._kodi_forecast.DailyForecasts = ForecastConverter.translate_daily_forecasts(
+                ha_daily=self._ha_daily[:self._kodi_adapter.daily_slots], meta=self._meta,
+                memo=self._daily_memo
+            )
+            self.__count_memo(tier=tier, memo=self._daily_memo)
+        self._kodi_adapter.log(
+            "Converted %s: %d hourly and %d daily entries", tier.value, len(self._kodi_forecast.HourlyForecasts),
+            len(self._kodi_forecast.DailyForecasts), category=KodiLogCategory.CONVERT
+        )
+
+    def __count_memo(self, tier: RefreshTier, memo: BoundedMemo) -> None:
+        self._kodi_adapter.refresh_summary.count_memo(
+            name=self._tag + "convert." + tier.value, hits=memo.hits, misses=memo.misses
+        )
+
+    def __publish(self, tier: RefreshTier) -> None:
+        if tier == RefreshTier.CURRENT:
+            self._kodi_adapter.set_current_properties(
+                forecast=self._kodi_forecast, remove_seconds=self._kodi_adapter.remove_seconds
+            )
+        elif tier == RefreshTier.HOURLY:
+            self._kodi_adapter.set_hourly_properties(forecast=self._kodi_forecast)
+        else:
+            self._kodi_adapter.set_daily_properties(forecast=self._kodi_forecast)
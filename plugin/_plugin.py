@@ -1,72 +1,292 @@
-from typing import Tuple, Union
+import os.path
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Tuple, Union
 
-from lib.homeassistant import HomeAssistantAdapter, RequestError, HomeAssistantForecast, HomeAssistantSunInfo
+from lib.homeassistant import (
+    HomeAssistantAdapter, HomeAssistantForecastBatch, HomeAssistantForecastHistory, HomeAssistantForecastMetaCache,
+    HomeAssistantRelayResource, HomeAssistantSharedRequests, RequestError
+)
 from lib.kodi import KodiLogLevel
-from .util.forecast_converter import ForecastConverter
-from ._kodi_adapter import _KodiHomeAssistantWeatherPluginAdapter, _HomeAssistantWeatherPluginStrings
+from lib.util.cancellation import CancellationToken
+from lib.util.rate_limiter import TokenBucket
+from lib.util.refresh_scheduler import RefreshTier
+from lib.util.single_flight import SingleFlight
+from ._kodi_adapter import _KodiHomeAssistantWeatherPluginAdapter, _HomeAssistantWeatherPluginStrings, _RelayMode
+from ._pipeline import _HomeAssistantWeatherPipeline
+
+_LOCK_FILE = "refresh.lock"
+_LEASE_MARGIN = 10  # seconds a lease outlives the refresh budget
+_RATE_LIMIT_FILE = "ratelimit.json"
+_RENDERED_FILE = "properties.json"
+_HISTORY_DIRECTORY = "history"
+_HISTORY_MAX_BYTES = 4 * 1024 * 1024
+# seconds the last good properties stay on the window while Home Assistant can't be reached
+_PROPERTIES_VALIDITY = 3 * 3600
 
 
 class KodiHomeAssistantWeatherPlugin:
-    def __init__(self):
+    def __init__(self, refresh: bool = True, location: Union[int, None] = None, all_locations: bool = False):
+        # refresh=False keeps the pipeline warm without fetching, e.g. for the background service.
+        # location is the 1-based index Kodi passes to weather scripts, all_locations keeps every location warm
+        # so that switching between them is served from the cache.
         self._kodi_adapter = _KodiHomeAssistantWeatherPluginAdapter()
+        # on a cold start the skin shows the last refresh right away, before any pipeline exists
+        # epoch time of the data on the window, until this process fetched it on its own
+        self._restored_at = self._kodi_adapter.restore_rendered_properties(
+            path=self.__rendered_path(), key=self.__rendered_key(location=location or 1),
+            max_age=_PROPERTIES_VALIDITY
+        )
+        # after the restore, whatever another profile left behind in the window is cleared
+        self._kodi_adapter.set_output_profile(profile=self._kodi_adapter.output_profile)
+        HomeAssistantAdapter.set_request_listener(self._kodi_adapter.record_request)
+        self.__install_rate_limiter()
+        self._history: Union[HomeAssistantForecastHistory, None] = None
         self._kodi_adapter.log("Home Assistant Weather started.")
+        if self._restored_at is not None:
+            self._kodi_adapter.log("Restored the properties of the last refresh.")
+        self._all_locations = all_locations
+        self._settings_hash = self._kodi_adapter.settings.content_hash
+        # shared by the pipelines and kept when they are recreated for changed settings
+        self._meta_cache = HomeAssistantForecastMetaCache()
+        self._pipelines = self.__create_pipelines()
+        self.__install_history()
+        self._active = 0
+        self.__activate(location=location or 1)
+        self._cancellation = CancellationToken()
+        if refresh:
+            self.refresh()
+        self._kodi_adapter.log("Home Assistant Weather init finished.")
+
+    @property
+    def kodi_adapter(self) -> _KodiHomeAssistantWeatherPluginAdapter:
+        return self._kodi_adapter
+
+    def relay_resources(self) -> Iterator[Tuple[HomeAssistantRelayResource, str, Any]]:
+        for pipeline in self._pipelines:
+            yield from pipeline.relay_resources()
+
+    def invalidate(self) -> None:
+        # makes every tier due on the next refresh, e.g. after the relay announced new data
+        for pipeline in self._pipelines:
+            pipeline.invalidate()
+
+    def next_deadline(self) -> float:
+        return min(pipeline.scheduler.next_deadline() for pipeline in self.__refreshed_pipelines())
 
+    def refresh(self) -> None:
         if not self._kodi_adapter.required_settings_done():
             if not self._kodi_adapter.get_err_not_inform:
                 self._kodi_adapter.notification(message_id=_HomeAssistantWeatherPluginStrings.SETTINGS_REQUIRED)
             self._kodi_adapter.log("Settings for Home Assistant Weather not yet provided. Plugin will not work.")
-        else:
+        elif self._all_locations:
             self.apply_forecast()
-        self._kodi_adapter.log("Home Assistant Weather init finished.")
+        else:
+            # Kodi may launch the script several times in a row, only one of them fetches
+            single_flight = SingleFlight(
+                path=os.path.join(self._kodi_adapter.profile_path, _LOCK_FILE),
+                lease=self._kodi_adapter.refresh_budget + _LEASE_MARGIN, sleep=self._kodi_adapter.wait_for_abort
+            )
+            key = f"{self._kodi_adapter.settings.content_hash}|{self._pipelines[self._active].location.index}"
+            if not single_flight.run(key=key, action=self.apply_forecast, fresh_for=self._kodi_adapter.refresh_freshness):
+                self._kodi_adapter.log("Reused the refresh of another invocation.")
+
+    def interpolate_current(self) -> None:
+        # between fetches only the current conditions of the shown location are estimated and re-published
+        if self._pipelines[self._active].interpolate_current():
+            self._kodi_adapter.flush_properties()
 
-    def _get_forecast_handling_errors(self) \
-            -> Tuple[Union[HomeAssistantForecast, None], Union[HomeAssistantSunInfo, None]]:
+    def select_location(self, location: int) -> None:
+        self.__sync_settings()
+        if min(max(location, 1), len(self._pipelines)) - 1 != self._active:
+            self._restored_at = None    # the restored properties are those of the previous location
+        self.__activate(location=location)
+        pipeline = self._pipelines[self._active]
+        if pipeline.has_forecast:
+            self._kodi_adapter.log("Location %d served from the cache", pipeline.location.index)
+            pipeline.publish()
+            self.__publish_locations()
+            self._kodi_adapter.flush_properties()
+            self.__save_rendered_properties()
+        else:
+            self.refresh()
+
+    def _handle_request_error(self, e: RequestError) -> None:
+        self._kodi_adapter.log(
+            "Could not retrieve forecast from Home Assistant: %s", e.error_code, level=KodiLogLevel.ERROR
+        )
+        if e.error_code == 401:
+            message = _HomeAssistantWeatherPluginStrings.HOMEASSISTANT_UNAUTHORIZED
+        elif e.error_code == -1:
+            message = _HomeAssistantWeatherPluginStrings.HOMEASSISTANT_UNREACHABLE
+        else:
+            message = _HomeAssistantWeatherPluginStrings.HOMEASSISTANT_UNEXPECTED_RESPONSE
+        if not self._kodi_adapter.get_err_not_inform:
+            self._kodi_adapter.notification(message_id=message)
+
+    def __rendered_path(self) -> str:
+        return os.path.join(self._kodi_adapter.profile_path, _RENDERED_FILE)
+
+    def __rendered_key(self, location: int) -> str:
+        return f"{self._kodi_adapter.settings.content_hash}|{location}"
+
+    def __save_rendered_properties(self) -> None:
+        pipeline = self._pipelines[self._active]
+        fetched_at = pipeline.fetched_at or self._restored_at
+        if fetched_at is None:
+            return
         try:
-            return (
-                HomeAssistantAdapter.get_forecast(
-                    server_url=self._kodi_adapter.home_assistant_url,
-                    entity_id=self._kodi_adapter.home_assistant_entity_forecast,
-                    token=self._kodi_adapter.home_assistant_token,
-                    check_ssl=self._kodi_adapter.get_check_ssl,
-                    request_attempts=self._kodi_adapter.request_attempts,
-                ),
-                HomeAssistantAdapter.get_sun_info(
-                    server_url=self._kodi_adapter.home_assistant_url,
-                    entity_id=self._kodi_adapter.home_assistant_entity_sun,
-                    token=self._kodi_adapter.home_assistant_token,
-                    check_ssl=self._kodi_adapter.get_check_ssl,
-                    request_attempts=self._kodi_adapter.request_attempts,
-                )
-            )
-        except RequestError as e:
-            self._kodi_adapter.log(
-                message=f"Could not retrieve forecast from Home Assistant: {e.error_code}", level=KodiLogLevel.ERROR
+            self._kodi_adapter.save_rendered_properties(
+                path=self.__rendered_path(), key=self.__rendered_key(location=pipeline.location.index),
+                fetched_at=fetched_at
             )
-            if e.error_code == 401:
-                message = _HomeAssistantWeatherPluginStrings.HOMEASSISTANT_UNAUTHORIZED
-            elif e.error_code == -1:
-                message = _HomeAssistantWeatherPluginStrings.HOMEASSISTANT_UNREACHABLE
-            else:
-                message = _HomeAssistantWeatherPluginStrings.HOMEASSISTANT_UNEXPECTED_RESPONSE
-            if not self._kodi_adapter.get_err_not_inform:
-                self._kodi_adapter.notification(message_id=message)
-            return None, None
-
-    def apply_forecast(self):
-        forecast, sun_info = self._get_forecast_handling_errors()
-        if forecast is None:
-            self._kodi_adapter.log(message="No forecasts were found.", level=KodiLogLevel.WARNING)
-            self._kodi_adapter.clear_weather_properties()
+        except OSError as e:
+            self._kodi_adapter.log("Could not persist the rendered properties: %s", e, level=KodiLogLevel.WARNING)
+
+    def __install_history(self) -> None:
+        days = self._kodi_adapter.history_days
+        self._history = HomeAssistantForecastHistory(
+            directory=os.path.join(self._kodi_adapter.profile_path, _HISTORY_DIRECTORY), retention_days=days,
+            max_bytes=_HISTORY_MAX_BYTES, sleep=self._kodi_adapter.wait_for_abort
+        ) if days > 0 else None
+        for pipeline in self._pipelines:
+            pipeline.history = self._history
+
+    def __flush_history(self) -> None:
+        # whatever all locations recorded during the refresh goes out in one batch
+        if self._history is None:
             return
-        if sun_info is None:
-            self._kodi_adapter.log(message="No sun info was found.", level=KodiLogLevel.WARNING)
-            self._kodi_adapter.clear_weather_properties()
+        try:
+            self._history.flush(cancellation=self._cancellation)
+        except OSError as e:
+            self._kodi_adapter.log("Could not append to the forecast history: %s", e, level=KodiLogLevel.WARNING)
+
+    def __install_rate_limiter(self) -> None:
+        # shared by the service and every script invocation through a file of the add-on profile
+        rate = self._kodi_adapter.requests_per_minute
+        HomeAssistantAdapter.set_rate_limiter(TokenBucket(
+            path=os.path.join(self._kodi_adapter.profile_path, _RATE_LIMIT_FILE), rate_per_minute=rate,
+            sleep=self._kodi_adapter.wait_for_abort
+        ) if rate > 0 else None)
+
+    def __create_pipelines(self) -> List[_HomeAssistantWeatherPipeline]:
+        locations = self._kodi_adapter.locations
+        return [
+            _HomeAssistantWeatherPipeline(
+                kodi_adapter=self._kodi_adapter, location=location, meta_cache=self._meta_cache,
+                tagged=len(locations) > 1
+            )
+            for location in locations
+        ]
+
+    def __activate(self, location: int) -> None:
+        self._active = min(max(location, 1), len(self._pipelines)) - 1
+        for i, pipeline in enumerate(self._pipelines):
+            pipeline.active = i == self._active
+
+    def __refreshed_pipelines(self) -> List[_HomeAssistantWeatherPipeline]:
+        return self._pipelines if self._all_locations else [self._pipelines[self._active]]
+
+    def __sync_settings(self) -> None:
+        if self._kodi_adapter.settings.content_hash == self._settings_hash:
             return
-        kodi_forecast = ForecastConverter.translate_ha_forecast_to_kodi_forecast(
-            ha_forecast=forecast,
-            ha_sun_info=sun_info,
+        self._settings_hash = self._kodi_adapter.settings.content_hash
+        self._kodi_adapter.set_output_profile(profile=self._kodi_adapter.output_profile)
+        self.__install_rate_limiter()
+        if [pipeline.location for pipeline in self._pipelines] != self._kodi_adapter.locations:
+            self._pipelines = self.__create_pipelines()
+            self.__activate(location=self._active + 1)
+        else:
+            for pipeline in self._pipelines:
+                pipeline.reset()
+        self.__install_history()
+
+    def __publish_locations(self) -> None:
+        self._kodi_adapter.set_location_properties(locations=[pipeline.title for pipeline in self._pipelines])
+
+    def apply_forecast(self) -> bool:
+        self._kodi_adapter.begin_refresh()
+        success = False
+        try:
+            self.__sync_settings()
+            self._cancellation = CancellationToken(
+                timeout=self._kodi_adapter.refresh_budget, is_aborted=self._kodi_adapter.abort_requested
+            )
+            success = self._apply_forecast()
+        finally:
+            self.__flush_history()
+            if success:
+                self.__save_rendered_properties()
+            if self._kodi_adapter.refresh_summary.cut_stages:
+                self._kodi_adapter.log(
+                    "Refresh cut short (%s), skipped: %s", self._cancellation.reason,
+                    ", ".join(self._kodi_adapter.refresh_summary.cut_stages), level=KodiLogLevel.WARNING
+                )
+            self._kodi_adapter.end_refresh(success=success)
+            self._kodi_adapter.log(
+                "Tiered refresh saves %.1f requests per hour",
+                sum(pipeline.scheduler.requests_saved_per_hour() for pipeline in self._pipelines)
+            )
+        return success
+
+    def _apply_forecast(self) -> bool:
+        pipelines = self.__refreshed_pipelines()
+        if len(pipelines) == 1:
+            results = [self.__refresh_pipeline(pipeline=pipelines[0])]
+        else:
+            # locations are independent, each one runs its own fetch and conversion over the shared session; only
+            # their forecast series are fetched together, one request per series however many locations there are
+            batches = self.__create_batches(participants=len(pipelines))
+            shared = HomeAssistantSharedRequests()
+            pool = ThreadPoolExecutor(max_workers=len(pipelines))
+            try:
+                futures = [
+                    pool.submit(self.__refresh_pipeline, pipeline=pipeline, batches=batches, shared=shared)
+                    for pipeline in pipelines
+                ]
+                results = [future.result() for future in futures]
+            finally:
+                pool.shutdown(wait=not self._cancellation.cancelled)
+        if not self._cancellation.cancelled:
+            self.__publish_locations()
+        return results[pipelines.index(self._pipelines[self._active])]
+
+    def __create_batches(self, participants: int) -> Dict[RefreshTier, HomeAssistantForecastBatch]:
+        if self._kodi_adapter.relay_mode == _RelayMode.CLIENT:
+            return {}   # the relay answers from memory, per entity
+        connection = dict(
+            server_url=self._kodi_adapter.source_url,
+            token=self._kodi_adapter.source_token,
+            check_ssl=self._kodi_adapter.get_check_ssl,
+            request_attempts=self._kodi_adapter.request_attempts,
+            cancellation=self._cancellation,
         )
-        if self._kodi_adapter.override_location:
-            kodi_forecast.General.location = self._kodi_adapter.override_location
-        self._kodi_adapter.set_weather_properties(forecast=kodi_forecast, remove_seconds=self._kodi_adapter.remove_seconds)
-        self._kodi_adapter.log(message="Weather updated successfully.", level=KodiLogLevel.INFO)
+        return {
+            RefreshTier.HOURLY: HomeAssistantForecastBatch(
+                participants=participants,
+                fetch=lambda horizons: HomeAssistantAdapter.get_hourly_forecasts(horizons=horizons, views=True, **connection)
+            ),
+            RefreshTier.DAILY: HomeAssistantForecastBatch(
+                participants=participants,
+                fetch=lambda horizons: HomeAssistantAdapter.get_daily_forecasts(horizons=horizons, views=True, **connection)
+            ),
+        }
+
+    def __refresh_pipeline(self, pipeline: _HomeAssistantWeatherPipeline,
+                           batches: Union[Dict[RefreshTier, HomeAssistantForecastBatch], None] = None,
+                           shared: Union[HomeAssistantSharedRequests, None] = None) -> bool:
+        try:
+            return pipeline.refresh(cancellation=self._cancellation, batches=batches, shared=shared)
+        except RequestError as e:
+            self._handle_request_error(e)
+            if pipeline.active and not self.__shows_valid_data(pipeline=pipeline):
+                self._kodi_adapter.clear_weather_properties(
+                    hourly_slots=self._kodi_adapter.hourly_slots, daily_slots=self._kodi_adapter.daily_slots
+                )
+            return False
+
+    def __shows_valid_data(self, pipeline: _HomeAssistantWeatherPipeline) -> bool:
+        # a transient failure (timeout, 5xx, 429) keeps the last good properties on the window; they are cleared
+        # only if nothing was ever fetched or restored, or once they outlived their validity
+        fetched_at = pipeline.fetched_at or self._restored_at
+        return fetched_at is not None and time.time() - fetched_at <= _PROPERTIES_VALIDITY
@@ -0,0 +1,158 @@
+import threading
+import time
+from typing import Union
+
+import xbmc
+import xbmcaddon
+import xbmcgui
+
+from lib.homeassistant import HomeAssistantRelayClient, HomeAssistantRelayServer, RequestError
+from lib.kodi import KodiLogLevel
+from lib.util.heartbeat import Heartbeat
+from ._kodi_adapter import _RelayMode
+from ._plugin import KodiHomeAssistantWeatherPlugin
+
+
+class _ServiceMagicValues:
+    HOME_WINDOW_ID = 10000
+    HEARTBEAT_PROPERTY = "weather.ha.service.heartbeat"
+    HEARTBEAT_TIMEOUT = 30          # seconds after which a silent service is considered gone
+    HEARTBEAT_INTERVAL = 5          # seconds between beats while a refresh keeps the loop busy
+    REFRESH_MESSAGE = "refresh"
+    LOCATION_MESSAGE = "location"   # followed by the 1-based location index
+    TICK = 1                        # seconds between checks of the abort/refresh flags
+    RELAY_LONG_POLL = 25            # seconds a relay client waits for news per request
+    RELAY_HOST = "0.0.0.0"          # the relay serves the other Kodi boxes of the network
+    INTERPOLATION_TICK = 60         # seconds between estimates of the current conditions, no request involved
+
+
+class KodiHomeAssistantWeatherService:
+    def __init__(self) -> None:
+        self._plugin = KodiHomeAssistantWeatherPlugin(refresh=False, all_locations=True)
+        self._refresh_requested = threading.Event()
+        self._requested_location: Union[int, None] = None
+        self._relay_changed = threading.Event()
+        self._relay: Union[HomeAssistantRelayServer, None] = None
+        self._monitor = self._plugin.kodi_adapter.watch_settings(on_notification=self.__on_notification)
+        self._home_window = xbmcgui.Window(_ServiceMagicValues.HOME_WINDOW_ID)
+        self._heartbeat = Heartbeat(
+            publish=lambda value: self._home_window.setProperty(_ServiceMagicValues.HEARTBEAT_PROPERTY, value),
+            interval=_ServiceMagicValues.HEARTBEAT_INTERVAL
+        )
+
+    @staticmethod
+    def trigger_refresh(location: Union[int, None] = None) -> bool:
+        # used by the weather entry point; True if a running service took over the refresh
+        heartbeat = xbmcgui.Window(_ServiceMagicValues.HOME_WINDOW_ID).getProperty(_ServiceMagicValues.HEARTBEAT_PROPERTY)
+        alive = Heartbeat.alive(value=heartbeat, timeout=_ServiceMagicValues.HEARTBEAT_TIMEOUT)
+        if alive:
+            message = _ServiceMagicValues.REFRESH_MESSAGE if location is None \
+                else f"{_ServiceMagicValues.LOCATION_MESSAGE}{location}"
+            xbmc.executebuiltin(f"NotifyAll({xbmcaddon.Addon().getAddonInfo('id')},{message})")
+        return alive
+
+    def __on_notification(self, sender: str, method: str, data: str) -> None:
+        if sender != self._plugin.kodi_adapter.addon_id:
+            return
+        # Kodi prefixes the message, e.g. "Other.location2"
+        message = method.rsplit(".", 1)[-1]
+        if message.startswith(_ServiceMagicValues.LOCATION_MESSAGE):
+            try:
+                self._requested_location = int(message[len(_ServiceMagicValues.LOCATION_MESSAGE):])
+            except ValueError:
+                return
+            self._refresh_requested.set()
+        elif message == _ServiceMagicValues.REFRESH_MESSAGE:
+            self._refresh_requested.set()
+
+    def __start_relay(self) -> None:
+        # the relay mode is read once, switching it takes a restart of the service
+        adapter = self._plugin.kodi_adapter
+        if adapter.relay_mode == _RelayMode.SERVER:
+            if not adapter.relay_key:
+                # the relay answers everyone on the network, it doesn't start without a key to check
+                adapter.log("Not starting the relay, it needs a relay key", level=KodiLogLevel.ERROR)
+                return
+            try:
+                self._relay = HomeAssistantRelayServer(
+                    host=_ServiceMagicValues.RELAY_HOST, port=adapter.relay_port, token=adapter.relay_key
+                )
+            except OSError as e:
+                adapter.log("Could not start the relay on port %d: %s", adapter.relay_port, e, level=KodiLogLevel.ERROR)
+                return
+            self._relay.start()
+            adapter.log("Relay serving on port %d", self._relay.port, level=KodiLogLevel.INFO)
+        elif adapter.relay_mode == _RelayMode.CLIENT:
+            threading.Thread(target=self.__follow_relay, name="ha-weather-relay-client", daemon=True).start()
+
+    def __follow_relay(self) -> None:
+        # long-polls the relay and refreshes as soon as it announces new data instead of waiting for the schedule
+        adapter = self._plugin.kodi_adapter
+        version = -1
+        while not self._monitor.abortRequested():
+            try:
+                changed = HomeAssistantRelayClient.wait_for_change(
+                    server_url=adapter.source_url, token=adapter.source_token, check_ssl=adapter.get_check_ssl,
+                    after=version, wait=_ServiceMagicValues.RELAY_LONG_POLL
+                )
+            except RequestError:
+                if self._monitor.waitForAbort(_ServiceMagicValues.RELAY_LONG_POLL):
+                    break
+                continue
+            if changed != version:
+                version = changed
+                self._relay_changed.set()
+
+    def __publish_relay(self) -> None:
+        changed = sum(
+            self._relay.publish(kind=kind, entity_id=entity_id, value=value)
+            for kind, entity_id, value in self._plugin.relay_resources()
+        )
+        self._plugin.kodi_adapter.log("Relay version %d, %d resources changed", self._relay.version, changed)
+
+    def __refresh(self) -> None:
+        # a refresh may use the whole budget, longer than the weather entry point waits for a heartbeat
+        budget = self._plugin.kodi_adapter.refresh_budget
+        with self._heartbeat.busy(limit=budget + _ServiceMagicValues.HEARTBEAT_TIMEOUT):
+            self._plugin.refresh()
+
+    def run(self) -> None:
+        adapter = self._plugin.kodi_adapter
+        adapter.log("Home Assistant Weather service started.", level=KodiLogLevel.INFO)
+        self.__start_relay()
+        next_interpolation = time.monotonic() + _ServiceMagicValues.INTERPOLATION_TICK
+        try:
+            while not self._monitor.abortRequested():
+                if adapter.service_enabled:
+                    self._heartbeat.beat()
+                    if self._requested_location is not None:
+                        # a location switch is served from the cache of the warm pipelines right away; Kodi sends
+                        # it on every refresh of the weather window, so the tiers due are fetched on the next tick
+                        location, self._requested_location = self._requested_location, None
+                        self._plugin.select_location(location=location)
+                        self._refresh_requested.set()
+                    elif self._relay_changed.is_set():
+                        # unchanged resources are answered with 304 by the relay
+                        self._relay_changed.clear()
+                        self._plugin.invalidate()
+                        self.__refresh()
+                    elif self._refresh_requested.is_set() or time.monotonic() >= self._plugin.next_deadline():
+                        # a triggered refresh only fetches tiers that are due, the rest is served warm
+                        self._refresh_requested.clear()
+                        self.__refresh()
+                        if self._relay is not None:
+                            self.__publish_relay()
+                    elif adapter.interpolation_age and time.monotonic() >= next_interpolation:
+                        next_interpolation = time.monotonic() + _ServiceMagicValues.INTERPOLATION_TICK
+                        self._plugin.interpolate_current()
+                else:
+                    # the weather entry point falls back to refreshing on its own
+                    self._home_window.clearProperty(_ServiceMagicValues.HEARTBEAT_PROPERTY)
+                if self._monitor.waitForAbort(_ServiceMagicValues.TICK):
+                    break
+        finally:
+            if self._relay is not None:
+                self._relay.stop()
+            self._home_window.clearProperty(_ServiceMagicValues.HEARTBEAT_PROPERTY)
+            adapter.flush_properties()
+            adapter.log("Home Assistant Weather service stopped.", level=KodiLogLevel.INFO)
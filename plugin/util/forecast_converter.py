@@ -1,137 +1,164 @@
+from dataclasses import fields
 from datetime import datetime
-from typing import Union
+from typing import List, Tuple, Union
 
 from lib.homeassistant import (
-    HomeAssistantHourlyForecast, HomeAssistantForecastMeta, HomeAssistantDailyForecast,
-    HomeAssistantForecast, HomeAssistantSunInfo, HomeAssistantWeatherCondition
+    HomeAssistantHourlyForecast, HomeAssistantDailyForecast, HomeAssistantCurrentForecast, HomeAssistantForecast,
+    HomeAssistantSunInfo, HomeAssistantWeatherCondition, HomeAssistantHourlyForecastView, HomeAssistantDailyForecastView,
+    HomeAssistantResolvedForecastMeta
 )
 from lib.kodi import (
     KodiHourlyForecastData, KodiWindDirectionCode, KodiDailyForecastData, KodiForecastData,
-    KodiGeneralForecastData, KodiCurrentForecastData, KodiConditionCode
+    KodiGeneralForecastData, KodiCurrentForecastData, KodiConditionCode, KodiPropertyProjection
 )
-from lib.unit.speed import SpeedUnits
-from lib.unit.temperature import TemperatureUnits
+from lib.unit.speed import Speed
+from lib.unit.temperature import Temperature
+from lib.util.lazy import cached_slot
+from lib.util.memo import BoundedMemo
 from lib.util.thermal_comfort import ThermalComfort
 
 
 class ForecastConverter:
     @staticmethod
-    def __translate_hourly_ha_forecast_to_kodi_forecast(
-            ha_forecast: HomeAssistantHourlyForecast, forecast_meta: HomeAssistantForecastMeta,
-            sunset: datetime, sunrise: datetime
-    ) -> KodiHourlyForecastData:
-        temperature = TemperatureUnits[forecast_meta.temperature_unit](ha_forecast.temperature)
-        wind_speed = SpeedUnits[forecast_meta.wind_speed_unit](ha_forecast.wind_speed)
-        timestamp = ForecastConverter.__parse_homeassistant_datetime(datetime_str=ha_forecast.datetime)
-        return KodiHourlyForecastData(
-            temperature=temperature,
-            wind_speed=wind_speed,
-            wind_direction=KodiWindDirectionCode.from_bearing(bearing=ha_forecast.wind_bearing),
-            precipitation=ForecastConverter.__format_precipitation(
-                precipitation=ha_forecast.precipitation, precipitation_unit=forecast_meta.precipitation_unit
-            ),
-            humidity=ha_forecast.humidity,
-            feels_like=ThermalComfort.feels_like(
-                temperature=temperature,
-                wind_speed=wind_speed
-            ),
-            dew_point=ThermalComfort.dew_point(
-                temperature=temperature,
-                humidity_percent=ha_forecast.humidity
-            ),
-            condition=ForecastConverter.__translate_condition(
-                ha_condition=ha_forecast.condition, is_night=not (sunrise.time() < timestamp.time() < sunset.time())
-            ),
-            timestamp=timestamp,
-            pressure="",
-        )
-
-    @staticmethod
-    def __translate_daily_ha_forecast_to_kodi_forecast(
-            ha_forecast: HomeAssistantDailyForecast, forecast_meta: HomeAssistantForecastMeta) -> KodiDailyForecastData:
-        temperature = TemperatureUnits[forecast_meta.temperature_unit](ha_forecast.temperature)
-        low_temperature = TemperatureUnits[forecast_meta.temperature_unit](ha_forecast.templow)
-        wind_speed = SpeedUnits[forecast_meta.wind_speed_unit](ha_forecast.wind_speed)
-        return KodiDailyForecastData(
-            temperature=temperature,
-            wind_speed=wind_speed,
-            wind_direction=KodiWindDirectionCode.from_bearing(bearing=ha_forecast.wind_bearing),
-            precipitation=ForecastConverter.__format_precipitation(
-                precipitation=ha_forecast.precipitation, precipitation_unit=forecast_meta.precipitation_unit
-            ),
-            condition=ForecastConverter.__translate_condition(ha_condition=ha_forecast.condition),
-            timestamp=ForecastConverter.__parse_homeassistant_datetime(datetime_str=ha_forecast.datetime),
-            low_temperature=low_temperature,
-        )
-
-    @staticmethod
-    def translate_ha_forecast_to_kodi_forecast(
-            ha_forecast: HomeAssistantForecast, ha_sun_info: HomeAssistantSunInfo) -> KodiForecastData:
-        temperature = TemperatureUnits[ha_forecast.current.temperature_unit](ha_forecast.current.temperature)
-        wind_speed = SpeedUnits[ha_forecast.current.wind_speed_unit](ha_forecast.current.wind_speed)
-        sunrise = ForecastConverter.__parse_homeassistant_datetime(ha_sun_info.next_rising)
-        sunset = ForecastConverter.__parse_homeassistant_datetime(ha_sun_info.next_setting)
+    def translate_current_forecast(
+            ha_current: HomeAssistantCurrentForecast, ha_sun_info: HomeAssistantSunInfo,
+            ha_hourly: List[HomeAssistantHourlyForecast], ha_daily: List[HomeAssistantDailyForecast],
+            projection: Union[KodiPropertyProjection, None] = None,
+            meta: Union[HomeAssistantResolvedForecastMeta, None] = None
+    ) -> Tuple[KodiGeneralForecastData, KodiCurrentForecastData]:
+        # values no property of the output profile shows are left missing instead of computed
+        needs = projection.needs_current if projection is not None else lambda field: True
+        meta = meta or HomeAssistantResolvedForecastMeta(ha_current)
+        temperature = meta.temperature_unit(ha_current.temperature)
+        missing = meta.temperature_unit(None)
+        wind_speed = meta.wind_speed_unit(ha_current.wind_speed)
+        sunrise = ForecastConverter._parse_homeassistant_datetime(ha_sun_info.next_rising)
+        sunset = ForecastConverter._parse_homeassistant_datetime(ha_sun_info.next_setting)
 
-        ha_condition = ha_forecast.current.condition
-        if ha_condition is None and len(ha_forecast.hourly) > 0:
-            ha_condition = ha_forecast.hourly[0].condition
-        if ha_condition is None and len(ha_forecast.daily) > 0:
-            ha_condition = ha_forecast.daily[0].condition
+        ha_condition = ha_current.condition
+        if ha_condition is None and len(ha_hourly) > 0:
+            ha_condition = ha_hourly[0].condition
+        if ha_condition is None and len(ha_daily) > 0:
+            ha_condition = ha_daily[0].condition
 
-        return KodiForecastData(
-            General=KodiGeneralForecastData(
-                location=ha_forecast.current.friendly_name,
-                attribution=ha_forecast.current.attribution,
+        return (
+            KodiGeneralForecastData(
+                location=ha_current.friendly_name,
+                attribution=ha_current.attribution,
             ),
-            Current=KodiCurrentForecastData(
+            KodiCurrentForecastData(
                 temperature=temperature,
                 wind_speed=wind_speed,
-                wind_direction=KodiWindDirectionCode.from_bearing(bearing=ha_forecast.current.wind_bearing),
-                precipitation=ForecastConverter.__format_precipitation(
-                    precipitation=ha_forecast.hourly[0].precipitation if len(ha_forecast.hourly) > 0 else None,
-                    precipitation_unit=ha_forecast.current.precipitation_unit
+                wind_direction=KodiWindDirectionCode.from_bearing(bearing=ha_current.wind_bearing),
+                precipitation=ForecastConverter._format_precipitation(
+                    precipitation=ha_hourly[0].precipitation if len(ha_hourly) > 0 else None,
+                    precipitation_unit=ha_current.precipitation_unit
                 ),  # conversion not implemented in Kodi
-                condition=ForecastConverter.__translate_condition(
+                condition=ForecastConverter._translate_condition(
                     ha_condition=ha_condition,
                     is_night=not (sunrise.time() < datetime.now().time() < sunset.time())
                 ),
-                humidity=ha_forecast.current.humidity,
+                humidity=ha_current.humidity,
                 feels_like=ThermalComfort.feels_like(
                     temperature=temperature,
                     wind_speed=wind_speed,
-                ),
+                ) if needs("feels_like") else missing,
                 dew_point=ThermalComfort.dew_point(
                     temperature=temperature,
-                    humidity_percent=ha_forecast.current.humidity
-                ),
-                uv_index=int(ha_forecast.current.uv_index if ha_forecast.current.uv_index != None else 0),
-                cloudiness=int(ha_forecast.current.cloud_coverage if ha_forecast.current.cloud_coverage != None else 0),
+                    humidity_percent=ha_current.humidity
+                ) if needs("dew_point") else missing,
+                uv_index=int(ha_current.uv_index if ha_current.uv_index != None else 0),
+                cloudiness=int(ha_current.cloud_coverage if ha_current.cloud_coverage != None else 0),
                 pressure=ForecastConverter.__format_pressure(
-                    pressure=ha_forecast.current.pressure if ha_forecast.current.pressure != None else 0, pressure_unit=ha_forecast.current.pressure_unit
+                    pressure=ha_current.pressure if ha_current.pressure != None else 0, pressure_unit=ha_current.pressure_unit
                 ),
                 sunrise=sunrise,
                 sunset=sunset,
             ),
-            HourlyForecasts=[
-                ForecastConverter.__translate_hourly_ha_forecast_to_kodi_forecast(
-                    ha_forecast=hourly_forecast,
-                    forecast_meta=ha_forecast.current,
-                    sunrise=sunrise,
-                    sunset=sunset,
-                )
-                for hourly_forecast in ha_forecast.hourly
-            ],
-            DailyForecasts=[
-                ForecastConverter.__translate_daily_ha_forecast_to_kodi_forecast(
-                    ha_forecast=daily_forecast,
-                    forecast_meta=ha_forecast.current
-                )
-                for daily_forecast in ha_forecast.daily
-            ]
         )
 
     @staticmethod
-    def __translate_condition(
+    def __content_key(ha_forecast: Union[HomeAssistantHourlyForecast, HomeAssistantDailyForecast]) -> tuple:
+        # the entry as Home Assistant sent it; unchanged entries of two refreshes have equal keys
+        if isinstance(ha_forecast, (HomeAssistantHourlyForecastView, HomeAssistantDailyForecastView)):
+            return ha_forecast.content_key
+        return tuple(getattr(ha_forecast, field.name) for field in fields(ha_forecast))
+
+    @staticmethod
+    def translate_hourly_forecasts(
+            ha_hourly: List[HomeAssistantHourlyForecast], meta: HomeAssistantResolvedForecastMeta,
+            ha_sun_info: HomeAssistantSunInfo, memo: Union[BoundedMemo[KodiHourlyForecastData], None] = None
+    ) -> List[KodiHourlyForecastData]:
+        # entries are views computing each value on first access, whatever Kodi never reads is never converted.
+        # With a memo only new or revised entries get a new view, the others are shared with the previous refresh.
+        sunrise = ForecastConverter._parse_homeassistant_datetime(ha_sun_info.next_rising)
+        sunset = ForecastConverter._parse_homeassistant_datetime(ha_sun_info.next_setting)
+        convert = lambda hourly_forecast: _KodiHourlyForecastView(
+            ha_forecast=hourly_forecast,
+            meta=meta,
+            sunrise=sunrise,
+            sunset=sunset,
+        )
+        if memo is None:
+            return [convert(hourly_forecast) for hourly_forecast in ha_hourly]
+        # units and the time of sunrise/sunset (day or night icon) are part of the result
+        context = (meta, sunrise.time(), sunset.time())
+        return [
+            memo.get(
+                key=(context, ForecastConverter.__content_key(hourly_forecast)),
+                create=lambda hourly_forecast=hourly_forecast: convert(hourly_forecast)
+            ).rebind(ha_forecast=hourly_forecast)
+            for hourly_forecast in ha_hourly
+        ]
+
+    @staticmethod
+    def translate_daily_forecasts(
+            ha_daily: List[HomeAssistantDailyForecast], meta: HomeAssistantResolvedForecastMeta,
+            memo: Union[BoundedMemo[KodiDailyForecastData], None] = None
+    ) -> List[KodiDailyForecastData]:
+        convert = lambda daily_forecast: _KodiDailyForecastView(
+            ha_forecast=daily_forecast,
+            meta=meta
+        )
+        if memo is None:
+            return [convert(daily_forecast) for daily_forecast in ha_daily]
+        context = meta
+        return [
+            memo.get(
+                key=(context, ForecastConverter.__content_key(daily_forecast)),
+                create=lambda daily_forecast=daily_forecast: convert(daily_forecast)
+            ).rebind(ha_forecast=daily_forecast)
+            for daily_forecast in ha_daily
+        ]
+
+    @staticmethod
+    def rebind_all(kodi_entries: Union[List[KodiHourlyForecastData], List[KodiDailyForecastData]],
+                   ha_entries: Union[List[HomeAssistantHourlyForecast], List[HomeAssistantDailyForecast]]) -> None:
+        # entries converted from a series move to its released copy, pairwise like they were converted
+        for kodi_entry, ha_entry in zip(kodi_entries, ha_entries):
+            kodi_entry.rebind(ha_forecast=ha_entry)
+
+    @staticmethod
+    def translate_ha_forecast_to_kodi_forecast(
+            ha_forecast: HomeAssistantForecast, ha_sun_info: HomeAssistantSunInfo) -> KodiForecastData:
+        meta = HomeAssistantResolvedForecastMeta(ha_forecast.current)
+        general, current = ForecastConverter.translate_current_forecast(
+            ha_current=ha_forecast.current, ha_sun_info=ha_sun_info, ha_hourly=ha_forecast.hourly,
+            ha_daily=ha_forecast.daily, meta=meta
+        )
+        return KodiForecastData(
+            General=general,
+            Current=current,
+            HourlyForecasts=ForecastConverter.translate_hourly_forecasts(
+                ha_hourly=ha_forecast.hourly, meta=meta, ha_sun_info=ha_sun_info
+            ),
+            DailyForecasts=ForecastConverter.translate_daily_forecasts(
+                ha_daily=ha_forecast.daily, meta=meta
+            ),
+        )
+
+    @staticmethod
+    def _translate_condition(
             ha_condition: Union[HomeAssistantWeatherCondition, None], is_night: bool = False
     ) -> Union[KodiConditionCode, None]:
         if ha_condition is None:
@@ -170,7 +197,7 @@ class ForecastConverter:
             raise ValueError(f"Unknown condition: {ha_condition}")
 
     @staticmethod
-    def __format_precipitation(precipitation: Union[float, None], precipitation_unit: str) -> Union[str, None]:
+    def _format_precipitation(precipitation: Union[float, None], precipitation_unit: str) -> Union[str, None]:
         if precipitation is None:
             return None
         # scientific rounding to 0 or 1 significant decimal
@@ -187,6 +214,101 @@ class ForecastConverter:
         return "{:.0f} {}".format(pressure, pressure_unit)
 
     @staticmethod
-    def __parse_homeassistant_datetime(datetime_str: str) -> datetime:
+    def _parse_homeassistant_datetime(datetime_str: str) -> datetime:
         # tz=None adds time offset to match Kodi's set time
-        return datetime.fromisoformat(datetime_str).astimezone(tz=None)
\ No newline at end of file
+        return datetime.fromisoformat(datetime_str).astimezone(tz=None)
+
+
+class _KodiForecastView:
+    # Reads like the Kodi*ForecastData dataclasses, but wraps the Home Assistant entry and converts each value on first
+    # access. Only the values the adapter renders are ever computed, each of them once.
+    __slots__ = (
+        "_ha_forecast", "_meta", "_temperature", "_wind_speed", "_wind_direction", "_precipitation",
+        "_condition", "_timestamp"
+    )
+
+    def __init__(self, ha_forecast: Union[HomeAssistantHourlyForecast, HomeAssistantDailyForecast],
+                 meta: HomeAssistantResolvedForecastMeta) -> None:
+        self._ha_forecast = ha_forecast
+        self._meta = meta
+
+    def rebind(self, ha_forecast: Union[HomeAssistantHourlyForecast, HomeAssistantDailyForecast]) -> "_KodiForecastView":
+        # a view shared with the previous refresh moves to the equal entry of this one, the old response can go
+        self._ha_forecast = ha_forecast
+        return self
+
+    @cached_slot
+    def temperature(self) -> Temperature:
+        return self._meta.temperature_unit(self._ha_forecast.temperature)
+
+    @cached_slot
+    def wind_speed(self) -> Speed:
+        return self._meta.wind_speed_unit(self._ha_forecast.wind_speed)
+
+    @cached_slot
+    def wind_direction(self) -> KodiWindDirectionCode:
+        return KodiWindDirectionCode.from_bearing(bearing=self._ha_forecast.wind_bearing)
+
+    @cached_slot
+    def precipitation(self) -> Union[str, None]:
+        return ForecastConverter._format_precipitation(
+            precipitation=self._ha_forecast.precipitation, precipitation_unit=self._meta.precipitation_unit
+        )
+
+    @cached_slot
+    def timestamp(self) -> datetime:
+        return ForecastConverter._parse_homeassistant_datetime(datetime_str=self._ha_forecast.datetime)
+
+    @property
+    def condition_str(self) -> str:
+        return str(self.condition) if self.condition is not None else ""
+
+    @property
+    def fanart_code(self) -> int:
+        return self.condition.value if self.condition is not None else 0
+
+    @property
+    def outlook_icon(self) -> str:
+        return f"{self.condition.value}.png" if self.condition is not None else ""
+
+
+class _KodiHourlyForecastView(_KodiForecastView):
+    __slots__ = ("_sunrise", "_sunset", "_feels_like", "_dew_point")
+    pressure = ""   # not part of Home Assistant's hourly forecast
+
+    def __init__(self, ha_forecast: HomeAssistantHourlyForecast, meta: HomeAssistantResolvedForecastMeta,
+                 sunrise: datetime, sunset: datetime) -> None:
+        super().__init__(ha_forecast=ha_forecast, meta=meta)
+        self._sunrise = sunrise
+        self._sunset = sunset
+
+    @property
+    def humidity(self) -> float:
+        return self._ha_forecast.humidity
+
+    @cached_slot
+    def feels_like(self) -> Temperature:
+        return ThermalComfort.feels_like(temperature=self.temperature, wind_speed=self.wind_speed)
+
+    @cached_slot
+    def dew_point(self) -> Temperature:
+        return ThermalComfort.dew_point(temperature=self.temperature, humidity_percent=self._ha_forecast.humidity)
+
+    @cached_slot
+    def condition(self) -> Union[KodiConditionCode, None]:
+        return ForecastConverter._translate_condition(
+            ha_condition=self._ha_forecast.condition,
+            is_night=not (self._sunrise.time() < self.timestamp.time() < self._sunset.time())
+        )
+
+
+class _KodiDailyForecastView(_KodiForecastView):
+    __slots__ = ("_low_temperature",)
+
+    @cached_slot
+    def low_temperature(self) -> Temperature:
+        return self._meta.temperature_unit(self._ha_forecast.templow)
+
+    @cached_slot
+    def condition(self) -> Union[KodiConditionCode, None]:
+        return ForecastConverter._translate_condition(ha_condition=self._ha_forecast.condition)
@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+from typing import List, Union
+
+from lib.homeassistant import HomeAssistantHourlyForecast
+from lib.kodi import KodiConditionCode, KodiForecastData, KodiSummaryForecastData
+from lib.unit.temperature import Temperature
+
+_HOUR = timedelta(hours=1)
+_WET_CONDITIONS = frozenset((
+    KodiConditionCode.SHOWERS, KodiConditionCode.SHOWERS_2, KodiConditionCode.THUNDERSHOWERS,
+    KodiConditionCode.THUNDERSTORMS, KodiConditionCode.SEVERE_THUNDERSTORMS, KodiConditionCode.MIXED_RAIN_AND_SNOW,
+    KodiConditionCode.SNOW, KodiConditionCode.HAIL,
+))
+
+
+class ForecastSummarizer:
+    @staticmethod
+    def summarize(forecast: KodiForecastData, ha_hourly: List[HomeAssistantHourlyForecast],
+                  now: datetime) -> KodiSummaryForecastData:
+        # One pass over each converted series. Only values the adapter renders anyway are read, the views have them
+        # cached; the UV index isn't part of the Kodi models and comes from the Home Assistant entry of the same slot.
+        # now has to be timezone aware like the converted timestamps.
+        current = forecast.Current
+        rain_start = now if current.condition in _WET_CONDITIONS else None
+        today = now.date()
+        # tonight ends with the next sunrise; it starts at the next sunset unless that comes after the sunrise
+        tonight_start = current.sunset if current.sunset < current.sunrise else now
+        today_high = today_low = tonight_low = None
+        max_uv_index = max_uv_time = None
+        for hourly, ha_hourly_entry in zip(forecast.HourlyForecasts, ha_hourly):
+            start = hourly.timestamp
+            end = start + _HOUR
+            if end <= now:
+                continue
+            if rain_start is None and hourly.condition in _WET_CONDITIONS:
+                rain_start = start
+            temperature = hourly.temperature
+            if start.date() == today:
+                today_high = ForecastSummarizer.__higher(today_high, temperature)
+                today_low = ForecastSummarizer.__lower(today_low, temperature)
+                uv_index = ha_hourly_entry.uv_index
+                if uv_index is not None and (max_uv_index is None or uv_index > max_uv_index):
+                    max_uv_index, max_uv_time = uv_index, start
+            if start < current.sunrise and end > tonight_start:
+                tonight_low = ForecastSummarizer.__lower(tonight_low, temperature)
+        week_high = week_low = None
+        rainy_days = 0
+        for daily in forecast.DailyForecasts:
+            week_high = ForecastSummarizer.__higher(week_high, daily.temperature)
+            week_low = ForecastSummarizer.__lower(week_low, daily.low_temperature)
+            rainy_days += daily.condition in _WET_CONDITIONS
+        return KodiSummaryForecastData(
+            rain_start=rain_start,
+            today_high=today_high,
+            today_low=today_low,
+            today_max_uv_index=max_uv_index,
+            today_max_uv_time=max_uv_time,
+            tonight_low=tonight_low,
+            week_high=week_high,
+            week_low=week_low,
+            rainy_days=rainy_days,
+        )
+
+    @staticmethod
+    def __higher(highest: Union[Temperature, None], temperature: Temperature) -> Union[Temperature, None]:
+        # the values of one series share their unit, they compare without a conversion
+        if temperature.value is None or (highest is not None and highest.value >= temperature.value):
+            return highest
+        return temperature
+
+    @staticmethod
+    def __lower(lowest: Union[Temperature, None], temperature: Temperature) -> Union[Temperature, None]:
+        if temperature.value is None or (lowest is not None and lowest.value <= temperature.value):
+            return lowest
+        return temperature
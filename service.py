@@ -0,0 +1,4 @@
+from plugin import KodiHomeAssistantWeatherService
+
+if __name__ == '__main__':
+    KodiHomeAssistantWeatherService().run()
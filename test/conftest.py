@@ -0,0 +1,79 @@
+"""Stand-ins for Kodi's modules where neither Kodi nor Kodistubs (requirements-dev.txt) provides them.
+
+They answer like Kodistubs does, with empty values, so the tests of lib.kodi and plugin run in a plain checkout.
+"""
+import importlib.machinery
+import importlib.util
+import sys
+import types
+
+
+def _module(name: str, **members) -> None:
+    module = types.ModuleType(name)
+    module.__spec__ = importlib.machinery.ModuleSpec(name, loader=None)
+    module.__dict__.update(members)
+    sys.modules[name] = module
+
+
+class _Monitor:
+    def abortRequested(self) -> bool:
+        return False
+
+    def waitForAbort(self, timeout: float = -1) -> bool:
+        return False
+
+
+class _Addon:
+    def __init__(self, id: str = "") -> None:
+        pass
+
+    def getAddonInfo(self, id: str) -> str:
+        return ""
+
+    def getLocalizedString(self, id: int) -> str:
+        return ""
+
+    def getSetting(self, id: str) -> str:
+        return ""
+
+    def getSettingBool(self, id: str) -> bool:
+        return True
+
+    def getSettingInt(self, id: str) -> int:
+        return 0
+
+    def getSettingNumber(self, id: str) -> float:
+        return 0.0
+
+    def getSettingString(self, id: str) -> str:
+        return ""
+
+
+class _Window:
+    def __init__(self, existingWindowId: int = -1) -> None:
+        pass
+
+    def getProperty(self, key: str) -> str:
+        return ""
+
+    def setProperty(self, key: str, value: str) -> None:
+        pass
+
+    def clearProperty(self, key: str) -> None:
+        pass
+
+
+class _Dialog:
+    def notification(self, heading: str, message: str, icon: str = "", time: int = 0, sound: bool = True) -> None:
+        pass
+
+
+if importlib.util.find_spec("xbmc") is None:
+    _module(
+        "xbmc", LOGDEBUG=0, LOGINFO=1, LOGWARNING=2, LOGERROR=3, LOGFATAL=4, Monitor=_Monitor,
+        log=lambda msg, level=0: None, getRegion=lambda id: "", getLanguage=lambda format=0, region=False: "",
+        getLocalizedString=lambda id: "", executebuiltin=lambda function, wait=False: None,
+    )
+    _module("xbmcaddon", Addon=_Addon)
+    _module("xbmcgui", Window=_Window, Dialog=_Dialog, NOTIFICATION_ERROR="error")
+    _module("xbmcvfs", translatePath=lambda path: "", exists=lambda path: True, mkdirs=lambda path: True)
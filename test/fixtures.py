@@ -0,0 +1,52 @@
+import importlib.util
+import unittest
+from datetime import datetime, timedelta
+from typing import List
+
+from lib.homeassistant import HomeAssistantCurrentForecast, HomeAssistantHourlyForecast, HomeAssistantSunInfo
+from lib.homeassistant._sun import HomeAssistantSunState
+
+# lib.kodi and plugin need Kodi's modules: Kodistubs or, under pytest, the stand-ins of conftest.py; their imports are
+# guarded for plain unittest runs
+requires_kodi = unittest.skipIf(importlib.util.find_spec("xbmc") is None, "Kodi's modules are not installed")
+
+
+class Clock:
+    """Stands in for time.time or time.monotonic, moved by hand."""
+
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def current(**values) -> HomeAssistantCurrentForecast:
+    # current conditions of a weather entity, any field can be overridden
+    return HomeAssistantCurrentForecast(**{
+        "temperature": 13.0, "dew_point": 5, "temperature_unit": "°C", "humidity": 40, "cloud_coverage": 0,
+        "pressure": 1013, "wind_bearing": 80, "wind_speed": 12, "wind_speed_unit": "km/h", "visibility_unit": "km",
+        "precipitation_unit": "mm", "pressure_unit": "hPa", "condition": "sunny", "friendly_name": "Home",
+        "supported_features": 3, "uv_index": 1, "attribution": "", **values,
+    })
+
+
+def hourly(start: datetime, count: int, **values) -> List[HomeAssistantHourlyForecast]:
+    # one entry per hour from start; a value is either the same for every entry or a function of the entry's index
+    return [HomeAssistantHourlyForecast(**{
+        "wind_bearing": 90, "wind_speed": 10, "temperature": 10 + i, "humidity": 50, "condition": "sunny",
+        "datetime": (start + timedelta(hours=i)).isoformat(), "precipitation": 0, "cloud_coverage": 0, "uv_index": 1,
+        **{name: value(i) if callable(value) else value for name, value in values.items()},
+    }) for i in range(count)]
+
+
+def sun() -> HomeAssistantSunInfo:
+    return HomeAssistantSunInfo(
+        state=HomeAssistantSunState.ABOVE_HORIZON, next_dawn="2024-06-02T03:00:00+00:00",
+        next_dusk="2024-06-01T20:00:00+00:00", next_midnight="2024-06-01T23:00:00+00:00",
+        next_noon="2024-06-02T11:00:00+00:00", next_rising="2024-06-02T03:30:00+00:00",
+        next_setting="2024-06-01T19:30:00+00:00", elevation=40.0, azimuth=180.0, rising=False, friendly_name="Sun"
+    )
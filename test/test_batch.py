@@ -0,0 +1,194 @@
+import json
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from lib.homeassistant import (
+    HomeAssistantAdapter, HomeAssistantForecastBatch, HomeAssistantSensorState, HomeAssistantSharedRequests, RequestError
+)
+
+SUPPORTED = {"weather.home": 3, "weather.cabin": 3, "weather.daily_only": 1}
+SENSORS = {
+    "sensor.balcony": {"entity_id": "sensor.balcony", "state": "21.5", "attributes": {"unit_of_measurement": "°C"}},
+    "sensor.wind": {"entity_id": "sensor.wind", "state": "unavailable", "attributes": {}},
+}
+
+
+def _state(entity_id: str) -> dict:
+    return {"entity_id": entity_id, "state": "sunny", "attributes": {
+        "temperature": 20, "temperature_unit": "°C", "wind_speed_unit": "km/h", "pressure_unit": "hPa",
+        "precipitation_unit": "mm", "visibility_unit": "km", "supported_features": SUPPORTED[entity_id],
+    }}
+
+
+def _entries(count: int, step: timedelta) -> list:
+    start = datetime.now(tz=timezone.utc).replace(minute=0, second=0, microsecond=0)
+    return [{"datetime": (start + step * i).isoformat(), "temperature": i, "condition": "sunny"} for i in range(count)]
+
+
+class _FakeHomeAssistant(BaseHTTPRequestHandler):
+    requests = []
+    refused = set()     # entities failing a whole get_forecasts call, like one without the forecast type
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        entity_id = self.path.rpartition("/")[2]
+        if entity_id.startswith("sensor."):
+            return self.__reply(200, SENSORS[entity_id]) if entity_id in SENSORS else self.__reply(404, {})
+        self.__reply(200, [_state(entity_id) for entity_id in SUPPORTED] + list(SENSORS.values()))
+
+    def do_POST(self):
+        data = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        # service calls only answer with data when asked to
+        assert self.path.endswith("?return_response=True"), self.path
+        entity_ids = data["entity_id"] if isinstance(data["entity_id"], list) else [data["entity_id"]]
+        self.requests.append(f"{data['type']} {','.join(entity_ids)}")
+        if self.refused & set(entity_ids):
+            return self.__reply(400, {"message": "unsupported"})
+        step = timedelta(hours=1) if data["type"] == "hourly" else timedelta(days=1)
+        self.__reply(200, {"service_response": {entity_id: {"forecast": _entries(48, step)} for entity_id in entity_ids}})
+
+    def __reply(self, status: int, body) -> None:
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class TestBatchedForecasts(unittest.TestCase):
+    def setUp(self):
+        _FakeHomeAssistant.requests = []
+        _FakeHomeAssistant.refused = set()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeHomeAssistant)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.connection = dict(
+            server_url=f"http://127.0.0.1:{self.server.server_port}", token="token", check_ssl=True, request_attempts=1
+        )
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_one_request_per_series(self):
+        hourly = HomeAssistantAdapter.get_hourly_forecasts(
+            horizons={"weather.home": 24, "weather.cabin": None}, **self.connection
+        )
+        daily = HomeAssistantAdapter.get_daily_forecasts(
+            horizons={"weather.home": 7, "weather.daily_only": 7}, **self.connection
+        )
+        self.assertEqual(
+            ["hourly weather.home,weather.cabin", "daily weather.home,weather.daily_only"], _FakeHomeAssistant.requests
+        )
+        self.assertEqual((24, 48), (len(hourly["weather.home"][0]), len(hourly["weather.cabin"][0])))
+        self.assertEqual(7, len(daily["weather.daily_only"][0]))
+
+    def test_refused_entity_does_not_fail_the_others(self):
+        _FakeHomeAssistant.refused = {"weather.cabin"}
+        results = HomeAssistantAdapter.get_hourly_forecasts(
+            horizons={"weather.home": 12, "weather.cabin": 12}, **self.connection
+        )
+        self.assertEqual(12, len(results["weather.home"][0]))
+        self.assertEqual(400, results["weather.cabin"].error_code)
+
+    def test_refused_entity_is_left_out_of_later_batches(self):
+        _FakeHomeAssistant.refused = {"weather.cabin"}
+        horizons = {"weather.home": 12, "weather.cabin": 12, "weather.daily_only": 7}
+        HomeAssistantAdapter.get_daily_forecasts(horizons=horizons, **self.connection)
+        _FakeHomeAssistant.requests = []
+        results = HomeAssistantAdapter.get_daily_forecasts(horizons=horizons, **self.connection)
+        self.assertEqual(["daily weather.home,weather.daily_only"], _FakeHomeAssistant.requests)
+        self.assertEqual(400, results["weather.cabin"].error_code)
+        self.assertEqual(7, len(results["weather.daily_only"][0]))
+        # the other series of the entity is still batched as before
+        HomeAssistantAdapter.get_hourly_forecasts(horizons={"weather.home": 12, "weather.cabin": 12}, **self.connection)
+        self.assertIn("hourly weather.home,weather.cabin", _FakeHomeAssistant.requests)
+
+    def test_one_sensor_is_read_on_its_own(self):
+        states = HomeAssistantAdapter.get_sensor_states(entity_ids=["sensor.balcony"], **self.connection)
+        self.assertEqual({"sensor.balcony": HomeAssistantSensorState(state="21.5", unit="°C")}, states)
+        self.assertEqual(["/api/states/sensor.balcony"], _FakeHomeAssistant.requests)
+
+    def test_sensors_are_read_from_the_states_without_a_template(self):
+        # the template API is for admins only, the states API for any token
+        states = HomeAssistantAdapter.get_sensor_states(
+            entity_ids=["sensor.balcony", "sensor.wind", "sensor.gone"], **self.connection
+        )
+        self.assertEqual({
+            "sensor.balcony": HomeAssistantSensorState(state="21.5", unit="°C"),
+            "sensor.wind": HomeAssistantSensorState(state="unavailable", unit=None),
+            "sensor.gone": HomeAssistantSensorState(state=None, unit=None),
+        }, states)
+        self.assertEqual(["/api/states"], _FakeHomeAssistant.requests)
+
+    def test_unknown_sensor_reads_as_unavailable(self):
+        states = HomeAssistantAdapter.get_sensor_states(entity_ids=["sensor.gone"], **self.connection)
+        self.assertEqual({"sensor.gone": HomeAssistantSensorState(state=None, unit=None)}, states)
+
+    def test_failed_batch_of_one_raises(self):
+        _FakeHomeAssistant.refused = {"weather.home"}
+        with self.assertRaises(RequestError):
+            HomeAssistantAdapter.get_daily_forecasts(horizons={"weather.home": 7}, **self.connection)
+
+
+class TestForecastBatch(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+
+    def _fetch(self, horizons):
+        self.calls.append(dict(horizons))
+        return {
+            entity_id: (list(range(48)), 0) if entity_id != "weather.broken" else RequestError(
+                error_code=200, url="", method="POST", body="no forecast"
+            ) for entity_id in horizons
+        }
+
+    def test_sent_once_everyone_arrived(self):
+        batch = HomeAssistantForecastBatch(participants=3, fetch=self._fetch)
+        first = batch.request(entity_id="weather.home", horizon=24)
+        second = batch.request(entity_id="weather.home", horizon=None)
+        self.assertFalse(first.done())
+        batch.decline()
+        self.assertEqual((list(range(24)), 24), first.result(timeout=5))
+        self.assertEqual((list(range(48)), 0), second.result(timeout=5))
+        self.assertEqual([{"weather.home": None}], self.calls)
+
+    def test_failure_of_one_entity(self):
+        batch = HomeAssistantForecastBatch(participants=2, fetch=self._fetch)
+        broken = batch.request(entity_id="weather.broken", horizon=24)
+        home = batch.request(entity_id="weather.home", horizon=24)
+        self.assertEqual(24, len(home.result(timeout=5)[0]))
+        self.assertIsInstance(broken.exception(timeout=5), RequestError)
+
+    def test_nothing_requested(self):
+        batch = HomeAssistantForecastBatch(participants=2, fetch=self._fetch)
+        batch.decline()
+        batch.decline()
+        batch.decline()     # a participant declining twice changes nothing
+        self.assertEqual([], self.calls)
+
+
+class TestSharedRequests(unittest.TestCase):
+    def test_sent_once_per_key(self):
+        calls = []
+        pool = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(pool.shutdown)
+        shared = HomeAssistantSharedRequests()
+        futures = [
+            shared.submit(key=(server, "sun.sun"), pool=pool, fetch=lambda **kwargs: calls.append(kwargs) or kwargs,
+                          server_url=server)
+            for server in ("http://ha", "http://ha", "http://other")
+        ]
+        self.assertIs(futures[0], futures[1])
+        self.assertEqual("http://other", futures[2].result(timeout=5)["server_url"])
+        futures[0].result(timeout=5)
+        self.assertEqual(2, len(calls))
+
+
+if __name__ == '__main__':
+    unittest.main()
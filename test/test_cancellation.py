@@ -0,0 +1,52 @@
+import unittest
+
+from lib.util.cancellation import CancellationToken, OperationCancelled
+
+from fixtures import Clock
+
+
+class TestCancellationToken(unittest.TestCase):
+    def test_deadline(self):
+        clock = Clock()
+        token = CancellationToken(timeout=10, clock=clock)
+        self.assertFalse(token.cancelled)
+        self.assertEqual(10, token.remaining)
+        self.assertEqual(5, token.timeout(default=5))
+        clock.now += 8
+        self.assertEqual(2, token.timeout(default=5))
+        clock.now += 2
+        self.assertTrue(token.cancelled)
+        self.assertEqual(CancellationToken.REASON_DEADLINE, token.reason)
+        with self.assertRaises(OperationCancelled) as raised:
+            token.raise_if_cancelled()
+        self.assertEqual(CancellationToken.REASON_DEADLINE, raised.exception.reason)
+
+    def test_timeout_is_never_zero(self):
+        clock = Clock()
+        token = CancellationToken(timeout=1, clock=clock)
+        clock.now += 1
+        self.assertEqual(0, token.remaining)
+        self.assertEqual(CancellationToken.MIN_TIMEOUT, token.timeout())
+        self.assertEqual(CancellationToken.MIN_TIMEOUT, token.timeout(default=5))
+
+    def test_abort(self):
+        aborted = []
+        token = CancellationToken(is_aborted=lambda: bool(aborted))
+        self.assertIsNone(token.remaining)
+        self.assertIsNone(token.timeout())
+        token.raise_if_cancelled()
+        aborted.append(True)
+        self.assertEqual(CancellationToken.REASON_ABORT, token.reason)
+
+    def test_reason_sticks(self):
+        clock = Clock()
+        aborted = []
+        token = CancellationToken(timeout=1, is_aborted=lambda: bool(aborted), clock=clock)
+        clock.now += 5
+        self.assertEqual(CancellationToken.REASON_DEADLINE, token.reason)
+        aborted.append(True)
+        self.assertEqual(CancellationToken.REASON_DEADLINE, token.reason)
+
+
+if __name__ == '__main__':
+    unittest.main()
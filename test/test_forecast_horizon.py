@@ -0,0 +1,50 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from lib.homeassistant import HomeAssistantAdapter
+
+NOW = datetime(2024, 6, 1, 12, 30, tzinfo=timezone.utc)
+
+
+def _hourly_entries(start: datetime, count: int):
+    return [{"datetime": (start + timedelta(hours=i)).isoformat(), "temperature": i} for i in range(count)]
+
+
+class TestForecastHorizon(unittest.TestCase):
+    def test_drops_past_entries(self):
+        entries = _hourly_entries(NOW.replace(minute=0) - timedelta(hours=3), 10)
+        kept, skipped = HomeAssistantAdapter.truncate_to_horizon(
+            entries=entries, horizon=None, slot_length=timedelta(hours=1), now=NOW
+        )
+        self.assertEqual(3, skipped)
+        # the slot of the current hour is still valid
+        self.assertEqual(entries[3], kept[0])
+
+    def test_cuts_at_horizon(self):
+        entries = _hourly_entries(NOW.replace(minute=0), 168)
+        kept, skipped = HomeAssistantAdapter.truncate_to_horizon(
+            entries=entries, horizon=24, slot_length=timedelta(hours=1), now=NOW
+        )
+        self.assertEqual(24, len(kept))
+        self.assertEqual(144, skipped)
+
+    def test_daily_entry_of_today_is_kept(self):
+        entries = [{"datetime": (datetime(2024, 6, 1, tzinfo=timezone.utc) + timedelta(days=i)).isoformat()}
+                   for i in range(-1, 14)]
+        kept, skipped = HomeAssistantAdapter.truncate_to_horizon(
+            entries=entries, horizon=7, slot_length=timedelta(days=1), now=NOW
+        )
+        self.assertEqual(entries[1:8], kept)
+        self.assertEqual(8, skipped)
+
+    def test_malformed_entries_are_passed_on(self):
+        entries = [{"temperature": 1}, {"datetime": "not a date"}]
+        kept, skipped = HomeAssistantAdapter.truncate_to_horizon(
+            entries=entries, horizon=None, slot_length=timedelta(hours=1), now=NOW
+        )
+        self.assertEqual(entries, kept)
+        self.assertEqual(0, skipped)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import random
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from lib.homeassistant import HomeAssistantHourlyForecastView
+from lib.unit.speed import SpeedKph
+from lib.unit.temperature import TemperatureCelsius
+
+try:
+    from lib.kodi import (
+        KodiConditionCode, KodiCurrentForecastData, KodiDailyForecastData, KodiForecastData, KodiGeneralForecastData,
+        KodiHourlyForecastData, KodiWindDirectionCode
+    )
+    from plugin.util.forecast_summary import ForecastSummarizer
+except ImportError:     # lib.kodi needs Kodi's modules, see requires_kodi
+    pass
+
+from fixtures import requires_kodi
+
+NOW = datetime(2024, 6, 1, 14, 20, tzinfo=timezone.utc)
+SUNSET = datetime(2024, 6, 1, 19, 30, tzinfo=timezone.utc)
+SUNRISE = datetime(2024, 6, 2, 3, 30, tzinfo=timezone.utc)
+DRY, WET = (("SUNNY", "PARTLY_CLOUDY", "CLOUDY"), ("SHOWERS", "THUNDERSTORMS", "SNOW"))
+
+
+def _current(condition: str = "SUNNY") -> "KodiCurrentForecastData":
+    return KodiCurrentForecastData(
+        temperature=TemperatureCelsius(20), wind_speed=SpeedKph(10), wind_direction=KodiWindDirectionCode.N,
+        precipitation="", humidity=50, feels_like=TemperatureCelsius(None), dew_point=TemperatureCelsius(None),
+        condition=KodiConditionCode[condition], uv_index=3, cloudiness=0, pressure="", sunrise=SUNRISE, sunset=SUNSET
+    )
+
+
+def _hourly(start: datetime, temperature, condition: str) -> "KodiHourlyForecastData":
+    return KodiHourlyForecastData(
+        timestamp=start, temperature=TemperatureCelsius(temperature), wind_speed=SpeedKph(10),
+        wind_direction=KodiWindDirectionCode.N, precipitation="", humidity=50, feels_like=TemperatureCelsius(None),
+        dew_point=TemperatureCelsius(None), condition=KodiConditionCode[condition], pressure=""
+    )
+
+
+def _daily(day: int, high, low, condition: str) -> "KodiDailyForecastData":
+    return KodiDailyForecastData(
+        timestamp=NOW + timedelta(days=day), temperature=TemperatureCelsius(high), wind_speed=SpeedKph(10),
+        wind_direction=KodiWindDirectionCode.N, precipitation="", condition=KodiConditionCode[condition],
+        low_temperature=TemperatureCelsius(low)
+    )
+
+
+def _forecast(hourlies, dailies, current: str = "SUNNY") -> "KodiForecastData":
+    return KodiForecastData(
+        General=KodiGeneralForecastData(location="Home", attribution=""), Current=_current(current),
+        HourlyForecasts=hourlies, DailyForecasts=dailies
+    )
+
+
+def _values(temperatures) -> list:
+    return [temperature.value for temperature in temperatures if temperature.value is not None]
+
+
+@requires_kodi
+class TestForecastSummarizer(unittest.TestCase):
+    def test_matches_a_pass_per_value(self):
+        rng = random.Random(7)
+        first = NOW.replace(minute=0) - timedelta(hours=2)
+        hourlies = [_hourly(
+            first + timedelta(hours=i), None if rng.random() < 0.2 else rng.uniform(-5, 30), rng.choice(DRY + WET)
+        ) for i in range(48)]
+        ha_hourly = [
+            HomeAssistantHourlyForecastView({"uv_index": None if rng.random() < 0.2 else rng.randint(0, 9)})
+            for _ in hourlies
+        ]
+        dailies = [_daily(day, rng.uniform(10, 30), rng.uniform(-5, 10), rng.choice(DRY + WET)) for day in range(7)]
+        summary = ForecastSummarizer.summarize(forecast=_forecast(hourlies, dailies), ha_hourly=ha_hourly, now=NOW)
+
+        # the straightforward version: one pass over the series per value
+        hour = timedelta(hours=1)
+        ahead = [(hourly, entry) for hourly, entry in zip(hourlies, ha_hourly) if hourly.timestamp + hour > NOW]
+        today = [(hourly, entry) for hourly, entry in ahead if hourly.timestamp.date() == NOW.date()]
+        tonight = [hourly for hourly, _ in ahead if hourly.timestamp < SUNRISE and hourly.timestamp + hour > SUNSET]
+        wet = [hourly.timestamp for hourly, _ in ahead if hourly.condition.name in WET]
+        uv = [(entry.uv_index, hourly.timestamp) for hourly, entry in today if entry.uv_index is not None]
+        self.assertEqual(wet[0] if wet else None, summary.rain_start)
+        self.assertEqual(max(_values(hourly.temperature for hourly, _ in today)), summary.today_high.value)
+        self.assertEqual(min(_values(hourly.temperature for hourly, _ in today)), summary.today_low.value)
+        self.assertEqual(min(_values(hourly.temperature for hourly in tonight)), summary.tonight_low.value)
+        # the earliest hour of the highest index
+        self.assertEqual(max(uv, key=lambda value: value[0]), (summary.today_max_uv_index, summary.today_max_uv_time))
+        self.assertEqual(max(daily.temperature.value for daily in dailies), summary.week_high.value)
+        self.assertEqual(min(daily.low_temperature.value for daily in dailies), summary.week_low.value)
+        self.assertEqual(sum(daily.condition.name in WET for daily in dailies), summary.rainy_days)
+
+    def test_past_hours_and_missing_values_are_skipped(self):
+        hourlies = [
+            _hourly(NOW.replace(minute=0) - timedelta(hours=1), 35, "SHOWERS"),    # over before now
+            _hourly(NOW.replace(minute=0), None, "SUNNY"),
+            _hourly(NOW.replace(minute=0) + timedelta(hours=1), 21, "SUNNY"),
+        ]
+        ha_hourly = [HomeAssistantHourlyForecastView({"uv_index": 9}), HomeAssistantHourlyForecastView({})] * 2
+        summary = ForecastSummarizer.summarize(forecast=_forecast(hourlies, []), ha_hourly=ha_hourly, now=NOW)
+        self.assertIsNone(summary.rain_start)
+        self.assertEqual((21, 21), (summary.today_high.value, summary.today_low.value))
+        self.assertEqual((9, hourlies[2].timestamp), (summary.today_max_uv_index, summary.today_max_uv_time))
+        self.assertIsNone(summary.tonight_low)
+        self.assertEqual((None, None, 0), (summary.week_high, summary.week_low, summary.rainy_days))
+
+    def test_raining_now(self):
+        hourlies = [_hourly(NOW.replace(minute=0) + timedelta(hours=2), 12, "THUNDERSTORMS")]
+        summary = ForecastSummarizer.summarize(
+            forecast=_forecast(hourlies, [], current="SHOWERS"), ha_hourly=[HomeAssistantHourlyForecastView({})],
+            now=NOW
+        )
+        self.assertEqual(NOW, summary.rain_start)
+
+    def test_frost_tonight(self):
+        hourlies = [_hourly(SUNSET.replace(minute=0) + timedelta(hours=i), 4 - i, "CLOUDY") for i in range(6)]
+        ha_hourly = [HomeAssistantHourlyForecastView({}) for _ in hourlies]
+        summary = ForecastSummarizer.summarize(forecast=_forecast(hourlies, []), ha_hourly=ha_hourly, now=NOW)
+        self.assertEqual(-1, summary.tonight_low.value)
+        self.assertTrue(summary.frost_tonight)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import time
+import unittest
+
+from lib.util.heartbeat import Heartbeat
+
+TIMEOUT = 0.2
+
+
+class TestHeartbeat(unittest.TestCase):
+    def setUp(self):
+        self.published = []
+        self.heartbeat = Heartbeat(publish=self.published.append, interval=0.02)
+
+    def _alive(self) -> bool:
+        return Heartbeat.alive(value=self.published[-1], timeout=TIMEOUT)
+
+    def test_beat(self):
+        self.heartbeat.beat()
+        self.assertTrue(self._alive())
+        self.assertFalse(Heartbeat.alive(value=self.published[-1], timeout=TIMEOUT, now=time.time() + TIMEOUT))
+
+    def test_missing_or_garbled_value(self):
+        for value in ("", None, "soon"):
+            self.assertFalse(Heartbeat.alive(value=value, timeout=TIMEOUT))
+
+    def test_busy_service_stays_alive(self):
+        # a refresh running past the timeout, the readers must not take over meanwhile
+        alive = []
+        with self.heartbeat.busy(limit=10):
+            for _ in range(5):
+                time.sleep(TIMEOUT / 2)
+                alive.append(self._alive())
+        self.assertEqual([True] * 5, alive)
+
+    def test_idle_loop_goes_silent(self):
+        self.heartbeat.beat()
+        time.sleep(TIMEOUT * 1.5)
+        self.assertFalse(self._alive())
+
+    def test_stuck_service_goes_silent_after_the_limit(self):
+        with self.heartbeat.busy(limit=0.05):
+            time.sleep(0.05 + TIMEOUT * 1.5)
+            self.assertFalse(self._alive())
+        # leaving the block counts as a beat again
+        self.assertTrue(self._alive())
+
+    def test_no_beats_after_the_block(self):
+        with self.heartbeat.busy(limit=10):
+            time.sleep(0.05)
+        count = len(self.published)
+        time.sleep(0.1)
+        self.assertEqual(count, len(self.published))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+from unittest import mock
+
+from lib.homeassistant import HomeAssistantForecastHistory, HomeAssistantHistoryKind, HomeAssistantWeatherCondition
+from lib.util.cancellation import CancellationToken
+
+from fixtures import Clock, current, hourly
+
+DAY = 24 * 3600
+START_TIME = datetime(2024, 6, 1, 6, 0, tzinfo=timezone.utc)
+START = START_TIME.timestamp()
+
+
+class TestForecastHistory(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.clock = Clock(now=START)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _history(self, retention_days: int = 7, max_bytes: int = 1 << 20) -> HomeAssistantForecastHistory:
+        return HomeAssistantForecastHistory(
+            directory=self.directory.name, retention_days=retention_days, max_bytes=max_bytes, clock=self.clock
+        )
+
+    def _segments(self):
+        return sorted(name for name in os.listdir(self.directory.name) if name.endswith(".seg"))
+
+    def test_round_trip_columns(self):
+        history = self._history()
+        history.record_current(entity_id="weather.home", current=current(
+            temperature=21.5, dew_point=None, last_updated=START_TIME.isoformat()
+        ))
+        history.record_forecast(entity_id="weather.home", kind=HomeAssistantHistoryKind.HOURLY,
+                                entries=hourly(START_TIME, 3, condition="rainy"))
+        history.record_current(entity_id="weather.office", current=current(temperature=18))
+        self.assertEqual(5, history.flush())
+        self.assertEqual(0, history.pending)
+        columns = self._history().query(start=START, end=START + 1, entity_id="weather.home")
+        self.assertEqual([21.5, 10, 11, 12], columns["temperature"])
+        self.assertEqual([None, None, None, None], columns["dew_point"])
+        self.assertEqual([HomeAssistantHistoryKind.OBSERVATION] + [HomeAssistantHistoryKind.HOURLY] * 3, columns["kind"])
+        self.assertEqual([START, START, START + 3600, START + 7200], columns["valid_at"])
+        self.assertEqual(HomeAssistantWeatherCondition.RAINY, columns["condition"][1])
+        observations = self._history().query(start=0, end=START + DAY, kinds=[HomeAssistantHistoryKind.OBSERVATION])
+        self.assertEqual([21.5, 18], observations["temperature"])
+
+    def test_one_fsync_per_flush(self):
+        history = self._history()
+        for i in range(10):
+            history.record_forecast(entity_id="weather.home", kind=HomeAssistantHistoryKind.HOURLY,
+                                    entries=hourly(START_TIME, 24))
+        with mock.patch("os.fsync") as fsync:
+            history.flush()
+            history.flush()     # nothing pending
+        self.assertEqual(1, fsync.call_count)
+
+    def test_range_query_across_daily_segments(self):
+        history = self._history()
+        for day in range(3):
+            self.clock.now = START + day * DAY
+            for hour in range(4):
+                self.clock.now += 3600
+                history.record_current(entity_id="weather.home", current=current(temperature=day * 10 + hour))
+                history.flush()
+        self.assertEqual(["2024-06-01.seg", "2024-06-02.seg", "2024-06-03.seg"], self._segments())
+        columns = self._history().query(start=START + DAY + 2 * 3600, end=START + 2 * DAY + 2 * 3600)
+        self.assertEqual([11, 12, 13, 20], columns["temperature"])
+
+    def test_retention_in_days_and_bytes(self):
+        history = self._history(retention_days=2)
+        for day in range(4):
+            self.clock.now = START + day * DAY
+            history.record_current(entity_id="weather.home", current=current(temperature=day))
+            history.flush()
+        self.assertEqual(["2024-06-03.seg", "2024-06-04.seg"], self._segments())
+        self.assertEqual([2, 3], self._history().query(start=0, end=START + 5 * DAY)["temperature"])
+        # the segment just written always stays, even alone over the byte limit
+        history = self._history(retention_days=30, max_bytes=100)
+        history.record_forecast(entity_id="weather.home", kind=HomeAssistantHistoryKind.HOURLY,
+                                entries=hourly(START_TIME, 24))
+        history.flush()
+        self.assertEqual(["2024-06-04.seg"], self._segments())
+
+    def test_recovers_from_torn_write_and_lost_index(self):
+        history = self._history()
+        history.record_current(entity_id="weather.home", current=current(temperature=1))
+        history.flush()
+        with open(os.path.join(self.directory.name, "2024-06-01.seg"), "ab") as f:
+            f.write(b"\x01\x02\x03")
+        os.remove(os.path.join(self.directory.name, "index.json"))
+        self.clock.now += 60
+        history.record_current(entity_id="weather.home", current=current(temperature=2))
+        history.flush()
+        self.assertEqual([1, 2], self._history().query(start=0, end=START + DAY)["temperature"])
+
+    def test_clock_going_back_keeps_query_correct(self):
+        history = self._history()
+        for offset, temperature in ((600, 1), (0, 2), (1200, 3)):
+            self.clock.now = START + offset
+            history.record_current(entity_id="weather.home", current=current(temperature=temperature))
+            history.flush()
+        self.assertEqual([1, 2], self._history().query(start=START, end=START + 900)["temperature"])
+
+    def test_lock_held_elsewhere_keeps_the_records_pending(self):
+        history = self._history()
+        history.record_current(entity_id="weather.home", current=current(temperature=1))
+        holder = self._history()._lock
+        token = holder.acquire(key="history")
+        naps = []
+        with mock.patch.object(HomeAssistantForecastHistory, "LOCK_WAIT", 0.2):
+            self.assertEqual(0, history.flush())
+            # Kodi shutting down ends the wait right away
+            history._sleep = lambda seconds: naps.append(seconds) or True
+            self.assertEqual(0, history.flush())
+            self.assertEqual(1, len(naps))
+            aborted = CancellationToken(is_aborted=lambda: True)
+            self.assertEqual(0, history.flush(cancellation=aborted))
+            self.assertEqual(1, len(naps))
+        self.assertEqual(1, history.pending)
+        holder.release(token=token, key="history", completed=False)
+        # a cancelled refresh still flushes while nobody else holds the archive
+        self.assertEqual(1, history.flush(cancellation=aborted))
+        self.assertEqual(0, history.pending)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+from datetime import datetime, timezone
+
+from lib.homeassistant import HomeAssistantCurrentInterpolator, HomeAssistantWeatherCondition
+
+from fixtures import current, hourly
+
+START = datetime(2024, 6, 1, 12, 0, tzinfo=timezone.utc)
+HOUR = 3600
+# the forecast warms by 2° and dries by 10 % an hour
+TREND = {"temperature": lambda i: 10 + 2 * i, "humidity": lambda i: 50 - 10 * i}
+
+
+class TestCurrentInterpolator(unittest.TestCase):
+    def setUp(self):
+        self.start = START.timestamp()
+
+    def test_follows_the_hourly_trend(self):
+        estimate = HomeAssistantCurrentInterpolator(hourly(START, 3, **TREND)).estimate(
+            current=current(), observed_at=self.start + HOUR / 4, now=self.start + HOUR * 3 / 4
+        )
+        # the forecast rises by 1° and dries by 5 % in half an hour, the observed offset to it is kept
+        self.assertEqual((14.0, 35.0), (estimate.temperature, estimate.humidity))
+        self.assertEqual((12, 80, 1013), (estimate.wind_speed, estimate.wind_bearing, estimate.pressure))
+        self.assertEqual(HomeAssistantWeatherCondition.SUNNY, estimate.condition)
+        self.assertEqual(13.0, current().temperature)     # the observation itself is left alone
+
+    def test_bearing_turns_along_the_shorter_arc(self):
+        estimate = HomeAssistantCurrentInterpolator(
+            hourly(START, 3, **TREND, wind_bearing=lambda i: (350, 30, 30)[i])
+        ).estimate(
+            current=current(wind_bearing=350), observed_at=self.start, now=self.start + HOUR / 2
+        )
+        self.assertEqual(10, estimate.wind_bearing)
+
+    def test_condition_of_the_nearest_slot(self):
+        interpolator = HomeAssistantCurrentInterpolator(
+            hourly(START, 3, **TREND, condition=lambda i: ("sunny", "rainy", "rainy")[i])
+        )
+        observed = current(condition="cloudy")
+        # still closest to the slot of the fetch, what was observed wins
+        same_slot = interpolator.estimate(current=observed, observed_at=self.start, now=self.start + HOUR * 0.4)
+        self.assertEqual(HomeAssistantWeatherCondition.CLOUDY, same_slot.condition)
+        next_slot = interpolator.estimate(current=observed, observed_at=self.start, now=self.start + HOUR * 0.6)
+        self.assertEqual(HomeAssistantWeatherCondition.RAINY, next_slot.condition)
+
+    def test_outside_of_the_series(self):
+        interpolator = HomeAssistantCurrentInterpolator(hourly(START, 3, **TREND))
+        self.assertIsNone(interpolator.estimate(current=current(), observed_at=self.start, now=self.start + 3 * HOUR))
+        self.assertIsNone(interpolator.estimate(current=current(), observed_at=self.start - 1, now=self.start))
+        self.assertIsNone(HomeAssistantCurrentInterpolator([]).estimate(
+            current=current(), observed_at=self.start, now=self.start
+        ))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+from unittest import mock
+
+try:
+    from lib.kodi import KodiLogCategory, KodiLogLevel, KodiWeatherPluginAdapter
+except ImportError:     # lib.kodi needs Kodi's modules, see requires_kodi
+    KodiWeatherPluginAdapter = None
+
+from fixtures import requires_kodi
+
+
+class _Adapter(KodiWeatherPluginAdapter or object):
+    def required_settings_done(self) -> bool:
+        return True
+
+
+@requires_kodi
+class TestLogBuffer(unittest.TestCase):
+    def setUp(self):
+        self.adapter = _Adapter()
+        self.adapter._allow_logging = True
+        self.adapter._verbose_log_categories = set()
+        self.lines = []
+        patcher = mock.patch.object(
+            self.adapter, "_write_log",
+            side_effect=lambda message, args, level: self.lines.append(message % args if args else message)
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_details_are_written_only_on_error(self):
+        self.adapter.log("GET %s -> %d", "/api/states", 200, category=KodiLogCategory.HTTP)
+        self.assertEqual([], self.lines)
+        self.adapter.log("Refresh failed", level=KodiLogLevel.ERROR)
+        self.assertEqual(
+            ["Last 1 detailed events before the error:", "(%s) GET /api/states -> 200" % KodiLogCategory.HTTP.value,
+             "Refresh failed"],
+            self.lines
+        )
+
+    def test_literal_percent_in_a_buffered_message(self):
+        self.adapter.log("Humidity at 100%", category=KodiLogCategory.HTTP)
+        self.adapter.log("%d%% of %s", 50, "hours", category=KodiLogCategory.HTTP)
+        self.adapter.log("Refresh failed", level=KodiLogLevel.ERROR)
+        self.assertEqual(
+            ["(%s) Humidity at 100%%" % KodiLogCategory.HTTP.value, "(%s) 50%% of hours" % KodiLogCategory.HTTP.value],
+            self.lines[1:3]
+        )
+
+    def test_new_refresh_drops_the_buffer(self):
+        self.adapter.log("GET %s", "/api/states", category=KodiLogCategory.HTTP)
+        self.adapter.begin_refresh()
+        self.adapter.log("Refresh failed", level=KodiLogLevel.ERROR)
+        self.assertEqual(["Refresh failed"], self.lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+
+from lib.util.memo import BoundedMemo
+
+
+class TestBoundedMemo(unittest.TestCase):
+    def setUp(self):
+        self.created = []
+        self.memo = BoundedMemo(capacity=3)
+
+    def _create(self, key):
+        return lambda: self.created.append(key) or key.upper()
+
+    def test_hits_and_misses(self):
+        self.assertEqual("A", self.memo.get("a", self._create("a")))
+        self.assertEqual("A", self.memo.get("a", self._create("a")))
+        self.assertEqual(["a"], self.created)
+        self.assertEqual((1, 1), (self.memo.hits, self.memo.misses))
+        self.memo.reset_counts()
+        self.assertEqual((0, 0), (self.memo.hits, self.memo.misses))
+        self.assertEqual(1, len(self.memo))
+
+    def test_least_recently_used_is_evicted(self):
+        for key in "abc":
+            self.memo.get(key, self._create(key))
+        self.memo.get("a", self._create("a"))   # a is now the most recent one
+        self.memo.get("d", self._create("d"))
+        self.assertEqual(3, len(self.memo))
+        self.memo.get("a", self._create("a"))
+        self.memo.get("b", self._create("b"))
+        self.assertEqual(["a", "b", "c", "d", "b"], self.created)
+
+    def test_clear(self):
+        self.memo.get("a", self._create("a"))
+        self.memo.clear()
+        self.memo.get("a", self._create("a"))
+        self.assertEqual(["a", "a"], self.created)
+
+
+if __name__ == '__main__':
+    unittest.main()
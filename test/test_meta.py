@@ -0,0 +1,60 @@
+import unittest
+from dataclasses import replace
+
+from lib.homeassistant import HomeAssistantForecastMetaCache, HomeAssistantResolvedForecastMeta
+from lib.unit.speed import SpeedMps
+from lib.unit.temperature import TemperatureFahrenheit
+
+from fixtures import current
+
+SERVER = "http://localhost:8123"
+
+
+class TestResolvedForecastMeta(unittest.TestCase):
+    def test_resolves_units_and_features(self):
+        meta = HomeAssistantResolvedForecastMeta(current(
+            temperature_unit="°F", wind_speed_unit="m/s", supported_features=1
+        ))
+        self.assertIs(TemperatureFahrenheit, meta.temperature_unit)
+        self.assertIs(SpeedMps, meta.wind_speed_unit)
+        self.assertEqual("mm", meta.precipitation_unit)
+        self.assertEqual((False, True), (meta.has_hourly_forecast, meta.has_daily_forecast))
+        self.assertFalse(HomeAssistantResolvedForecastMeta(current(supported_features=None)).has_daily_forecast)
+
+    def test_weather_values_are_not_part_of_it(self):
+        self.assertEqual(
+            HomeAssistantResolvedForecastMeta(current()), HomeAssistantResolvedForecastMeta(current(temperature=20.0))
+        )
+
+
+class TestForecastMetaCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = HomeAssistantForecastMetaCache()
+
+    def test_same_attributes_are_served_from_the_cache(self):
+        first = self.cache.resolve(server_url=SERVER, entity_id="weather.home", meta=current())
+        second = self.cache.resolve(server_url=SERVER, entity_id="weather.home", meta=current(temperature=20.0))
+        self.assertIs(first, second)
+        self.assertEqual((1, 1), (self.cache.hits, self.cache.misses))
+
+    def test_changed_attributes_invalidate(self):
+        first = self.cache.resolve(server_url=SERVER, entity_id="weather.home", meta=current())
+        changed = self.cache.resolve(server_url=SERVER, entity_id="weather.home", meta=current(temperature_unit="°F"))
+        self.assertIsNot(first, changed)
+        self.assertIs(TemperatureFahrenheit, changed.temperature_unit)
+        self.assertIs(changed, self.cache.resolve(
+            server_url=SERVER, entity_id="weather.home", meta=replace(current(), temperature_unit="°F")
+        ))
+
+    def test_keyed_by_server_and_entity(self):
+        home = self.cache.resolve(server_url=SERVER, entity_id="weather.home", meta=current())
+        other = self.cache.resolve(server_url=SERVER, entity_id="weather.other", meta=current())
+        remote = self.cache.resolve(server_url="http://remote:8123", entity_id="weather.home", meta=current())
+        self.assertEqual(home, other)
+        self.assertIsNot(home, other)
+        self.assertIsNot(home, remote)
+        self.assertEqual(3, self.cache.misses)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+from lib.homeassistant import HomeAssistantCurrentOverlay, HomeAssistantSensorState
+
+from fixtures import current
+
+
+class TestCurrentOverlay(unittest.TestCase):
+    def setUp(self):
+        self.overlay = HomeAssistantCurrentOverlay(sensors={
+            "temperature": "sensor.balcony_temperature", "humidity": "sensor.balcony_humidity",
+            "wind_speed": "sensor.anemometer", "pressure": "sensor.barometer",
+        })
+
+    def test_values_are_converted_into_the_units_of_the_entity(self):
+        merged, fields = self.overlay.apply(current=current(), states={
+            "sensor.balcony_temperature": HomeAssistantSensorState(state="68.0", unit="°F"),
+            "sensor.balcony_humidity": HomeAssistantSensorState(state="55.4", unit="%"),
+            "sensor.anemometer": HomeAssistantSensorState(state="5", unit="m/s"),
+            "sensor.barometer": HomeAssistantSensorState(state="1002.5", unit="hPa"),
+        })
+        self.assertEqual(["humidity", "pressure", "temperature", "wind_speed"], fields)
+        self.assertEqual(
+            (20.0, 55, 18.0, 1002.5), (merged.temperature, merged.humidity, merged.wind_speed, merged.pressure)
+        )
+        self.assertEqual(13.0, current().temperature)
+
+    def test_units_as_home_assistant_reports_them(self):
+        merged, fields = self.overlay.apply(current=current(wind_speed_unit="kn"), states={
+            "sensor.anemometer": HomeAssistantSensorState(state="36", unit="km/h"),
+        })
+        self.assertEqual((["wind_speed"], 19.44), (fields, merged.wind_speed))
+        merged, fields = self.overlay.apply(current=current(), states={
+            "sensor.anemometer": HomeAssistantSensorState(state="10", unit="kn"),
+            "sensor.balcony_temperature": HomeAssistantSensorState(state="20", unit="Furlong/Fortnight"),
+        })
+        self.assertEqual((["wind_speed"], 18.52), (fields, merged.wind_speed))
+
+    def test_unusable_sensors_keep_the_entity_values(self):
+        observed = current()
+        merged, fields = self.overlay.apply(current=observed, states={
+            "sensor.balcony_temperature": HomeAssistantSensorState(state="unavailable", unit="°C"),
+            "sensor.balcony_humidity": HomeAssistantSensorState(state="0.5", unit="g/m³"),
+            "sensor.barometer": HomeAssistantSensorState(state="29.6", unit="inHg"),
+        })
+        self.assertEqual([], fields)
+        self.assertIs(observed, merged)
+
+    def test_sensor_without_unit_is_taken_as_is(self):
+        merged, fields = self.overlay.apply(current=current(), states={
+            "sensor.balcony_temperature": HomeAssistantSensorState(state="21.5", unit=None),
+        })
+        self.assertEqual((["temperature"], 21.5), (fields, merged.temperature))
+
+    def test_configuration_is_validated(self):
+        self.assertEqual(
+            ["sensor.anemometer", "sensor.balcony_humidity", "sensor.balcony_temperature", "sensor.barometer"],
+            self.overlay.entity_ids
+        )
+        with self.assertRaises(ValueError):
+            HomeAssistantCurrentOverlay(sensors={"condition": "sensor.rain"})
+        with self.assertRaises(ValueError):
+            HomeAssistantCurrentOverlay(sensors={"temperature": 'sensor.t") }}{{ states("secret'})
+
+
+if __name__ == '__main__':
+    unittest.main()
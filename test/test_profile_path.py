@@ -0,0 +1,31 @@
+import unittest
+from unittest import mock
+
+try:
+    from lib.kodi import KodiWeatherPluginAdapter
+except ImportError:     # lib.kodi needs Kodi's modules, see requires_kodi
+    KodiWeatherPluginAdapter = None
+
+from fixtures import requires_kodi
+
+
+class _Adapter(KodiWeatherPluginAdapter or object):
+    def required_settings_done(self) -> bool:
+        return True
+
+
+@requires_kodi
+class TestProfilePath(unittest.TestCase):
+    def test_resolved_and_created_once(self):
+        adapter = _Adapter()
+        with mock.patch("lib.kodi._adapter.xbmcvfs") as xbmcvfs:
+            xbmcvfs.translatePath.return_value = "/profile/weather.ha/"
+            xbmcvfs.exists.return_value = False
+            paths = {adapter.profile_path for _ in range(3)}
+        self.assertEqual({"/profile/weather.ha/"}, paths)
+        self.assertEqual(1, xbmcvfs.translatePath.call_count)
+        xbmcvfs.mkdirs.assert_called_once_with("/profile/weather.ha/")
+
+
+if __name__ == '__main__':
+    unittest.main()
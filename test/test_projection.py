@@ -0,0 +1,77 @@
+import unittest
+from unittest import mock
+
+try:
+    from lib.kodi import KodiOutputProfile, KodiPropertyProjection, KodiWeatherPluginAdapter
+except ImportError:     # lib.kodi needs Kodi's modules, see requires_kodi
+    KodiWeatherPluginAdapter = None
+
+from fixtures import requires_kodi
+
+
+class _Adapter(KodiWeatherPluginAdapter or object):
+    def required_settings_done(self) -> bool:
+        return True
+
+
+@requires_kodi
+class TestPropertyProjection(unittest.TestCase):
+    def test_full_writes_everything(self):
+        projection = KodiPropertyProjection(profile=KodiOutputProfile.FULL)
+        self.assertTrue(projection.writes_hourly and projection.writes_daily and projection.writes_summary)
+        keys = set(projection.keys())
+        self.assertTrue({"Current.DewPoint", "Hourly.72.Time", "Daily.10.LongDay", "Day6.Title"} <= keys)
+        self.assertTrue(projection.needs_current("dew_point"))
+
+    def test_estuary_keeps_what_the_skin_reads(self):
+        projection = KodiPropertyProjection(profile=KodiOutputProfile.ESTUARY)
+        keys = set(projection.keys())
+        self.assertTrue({"Hourly.1.Time", "Daily.1.ShortDay", "Day0.Title", "Day6.HighTemp"} <= keys)
+        self.assertFalse({"Hourly.1.DewPoint", "Daily.1.LongDay", "Summary.Rain.StartsIn"} & keys)
+        self.assertFalse(projection.writes_summary)
+
+    def test_minimal_skips_the_hours(self):
+        projection = KodiPropertyProjection(profile=KodiOutputProfile.MINIMAL)
+        self.assertFalse(projection.writes_hourly or projection.writes_summary)
+        self.assertTrue(projection.writes_daily)
+        self.assertFalse(projection.needs_current("dew_point") or projection.needs_current("feels_like"))
+        # cheap fields are always converted
+        self.assertTrue(projection.needs_current("temperature"))
+        self.assertFalse(any(key.startswith(("Hourly.1.", "Day0.")) for key in projection.keys()))
+
+    def test_keys_of_the_first_slots(self):
+        projection = KodiPropertyProjection(profile=KodiOutputProfile.FULL)
+        keys = set(projection.keys(hourlies=2, dailies=1))
+        self.assertTrue({"Hourly.2.Time", "Daily.1.ShortDay", "Day0.Title", "Current.Temperature"} <= keys)
+        self.assertFalse({"Hourly.3.Time", "Daily.2.ShortDay", "Day1.Title"} & keys)
+
+
+@requires_kodi
+class TestSetOutputProfile(unittest.TestCase):
+    def setUp(self):
+        self.adapter = _Adapter()
+        self.written = {}
+        patcher = mock.patch.object(self.adapter, "_set_window_property", side_effect=self._write)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _write(self, key: str, value: str) -> None:
+        self.written[key] = value
+        self.adapter._rendered[key] = value
+
+    def test_properties_left_behind_are_cleared(self):
+        self.adapter._rendered.update({"Hourly.1.DewPoint": "5 °C", "Hourly.1.Time": "12:00", "Day0.Title": "Mon"})
+        self.adapter.set_output_profile(profile=KodiOutputProfile.ESTUARY)
+        self.assertEqual({"Hourly.1.DewPoint": ""}, self.written)
+        self.adapter.set_output_profile(profile=KodiOutputProfile.MINIMAL)
+        self.assertEqual({"Hourly.1.DewPoint": "", "Hourly.1.Time": "", "Day0.Title": ""}, self.written)
+
+    def test_same_profile_writes_nothing(self):
+        self.adapter._rendered["Hourly.1.DewPoint"] = "5 °C"
+        self.adapter.set_output_profile(profile=KodiOutputProfile.FULL)
+        self.assertEqual({}, self.written)
+        self.assertEqual(KodiOutputProfile.FULL, self.adapter.projection.profile)
+
+
+if __name__ == '__main__':
+    unittest.main()
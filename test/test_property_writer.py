@@ -0,0 +1,52 @@
+import threading
+import unittest
+from unittest import mock
+
+try:
+    from lib.kodi._writer import _KodiPropertyWriter
+except ImportError:     # lib.kodi needs Kodi's modules, see requires_kodi
+    pass
+
+from fixtures import requires_kodi
+
+
+@requires_kodi
+class TestPropertyWriter(unittest.TestCase):
+    def setUp(self):
+        self.written = []
+        self.errors = []
+        self.window = mock.Mock()
+        self.window.setProperty.side_effect = lambda key, value: self.written.append((key, value))
+        self.writer = _KodiPropertyWriter(
+            window=self.window, on_written=lambda key, value: None,
+            on_error=lambda key, e: self.errors.append(key)
+        )
+
+    def test_properties_are_written_in_order(self):
+        # the IsFetched flags rely on this: a flag enqueued last is visible only after the values of its set
+        released = threading.Event()
+        self.window.setProperty.side_effect = lambda key, value: released.wait(5) and self.written.append(key)
+        keys = [f"Hourly.{i}.Time" for i in range(1, 25)] + ["Hourly.IsFetched"]
+        for key in keys:
+            self.writer.put(key=key, value="x")
+        released.set()
+        self.writer.flush()
+        self.assertEqual(keys, self.written)
+
+    def test_flush_waits_for_everything_enqueued(self):
+        for i in range(100):
+            self.writer.put(key=f"Hourly.{i}.Time", value=str(i))
+        self.writer.flush()
+        self.assertEqual(100, len(self.written))
+
+    def test_failed_property_does_not_stop_the_writer(self):
+        self.window.setProperty.side_effect = [RuntimeError("gone"), None]
+        self.writer.put(key="Current.Temperature", value="20")
+        self.writer.put(key="Current.IsFetched", value="true")
+        self.writer.flush()
+        self.assertEqual(["Current.Temperature"], self.errors)
+        self.assertEqual(2, self.window.setProperty.call_count)
+
+
+if __name__ == '__main__':
+    unittest.main()
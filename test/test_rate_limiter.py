@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+
+from lib.homeassistant import HomeAssistantAdapter
+from lib.util.cancellation import CancellationToken, OperationCancelled
+from lib.util.rate_limiter import TokenBucket
+
+from fixtures import Clock
+
+
+class TestTokenBucket(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "ratelimit.json")
+        self.clock = Clock()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _bucket(self, rate: float = 60, burst: float = 3) -> TokenBucket:
+        return TokenBucket(path=self.path, rate_per_minute=rate, burst=burst, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_burst_is_shared_between_processes(self):
+        first, second = self._bucket(), self._bucket()
+        self.assertEqual(0, first.acquire())
+        self.assertEqual(0, second.acquire())
+        self.assertEqual(0, first.acquire())
+        # the fourth request of either one waits for a token to refill
+        self.assertAlmostEqual(1.0, second.acquire())
+        self.assertFalse(os.path.exists(self.path + ".lock"))
+
+    def test_refill_is_capped_by_burst(self):
+        bucket = self._bucket()
+        for _ in range(3):
+            bucket.acquire()
+        self.clock.now += 3600
+        self.assertEqual([0, 0, 0], [bucket.acquire() for _ in range(3)])
+        self.assertGreater(bucket.acquire(), 0)
+
+    def test_block_applies_to_every_process(self):
+        self._bucket().block(30)
+        other = self._bucket()
+        self.assertAlmostEqual(30, other.blocked_for())
+        self.assertAlmostEqual(30, other.acquire())
+        self.assertEqual(0, other.blocked_for())
+
+    def test_wait_beyond_budget_is_cancelled(self):
+        self._bucket().block(120)
+        cancellation = CancellationToken(timeout=10, clock=self.clock)
+        with self.assertRaises(OperationCancelled):
+            self._bucket().acquire(cancellation=cancellation)
+        self.assertEqual(CancellationToken.REASON_DEADLINE, cancellation.reason)
+        self.assertEqual(1000.0, self.clock.now)    # gave up without sleeping
+
+    def test_clock_going_back(self):
+        bucket = self._bucket()
+        for _ in range(3):
+            bucket.acquire()
+        self.clock.now -= 3600
+        self.assertGreater(bucket.acquire(), 0)
+
+
+class TestRetryAfter(unittest.TestCase):
+    NOW = datetime(2024, 6, 1, 12, 0, 0, tzinfo=timezone.utc)
+
+    def test_seconds_and_http_date(self):
+        self.assertEqual(120, HomeAssistantAdapter.retry_after("120", now=self.NOW))
+        self.assertEqual(90, HomeAssistantAdapter.retry_after("Sat, 01 Jun 2024 12:01:30 GMT", now=self.NOW))
+        self.assertEqual(0, HomeAssistantAdapter.retry_after("Sat, 01 Jun 2024 11:00:00 GMT", now=self.NOW))
+
+    def test_missing_or_invalid(self):
+        self.assertEqual(60, HomeAssistantAdapter.retry_after(None, now=self.NOW))
+        self.assertEqual(5, HomeAssistantAdapter.retry_after("soon", now=self.NOW, default=5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+
+from lib.util.jitter import device_jitter
+from lib.util.refresh_scheduler import RefreshScheduler, RefreshTier
+
+from fixtures import Clock
+
+INTERVALS = {
+    RefreshTier.CURRENT: 300,
+    RefreshTier.HOURLY: 3600,
+    RefreshTier.DAILY: 6 * 3600,
+    RefreshTier.SUN: 12 * 3600,
+}
+
+
+class TestRefreshScheduler(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.scheduler = RefreshScheduler(intervals=INTERVALS, clock=self.clock)
+
+    def _fetch(self, tiers):
+        for tier in tiers:
+            self.scheduler.mark_fetched(tier)
+
+    def test_everything_due_initially(self):
+        self.assertEqual(set(RefreshTier), self.scheduler.begin_cycle())
+
+    def test_only_expired_tiers_are_due(self):
+        self._fetch(self.scheduler.begin_cycle())
+        self.clock.now += 301
+        self.assertEqual({RefreshTier.CURRENT}, self.scheduler.begin_cycle())
+        self.clock.now += 3600
+        self.assertEqual({RefreshTier.CURRENT, RefreshTier.HOURLY}, self.scheduler.due_tiers())
+
+    def test_unfetched_tier_stays_due(self):
+        self.scheduler.begin_cycle()
+        self.scheduler.mark_fetched(RefreshTier.CURRENT)
+        self.clock.now += 10
+        self.assertEqual({RefreshTier.HOURLY, RefreshTier.DAILY, RefreshTier.SUN}, self.scheduler.begin_cycle())
+
+    def test_invalidate(self):
+        self._fetch(self.scheduler.begin_cycle())
+        self.scheduler.invalidate()
+        self.assertEqual(set(RefreshTier), self.scheduler.due_tiers())
+
+    def test_requests_saved_per_hour(self):
+        self._fetch(self.scheduler.begin_cycle())
+        for _ in range(11):
+            self.clock.now += 300
+            self._fetch(self.scheduler.begin_cycle())
+        # 11 cycles over 55 minutes refetched the current state only
+        self.assertEqual(11 * 3, self.scheduler.requests_saved)
+        self.assertAlmostEqual(36.0, self.scheduler.requests_saved_per_hour(), places=3)
+
+    def test_next_deadline(self):
+        self._fetch(self.scheduler.begin_cycle())
+        self.assertEqual(self.clock.now + 300, self.scheduler.next_deadline())
+
+    def test_jitter_delays_deadlines_only(self):
+        scheduler = RefreshScheduler(intervals=INTERVALS, clock=self.clock, jitter=lambda tier, interval: interval / 10)
+        for tier in scheduler.begin_cycle():
+            scheduler.mark_fetched(tier)
+        self.assertEqual(self.clock.now + 330, scheduler.next_deadline())
+        self.clock.now += 300
+        # an explicit refresh still finds the tier due once its interval passed
+        self.assertEqual({RefreshTier.CURRENT}, scheduler.due_tiers())
+
+    def test_failed_tier_is_not_retried_on_the_next_tick(self):
+        self.scheduler.begin_cycle()
+        self.assertEqual(30, self.scheduler.mark_failed(RefreshTier.CURRENT))
+        self.clock.now += 1
+        self.assertNotIn(RefreshTier.CURRENT, self.scheduler.due_tiers())
+        self.assertEqual(self.clock.now + 29, self.scheduler.deadline(RefreshTier.CURRENT))
+        self.clock.now += 29
+        self.assertIn(RefreshTier.CURRENT, self.scheduler.due_tiers())
+
+    def test_backoff_doubles_up_to_its_cap(self):
+        delays = [self.scheduler.mark_failed(RefreshTier.HOURLY) for _ in range(7)]
+        self.assertEqual([30, 60, 120, 240, 480, 900, 900], delays)
+        # never slower than the regular schedule of the tier
+        self.assertEqual([30, 60, 120, 240, 300], [self.scheduler.mark_failed(RefreshTier.CURRENT) for _ in range(5)])
+
+    def test_success_or_invalidate_ends_the_backoff(self):
+        for _ in range(3):
+            self.scheduler.mark_failed(RefreshTier.CURRENT)
+        self.scheduler.mark_fetched(RefreshTier.CURRENT)
+        self.assertEqual(30, self.scheduler.mark_failed(RefreshTier.CURRENT))
+        self.scheduler.invalidate()
+        self.assertIn(RefreshTier.CURRENT, self.scheduler.due_tiers())
+
+    def test_backoff_is_jittered(self):
+        scheduler = RefreshScheduler(intervals=INTERVALS, clock=self.clock, jitter=lambda tier, interval: interval / 10)
+        self.assertEqual(33, scheduler.mark_failed(RefreshTier.CURRENT))
+        self.assertEqual(self.clock.now + 33, scheduler.next_deadline())
+
+    def test_device_jitter(self):
+        offset = device_jitter(device_id="box-1", key="weather.home:current", interval=300)
+        self.assertEqual(offset, device_jitter(device_id="box-1", key="weather.home:current", interval=300))
+        self.assertTrue(0 <= offset < 30)
+        self.assertLess(device_jitter(device_id="box-1", key="weather.home:sun", interval=12 * 3600), 300)
+        offsets = {device_jitter(device_id=f"box-{i}", key="weather.home:current", interval=300) for i in range(20)}
+        self.assertEqual(20, len(offsets))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import threading
+import time
+import unittest
+from datetime import datetime, timezone
+
+from lib.homeassistant import (
+    HomeAssistantAdapter, HomeAssistantRelayClient, HomeAssistantRelayResource, HomeAssistantRelayServer, RequestError
+)
+
+from fixtures import current, hourly, sun
+
+ENTITY = "weather.home"
+TOKEN = "fleet-secret"
+
+
+class TestRelay(unittest.TestCase):
+    def setUp(self):
+        self.server = HomeAssistantRelayServer(host="127.0.0.1", port=0, token=TOKEN, max_wait=5)
+        self.server.start()
+        self.url = f"http://127.0.0.1:{self.server.port}"
+        self.statuses = []
+        HomeAssistantAdapter.set_request_listener(lambda method, url, status, elapsed: self.statuses.append(status))
+
+    def tearDown(self):
+        HomeAssistantAdapter.set_request_listener(None)
+        self.server.stop()
+
+    def _connection(self, token: str = TOKEN):
+        return dict(server_url=self.url, token=token, check_ssl=True, request_attempts=1)
+
+    def test_round_trip(self):
+        self.server.publish(HomeAssistantRelayResource.CURRENT, ENTITY, current())
+        self.server.publish(HomeAssistantRelayResource.SUN, "sun.sun", sun())
+        self.assertEqual(current(), HomeAssistantRelayClient.get_current_forecast(entity_id=ENTITY, **self._connection()))
+        self.assertEqual(sun(), HomeAssistantRelayClient.get_sun_info(entity_id="sun.sun", **self._connection()))
+
+    def test_clients_revalidate_with_etag(self):
+        self.server.publish(HomeAssistantRelayResource.CURRENT, ENTITY, current())
+        results = []
+        clients = [threading.Thread(target=lambda: results.append(
+            HomeAssistantRelayClient.get_current_forecast(entity_id=ENTITY, **self._connection())
+        )) for _ in range(8)]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        self.assertEqual([current()] * 8, results)
+        self.statuses.clear()
+        HomeAssistantRelayClient.get_current_forecast(entity_id=ENTITY, **self._connection())
+        self.assertEqual([304], self.statuses)
+        # an identical publish keeps the ETag, a changed one is served in full
+        self.assertFalse(self.server.publish(HomeAssistantRelayResource.CURRENT, ENTITY, current()))
+        self.assertTrue(self.server.publish(HomeAssistantRelayResource.CURRENT, ENTITY, current(temperature=3)))
+        self.assertEqual(3, HomeAssistantRelayClient.get_current_forecast(entity_id=ENTITY, **self._connection()).temperature)
+        self.assertEqual([304, 200], self.statuses)
+
+    def test_client_applies_its_own_horizon(self):
+        published = hourly(datetime.now(tz=timezone.utc).replace(minute=0, second=0, microsecond=0), 48)
+        self.server.publish(HomeAssistantRelayResource.HOURLY, ENTITY, published)
+        entries, skipped = HomeAssistantRelayClient.get_hourly_forecast(entity_id=ENTITY, horizon=12, **self._connection())
+        self.assertEqual(published[:12], entries)
+        self.assertEqual(36, skipped)
+
+    def test_long_poll_wakes_on_change(self):
+        version = self.server.version
+        threading.Timer(0.2, lambda: self.server.publish(HomeAssistantRelayResource.CURRENT, ENTITY, current())).start()
+        started = time.monotonic()
+        changed = HomeAssistantRelayClient.wait_for_change(
+            server_url=self.url, token=TOKEN, check_ssl=True, after=version, wait=5
+        )
+        self.assertEqual(version + 1, changed)
+        self.assertLess(time.monotonic() - started, 4)
+
+    def test_long_poll_times_out_unchanged(self):
+        self.assertEqual(self.server.version, HomeAssistantRelayClient.wait_for_change(
+            server_url=self.url, token=TOKEN, check_ssl=True, after=self.server.version, wait=0.2
+        ))
+
+    def test_errors(self):
+        with self.assertRaises(RequestError) as unauthorized:
+            HomeAssistantRelayClient.get_current_forecast(entity_id=ENTITY, **self._connection(token="wrong"))
+        self.assertEqual(401, unauthorized.exception.error_code)
+        with self.assertRaises(RequestError) as missing:
+            HomeAssistantRelayClient.get_current_forecast(entity_id="weather.unknown", **self._connection())
+        self.assertEqual(404, missing.exception.error_code)
+
+    def test_network_relay_needs_a_token(self):
+        for host in ("0.0.0.0", "192.168.1.10", "::"):
+            with self.assertRaises(ValueError):
+                HomeAssistantRelayServer(host=host, port=0, token="")
+        # only the device itself can reach a relay on the loopback interface
+        local = HomeAssistantRelayServer(port=0)
+        local.start()
+        try:
+            self.assertEqual("127.0.0.1", local._http.server_address[0])
+        finally:
+            local.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+try:
+    from lib.kodi import KodiWeatherPluginAdapter
+    from lib.kodi._properties import _KodiWeatherProperties
+except ImportError:     # lib.kodi needs Kodi's modules, see requires_kodi
+    KodiWeatherPluginAdapter = None
+
+from fixtures import requires_kodi
+
+NOW = datetime(2024, 6, 3, 12, 10, tzinfo=timezone.utc)
+FETCHED_AT = (NOW - timedelta(hours=2)).timestamp()
+HOUR_STARTS = [(NOW - timedelta(hours=2, minutes=10) + timedelta(hours=i)).timestamp() for i in range(4)]
+DAY_STARTS = [(NOW - timedelta(days=1) + timedelta(days=i)).timestamp() for i in range(3)]
+MAX_AGE = 3 * 3600
+
+
+class _Adapter(KodiWeatherPluginAdapter or object):
+    def required_settings_done(self) -> bool:
+        return True
+
+
+@requires_kodi
+class TestRenderedProperties(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "properties.json")
+        self.context = "en_gb|%H:%M"
+        context = mock.patch.object(
+            KodiWeatherPluginAdapter, "_rendered_context", new_callable=mock.PropertyMock,
+            side_effect=lambda: self.context
+        )
+        context.start()
+        self.addCleanup(context.stop)
+        self.written = {}
+        self.window = {}
+        saved = self._adapter()
+        saved._rendered.update({
+            "Current.Temperature": "20 °C", "Updated": "then",
+            **{f"Hourly.{i + 1}.Time": f"{10 + i}:00" for i in range(4)},
+            **{f"Daily.{i + 1}.ShortDay": day for i, day in enumerate(("Sun", "Mon", "Tue"))},
+            **{f"Day{i}.Title": day for i, day in enumerate(("Sun", "Mon", "Tue"))},
+        })
+        saved._rendered_slots.update({"hourly": list(HOUR_STARTS), "daily": list(DAY_STARTS)})
+        saved.save_rendered_properties(path=self.path, key="weather.home", fetched_at=FETCHED_AT)
+
+    def _adapter(self) -> "_Adapter":
+        adapter = _Adapter()
+        adapter._window = mock.Mock()
+        adapter._window.getProperty.side_effect = lambda key: self.window.get(key, "")
+        adapter._set_window_property = lambda key, value: self.written.__setitem__(key, value)
+        return adapter
+
+    def _restore(self, adapter=None, key: str = "weather.home", now: datetime = NOW):
+        return (adapter or self._adapter()).restore_rendered_properties(
+            path=self.path, key=key, max_age=MAX_AGE, now=now
+        )
+
+    def test_elapsed_slots_move_up(self):
+        adapter = self._adapter()
+        self.assertEqual(FETCHED_AT, self._restore(adapter))
+        # two hours and one day passed since the save
+        self.assertEqual(("12:00", "13:00"), (self.written["Hourly.1.Time"], self.written["Hourly.2.Time"]))
+        self.assertNotIn("Hourly.3.Time", self.written)
+        self.assertEqual(("Mon", "Tue"), (self.written["Daily.1.ShortDay"], self.written["Daily.2.ShortDay"]))
+        self.assertEqual(("Mon", "Tue"), (self.written["Day0.Title"], self.written["Day1.Title"]))
+        self.assertNotIn("Day2.Title", self.written)
+        self.assertEqual(("20 °C", NOW.isoformat()), (self.written["Current.Temperature"], self.written["Updated"]))
+        self.assertEqual(
+            {"hourly": HOUR_STARTS[2:], "daily": DAY_STARTS[1:]}, adapter._rendered_slots
+        )
+
+    def test_nothing_elapsed(self):
+        self.assertEqual(FETCHED_AT, self._restore(now=datetime.fromtimestamp(FETCHED_AT, tz=timezone.utc)))
+        self.assertEqual("10:00", self.written["Hourly.1.Time"])
+
+    def test_stale_or_future_file_is_rejected(self):
+        self.assertIsNone(self._restore(now=NOW + timedelta(hours=2)))
+        self.assertIsNone(self._restore(now=NOW - timedelta(hours=3)))
+        self.assertEqual({}, self.written)
+
+    def test_key_or_context_mismatch(self):
+        self.assertIsNone(self._restore(key="weather.cabin"))
+        self.context = "pl_pl|%H:%M"    # rendered for another language
+        self.assertIsNone(self._restore())
+        self.assertEqual({}, self.written)
+
+    def test_fetched_window_is_left_alone(self):
+        self.window["Weather.IsFetched"] = "true"
+        self.assertIsNone(self._restore())
+        self.assertEqual({}, self.written)
+
+    def test_unreadable_file(self):
+        for content in ("", "{\"key\": ", "[]", json.dumps({"key": "weather.home|en_gb|%H:%M", "fetched_at": "x"})):
+            with open(self.path, "w", encoding="utf-8") as f:
+                f.write(content)
+            self.assertIsNone(self._restore())
+        os.remove(self.path)
+        self.assertIsNone(self._restore())
+        self.assertEqual({}, self.written)
+
+
+@requires_kodi
+class TestShiftSlots(unittest.TestCase):
+    def setUp(self):
+        self.slots = _KodiWeatherProperties.hourlies(count=3)
+        self.shift = getattr(KodiWeatherPluginAdapter, "_KodiWeatherPluginAdapter__shift_slots")
+
+    def _properties(self) -> dict:
+        return {f"Hourly.{i}.{name}": f"{name}{i}" for i in range(1, 4) for name in ("Time", "Outlook")}
+
+    def test_shift(self):
+        properties = self._properties()
+        self.shift(properties, self.slots, 1)
+        self.assertEqual(
+            {"Hourly.1.Time": "Time2", "Hourly.2.Time": "Time3", "Hourly.3.Time": "",
+             "Hourly.1.Outlook": "Outlook2", "Hourly.2.Outlook": "Outlook3", "Hourly.3.Outlook": ""},
+            properties
+        )
+
+    def test_shift_past_the_end_clears_everything(self):
+        properties = self._properties()
+        self.shift(properties, self.slots, 5)
+        self.assertEqual({""}, set(properties.values()))
+
+    def test_only_present_keys_are_touched(self):
+        properties = {"Hourly.1.Time": "Time1", "Hourly.2.Time": "Time2", "Current.Temperature": "20 °C"}
+        self.shift(properties, self.slots, 1)
+        self.assertEqual({"Hourly.1.Time": "Time2", "Hourly.2.Time": "", "Current.Temperature": "20 °C"}, properties)
+        self.shift(properties, self.slots, 0)
+        self.assertEqual("Time2", properties["Hourly.1.Time"])
+
+
+if __name__ == '__main__':
+    unittest.main()
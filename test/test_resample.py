@@ -0,0 +1,60 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from lib.homeassistant import HomeAssistantForecastResampler, HomeAssistantWeatherCondition
+
+from fixtures import hourly
+
+LOCAL = timezone(timedelta(hours=2))
+# 20:00 local time, four hours are left of the first day
+START = datetime(2024, 6, 1, 18, 0, tzinfo=timezone.utc)
+# the temperature of an hour repeats every day, the UV index peaks at the end of the day
+DAYS = {"temperature": lambda i: 10 + i % 24, "uv_index": lambda i: i % 24 / 4, "precipitation": 0.5}
+
+
+class TestForecastResampler(unittest.TestCase):
+    def test_daily_buckets_split_on_local_midnight(self):
+        daily = HomeAssistantForecastResampler(tz=LOCAL).resample(hourly(START, 4 + 48 + 6, **DAYS))[24]
+        # the rest of today, two full days; six hours of the last day are too few for a day of their own
+        self.assertEqual(
+            ["2024-06-01T00:00:00+02:00", "2024-06-02T00:00:00+02:00", "2024-06-03T00:00:00+02:00"],
+            [entry.datetime for entry in daily]
+        )
+        today, tomorrow = daily[0], daily[1]
+        self.assertEqual((13, 10), (today.temperature, today.templow))
+        self.assertEqual((33, 10), (tomorrow.temperature, tomorrow.templow))
+        self.assertEqual(12.0, tomorrow.precipitation)
+        self.assertEqual(5.75, tomorrow.uv_index)
+        self.assertEqual((90, 10, 50), (tomorrow.wind_bearing, tomorrow.wind_speed, tomorrow.humidity))
+
+    def test_several_sizes_in_one_pass(self):
+        resampled = HomeAssistantForecastResampler(bucket_hours=(24, 6, 3), tz=LOCAL).resample(
+            hourly(START, 4 + 24, **DAYS)
+        )
+        self.assertEqual([2, 5, 10], [len(resampled[hours]) for hours in (24, 6, 3)])
+        self.assertEqual("2024-06-02T06:00:00+02:00", resampled[6][2].datetime)
+        self.assertEqual(3 * 0.5, resampled[3][1].precipitation)
+        with self.assertRaises(ValueError):
+            HomeAssistantForecastResampler(bucket_hours=(5,))
+
+    def test_circular_bearing_and_dominant_condition(self):
+        resampled = HomeAssistantForecastResampler(bucket_hours=(6,), tz=LOCAL).resample(hourly(
+            START, 4, **DAYS, wind_bearing=lambda i: (350, 10)[i % 2], condition=lambda i: ("rainy", "cloudy")[i % 2]
+        ))
+        self.assertEqual(0, resampled[6][0].wind_bearing)
+        # equally frequent conditions resolve to the more severe one
+        self.assertEqual(HomeAssistantWeatherCondition.RAINY, resampled[6][0].condition)
+        # a whole day never shows the night icon
+        night = HomeAssistantForecastResampler(bucket_hours=(6, 24), tz=LOCAL).resample(
+            hourly(START, 4, **DAYS, condition=lambda i: "clear-night")
+        )
+        self.assertEqual(HomeAssistantWeatherCondition.CLEAR_NIGHT, night[6][0].condition)
+        self.assertEqual(HomeAssistantWeatherCondition.SUNNY, night[24][0].condition)
+        opposite = HomeAssistantForecastResampler(bucket_hours=(24,), tz=LOCAL).resample(
+            hourly(START, 4, **DAYS, wind_bearing=lambda i: (90, 270)[i % 2])
+        )
+        self.assertIsNone(opposite[24][0].wind_bearing)
+
+
+if __name__ == '__main__':
+    unittest.main()
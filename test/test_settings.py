@@ -0,0 +1,41 @@
+import unittest
+
+try:
+    from lib.kodi import KodiPluginSetting
+except ImportError:     # lib.kodi needs Kodi's modules, see requires_kodi
+    pass
+
+from fixtures import requires_kodi
+
+
+def _setting(setting_type) -> "KodiPluginSetting":
+    return KodiPluginSetting(setting_id="test", setting_type=setting_type)
+
+
+@requires_kodi
+class TestSettingCoerce(unittest.TestCase):
+    def test_strings_of_the_getsetting_fallback(self):
+        self.assertIs(True, _setting(bool).coerce("true"))
+        self.assertIs(True, _setting(bool).coerce("TRUE"))
+        self.assertIs(False, _setting(bool).coerce("false"))
+        self.assertEqual(5, _setting(int).coerce("5"))
+        self.assertEqual(7, _setting(int).coerce(" 7 "))
+        self.assertEqual(2.5, _setting(float).coerce("2.5"))
+        self.assertEqual("weather.home", _setting(str).coerce("weather.home"))
+
+    def test_malformed_values_fall_back_to_the_default_of_the_type(self):
+        for setting_type, value in ((int, ""), (int, "five"), (int, "1e3"), (float, ""), (float, "2,5")):
+            with self.subTest(setting_type=setting_type, value=value):
+                self.assertEqual(setting_type(), _setting(setting_type).coerce(value))
+        # anything but "true" is off
+        for value in ("", "1", "yes", "on"):
+            self.assertIs(False, _setting(bool).coerce(value))
+
+    def test_typed_values_are_kept(self):
+        self.assertIs(True, _setting(bool).coerce(True))
+        self.assertEqual(3, _setting(int).coerce(3))
+        self.assertIsNone(_setting(int).coerce(None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from lib.util.single_flight import SingleFlight
+
+from fixtures import Clock
+
+
+class TestSingleFlight(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "refresh.lock")
+        self.clock = Clock()
+        self.calls = []
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _record(self, value) -> bool:
+        self.calls.append(value)
+        return True
+
+    def _flight(self, sleep=None) -> SingleFlight:
+        return SingleFlight(
+            path=self.path, lease=30, clock=self.clock, sleep=sleep or (lambda seconds: self.fail("unexpected wait"))
+        )
+
+    def test_runs_and_releases(self):
+        self.assertTrue(self._flight().run(key="1", action=lambda: self._record(1)))
+        self.assertEqual([1], self.calls)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_reuses_fresh_result(self):
+        self._flight().run(key="1", action=lambda: self._record(1), fresh_for=60)
+        self.clock.now += 59
+        self.assertFalse(self._flight().run(key="1", action=lambda: self._record(2), fresh_for=60))
+        # another location, and an outdated result, are refreshed
+        self.assertTrue(self._flight().run(key="2", action=lambda: self._record(3), fresh_for=60))
+        self.clock.now += 61
+        self.assertTrue(self._flight().run(key="2", action=lambda: self._record(4), fresh_for=60))
+        self.assertEqual([1, 3, 4], self.calls)
+
+    def test_failed_refresh_is_not_reused(self):
+        self._flight().run(key="1", action=lambda: False, fresh_for=60)
+        self.assertTrue(self._flight().run(key="1", action=lambda: self._record(1), fresh_for=60))
+
+    def test_waits_for_refresh_in_flight(self):
+        holder = self._flight()
+        token = holder.acquire(key="1")
+        self.assertIsNotNone(token)
+
+        def sleep(seconds: float) -> bool:
+            # the other process finishes while this one waits
+            self.clock.now += seconds
+            holder.release(token=token, key="1", completed=True)
+            return False
+
+        self.assertFalse(self._flight(sleep=sleep).run(key="1", action=lambda: self._record(1), fresh_for=60))
+        self.assertEqual([], self.calls)
+
+    def test_gives_up_when_aborted(self):
+        self._flight().acquire(key="1")
+        self.assertFalse(self._flight(sleep=lambda seconds: True).run(key="1", action=lambda: self._record(1)))
+        self.assertEqual([], self.calls)
+
+    def test_stale_lease_expires(self):
+        self._flight().acquire(key="1")    # the holder crashes and never releases
+
+        def sleep(seconds: float) -> bool:
+            self.clock.now += 10
+            return False
+
+        self.assertTrue(self._flight(sleep=sleep).run(key="1", action=lambda: self._record(self.clock.now)))
+        self.assertEqual([1030.0], self.calls)
+
+    def test_lease_from_the_future_is_stale(self):
+        self._flight().acquire(key="1")
+        self.clock.now -= 3600     # wall clock corrected backwards
+        self.assertTrue(self._flight(sleep=lambda seconds: False).run(key="1", action=lambda: self._record(1)))
+
+    def test_unreadable_lock_file(self):
+        with open(self.path, "w", encoding="utf-8"):
+            pass
+        self.assertIsNone(self._flight().acquire(key="1"))     # may still be written by its owner
+        old = time.time() - 60
+        os.utime(self.path, (old, old))
+        self.assertIsNotNone(self._flight().acquire(key="1"))
+
+    def test_does_not_release_foreign_lease(self):
+        flight = self._flight()
+        token = flight.acquire(key="1")
+        with open(self.path, "r", encoding="utf-8") as f:
+            lease = json.load(f)
+        flight.release(token="someone-else", key="1", completed=False)
+        self.assertTrue(os.path.exists(self.path))
+        flight.release(token=token, key="1", completed=False)
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual("1", lease["key"])
+
+
+if __name__ == '__main__':
+    unittest.main()
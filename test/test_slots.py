@@ -0,0 +1,46 @@
+import unittest
+from dataclasses import asdict, dataclass, fields
+
+from lib.homeassistant import HomeAssistantCurrentForecast, HomeAssistantDailyForecast
+from lib.util.slots import dataclass_slots
+
+
+@dataclass
+class _Mixin:
+    __slots__ = ()
+    first: int
+
+
+@dataclass_slots
+@dataclass
+class _Slotted(_Mixin):
+    second: str = "default"
+
+
+class TestDataclassSlots(unittest.TestCase):
+    def test_keeps_the_dataclass_api(self):
+        slotted = _Slotted(first=1)
+        self.assertEqual(_Slotted(1, "default"), slotted)
+        self.assertEqual({"first": 1, "second": "default"}, asdict(slotted))
+        self.assertEqual(("first", "second"), _Slotted.__slots__)
+        self.assertEqual("_Slotted", _Slotted.__qualname__)
+        slotted.second = "changed"
+        self.assertEqual("changed", slotted.second)
+        with self.assertRaises(AttributeError):
+            slotted.third = 3
+
+    def test_forecast_models_have_no_dict(self):
+        daily = HomeAssistantDailyForecast(
+            wind_bearing=270, wind_speed=20.8, temperature=25.2, humidity=40, condition="sunny",
+            datetime="2024-06-01T00:00:00+00:00", precipitation=0, templow=-3.9
+        )
+        self.assertFalse(hasattr(daily, "__dict__"))
+        self.assertIsNone(daily.uv_index)
+        # the meta fields come from a slotted base, the rest from the concrete class
+        self.assertEqual(len(fields(HomeAssistantCurrentForecast)), len(HomeAssistantCurrentForecast.__slots__) + len(
+            [slot for base in HomeAssistantCurrentForecast.__mro__[1:] for slot in getattr(base, "__slots__", ())]
+        ))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+import os
+import random
+import struct
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from lib.homeassistant import (
+    HomeAssistantForecast, HomeAssistantCurrentForecast, HomeAssistantHourlyForecast, HomeAssistantDailyForecast,
+    HomeAssistantForecastSnapshot, SnapshotError
+)
+from lib.homeassistant._snapshot import _CURRENT, _ENTRY, _HEADER
+
+START = datetime(2024, 6, 1, 12, 0, tzinfo=timezone(timedelta(hours=2)))
+
+
+def _forecast(hours: int = 168, days: int = 7) -> HomeAssistantForecast:
+    current = HomeAssistantCurrentForecast(
+        temperature_unit="°C", pressure_unit="hPa", wind_speed_unit="km/h", visibility_unit="km",
+        precipitation_unit="mm", attribution="Met.no – Zażółć", friendly_name="Home", supported_features=3,
+        wind_bearing=182.5, wind_speed=10.3, temperature=21.4, humidity=55, condition="partlycloudy", dew_point=None,
+        cloud_coverage=12.5, pressure=1013.2, uv_index=2.1, last_updated="2024-06-01T09:58:03.123456+00:00"
+    )
+    hourly = [HomeAssistantHourlyForecast(
+        wind_bearing=90 + i, wind_speed=5.1, temperature=round(15.7 + i / 10, 1), humidity=60, condition="rainy",
+        datetime=(START + timedelta(hours=i)).isoformat(), precipitation=0.3, cloud_coverage=None, uv_index=1.2
+    ) for i in range(hours)]
+    daily = [HomeAssistantDailyForecast(
+        wind_bearing=270, wind_speed=20.8, temperature=25.2, humidity=40, condition="sunny",
+        datetime=(START + timedelta(days=i)).isoformat(), precipitation=0, templow=-3.9, uv_index=None
+    ) for i in range(days)]
+    return HomeAssistantForecast(current=current, hourly=hourly, daily=daily, skipped_hourly=2, skipped_daily=1)
+
+
+class TestForecastSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "forecast.bin")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        forecast = _forecast()
+        HomeAssistantForecastSnapshot.write(path=self.path, forecast=forecast, key="http://ha|weather.home")
+        with HomeAssistantForecastSnapshot(self.path) as snapshot:
+            self.assertEqual(forecast, snapshot.to_forecast())
+            self.assertEqual("http://ha|weather.home", snapshot.key)
+
+    def test_empty_series_and_no_key(self):
+        forecast = _forecast(hours=0, days=0)
+        HomeAssistantForecastSnapshot.write(path=self.path, forecast=forecast)
+        with HomeAssistantForecastSnapshot(self.path) as snapshot:
+            self.assertEqual(forecast, snapshot.to_forecast())
+            self.assertIsNone(snapshot.key)
+
+    def test_lazy_record_access(self):
+        forecast = _forecast()
+        HomeAssistantForecastSnapshot.write(path=self.path, forecast=forecast)
+        with HomeAssistantForecastSnapshot(self.path) as snapshot:
+            self.assertEqual(168, len(snapshot.hourly))
+            self.assertEqual(forecast.hourly[100], snapshot.hourly[100])
+            self.assertEqual(forecast.daily[-1], snapshot.daily[-1])
+            self.assertEqual(forecast.hourly[3:6], snapshot.hourly[3:6])
+            with self.assertRaises(IndexError):
+                snapshot.daily[7]
+            now = (START + timedelta(hours=5, minutes=30)).timestamp()
+            self.assertEqual(6, snapshot.hourly.first_from(now))
+
+    def test_compact(self):
+        HomeAssistantForecastSnapshot.write(path=self.path, forecast=_forecast())
+        self.assertLess(os.path.getsize(self.path), 200 * 40)
+
+    def test_rejects_foreign_and_truncated_files(self):
+        with open(self.path, "wb") as f:
+            f.write(b"{}")
+        with self.assertRaises(SnapshotError):
+            HomeAssistantForecastSnapshot(self.path)
+        content = HomeAssistantForecastSnapshot.encode(forecast=_forecast())
+        with open(self.path, "wb") as f:
+            f.write(content[:len(content) // 2])
+        with self.assertRaises(SnapshotError):
+            HomeAssistantForecastSnapshot(self.path)
+        with open(self.path, "wb") as f:
+            f.write(content[:4] + struct.pack("<H", 99) + content[6:])
+        with self.assertRaises(SnapshotError) as unsupported:
+            HomeAssistantForecastSnapshot(self.path)
+        self.assertIn("version", unsupported.exception.reason)
+        open(self.path, "wb").close()
+        with self.assertRaises(SnapshotError):
+            HomeAssistantForecastSnapshot(self.path)
+
+    def _write(self, content: bytes) -> None:
+        with open(self.path, "wb") as f:
+            f.write(content)
+
+    def _record(self, index: int) -> int:
+        # offset of an hourly record
+        return _HEADER.size + _CURRENT.size + index * _ENTRY.size
+
+    def test_every_truncation_is_rejected_on_open(self):
+        content = HomeAssistantForecastSnapshot.encode(forecast=_forecast(hours=4, days=2), key="weather.home")
+        for size in range(len(content)):
+            with self.subTest(size=size):
+                self._write(content[:size])
+                with self.assertRaises(SnapshotError):
+                    HomeAssistantForecastSnapshot(self.path)
+
+    def test_header_mismatch(self):
+        content = HomeAssistantForecastSnapshot.encode(forecast=_forecast())
+        for version in (0, 2):
+            self._write(content[:4] + struct.pack("<H", version) + content[6:])
+            with self.assertRaises(SnapshotError) as raised:
+                HomeAssistantForecastSnapshot(self.path)
+            self.assertEqual(f"unsupported version {version}", raised.exception.reason)
+        self._write(b"HAWX" + content[4:])
+        with self.assertRaises(SnapshotError) as raised:
+            HomeAssistantForecastSnapshot(self.path)
+        self.assertEqual("not a forecast snapshot", raised.exception.reason)
+        # more records than the file holds
+        magic, version, key, hourly, daily, *skipped = _HEADER.unpack_from(content)
+        self._write(_HEADER.pack(magic, version, key, hourly + 1000, daily, *skipped) + content[_HEADER.size:])
+        with self.assertRaises(SnapshotError):
+            HomeAssistantForecastSnapshot(self.path)
+
+    def test_corrupt_record_fails_on_access(self):
+        content = bytearray(HomeAssistantForecastSnapshot.encode(forecast=_forecast(hours=24)))
+        content[self._record(3) + 10] = 0xFF     # condition code
+        content[self._record(5):self._record(5) + 8] = struct.pack("<q", 1 << 60)     # epoch
+        self._write(bytes(content))
+        with HomeAssistantForecastSnapshot(self.path) as snapshot:
+            self.assertEqual(_forecast(hours=24).hourly[4], snapshot.hourly[4])
+            for index in (3, 5):
+                with self.assertRaises(SnapshotError) as raised:
+                    snapshot.hourly[index]
+                self.assertEqual(self.path, raised.exception.path)
+            with self.assertRaises(SnapshotError):
+                snapshot.to_forecast()
+
+    def test_random_corruption_raises_snapshot_error_only(self):
+        content = HomeAssistantForecastSnapshot.encode(forecast=_forecast(hours=24, days=7), key="weather.home")
+        rng = random.Random(3)
+        for _ in range(500):
+            corrupt = bytearray(content)
+            corrupt[rng.randrange(len(corrupt))] = rng.randrange(256)
+            self._write(bytes(corrupt))
+            try:
+                with HomeAssistantForecastSnapshot(self.path) as snapshot:
+                    snapshot.to_forecast()
+            except SnapshotError:
+                pass
+
+    def test_unencodable_value(self):
+        forecast = _forecast()
+        forecast.current.wind_bearing = "NW"
+        with self.assertRaises(SnapshotError):
+            HomeAssistantForecastSnapshot.write(path=self.path, forecast=forecast)
+        self.assertEqual([], os.listdir(self.directory.name))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -43,6 +43,17 @@ class TestTemperatureUnits(unittest.TestCase):
             with self.subTest(msg=unit.unit):
                 self.assertLess(abs(SAMPLE - unit(CONVERT_42SI_TO[unit]).si_value()) / SAMPLE, 1e-3)
 
+    def test_compact_and_immutable(self):
+        for unit in TemperatureUnits.values():
+            with self.subTest(msg=unit.unit):
+                self.assertIs(unit(None), unit(None))
+                self.assertIsNone(unit(None).value)
+                self.assertIsNot(unit(SAMPLE), unit(SAMPLE))
+                self.assertFalse(hasattr(unit(SAMPLE), "__dict__"))
+                with self.assertRaises(AttributeError):
+                    unit(None).value = SAMPLE
+        self.assertIsNot(TemperatureCelsius(None), TemperatureKelvin(None))
+
 
 if __name__ == '__main__':
     unittest.main()
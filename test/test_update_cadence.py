@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+from lib.util.update_cadence import UpdateCadenceEstimator
+
+
+class TestUpdateCadenceEstimator(unittest.TestCase):
+    def setUp(self):
+        self.estimator = UpdateCadenceEstimator(min_interval=60, max_interval=3600, smoothing=0.5, margin=30)
+
+    def test_learns_cadence(self):
+        for t in (0, 600, 1200, 1800):
+            self.assertTrue(self.estimator.observe(t))
+        self.assertAlmostEqual(600, self.estimator.cadence)
+        # next update is expected at 2400, poll shortly after
+        self.assertAlmostEqual(630, self.estimator.next_poll_delay(now=1800))
+        self.assertAlmostEqual(130, self.estimator.next_poll_delay(now=2300))
+
+    def test_smoothing(self):
+        for t in (0, 600, 1800):
+            self.estimator.observe(t)
+        self.assertAlmostEqual(900, self.estimator.cadence)
+
+    def test_backoff_without_change(self):
+        for t in (0, 600):
+            self.estimator.observe(t)
+        self.assertFalse(self.estimator.observe(600))
+        self.assertEqual(120, self.estimator.next_poll_delay(now=1300))
+        self.estimator.observe(600)
+        self.assertEqual(240, self.estimator.next_poll_delay(now=1500))
+        self.assertTrue(self.estimator.observe(1400))
+        self.assertEqual(0, self.estimator.misses)
+
+    def test_bounds(self):
+        self.assertEqual(60, self.estimator.next_poll_delay(now=0))
+        for t in (0, 86400):
+            self.estimator.observe(t)
+        self.assertEqual(3600, self.estimator.next_poll_delay(now=86400))
+        for _ in range(20):
+            self.estimator.observe(86400)
+        self.assertEqual(3600, self.estimator.next_poll_delay(now=90000))
+
+    def test_persistence(self):
+        for t in (0, 600, 1200):
+            self.estimator.observe(t)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cadence.json")
+            self.estimator.save(path=path, key="weather.home")
+            restored = UpdateCadenceEstimator(min_interval=60, max_interval=3600)
+            restored.load(path=path, key="weather.home")
+            self.assertEqual(self.estimator.to_dict(), restored.to_dict())
+            other = UpdateCadenceEstimator(min_interval=60, max_interval=3600)
+            other.load(path=path, key="weather.cabin")
+            self.assertIsNone(other.cadence)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import json
+import unittest
+from dataclasses import asdict, fields
+
+from lib.homeassistant import (
+    HomeAssistantAdapter, HomeAssistantDailyForecast, HomeAssistantHourlyForecast, HomeAssistantHourlyForecastView,
+    HomeAssistantDailyForecastView, HomeAssistantResolvedForecastMeta, HomeAssistantWeatherCondition
+)
+from lib.util.lazy import cached_slot
+from lib.util.memo import BoundedMemo
+
+try:
+    from plugin.util.forecast_converter import ForecastConverter
+except ImportError:     # lib.kodi needs Kodi's modules, see requires_kodi
+    ForecastConverter = None
+
+from fixtures import current, requires_kodi, sun
+
+RESPONSE = """[
+    {"datetime": "2024-06-01T12:00:00+00:00", "condition": "rainy", "temperature": 15.7, "humidity": 60,
+     "wind_bearing": 90, "wind_speed": 5.1, "precipitation": 0.3, "cloud_coverage": 80, "uv_index": 1,
+     "apparent_temperature": 14.2, "pressure": 1013},
+    {"datetime": "2024-06-02T00:00:00+00:00", "condition": "sunny", "temperature": 25.2, "templow": -3.9,
+     "wind_bearing": 270, "wind_speed": 20.8, "precipitation": 0}
+]"""
+
+
+class _Counted:
+    __slots__ = ("computed", "_value")
+
+    def __init__(self):
+        self.computed = 0
+
+    @cached_slot
+    def value(self) -> int:
+        self.computed += 1
+        return 42
+
+
+class TestCachedSlot(unittest.TestCase):
+    def test_computed_once(self):
+        counted = _Counted()
+        self.assertEqual(0, counted.computed)
+        self.assertEqual(42, counted.value)
+        self.assertEqual(42, counted.value)
+        self.assertEqual(1, counted.computed)
+        self.assertIsInstance(_Counted.value, cached_slot)
+
+
+class TestForecastViews(unittest.TestCase):
+    def setUp(self):
+        self.entries = json.loads(RESPONSE)
+
+    def test_reads_like_the_dataclass(self):
+        view = HomeAssistantHourlyForecastView(self.entries[0])
+        forecast = HomeAssistantHourlyForecast(**HomeAssistantAdapter.filter_attributes(self.entries[0], 'hourly'))
+        self.assertEqual(forecast, view.to_forecast())
+        self.assertEqual(asdict(forecast), view.asdict())
+        self.assertEqual(tuple(getattr(forecast, field.name) for field in fields(forecast)), view.content_key)
+        self.assertIs(HomeAssistantWeatherCondition.RAINY, view.condition)
+        self.assertIs(view.condition, view.condition)
+        self.assertFalse(hasattr(view, "__dict__"))
+
+    def test_wraps_without_copying(self):
+        daily = HomeAssistantDailyForecastView(self.entries[1])
+        self.assertEqual(-3.9, daily.templow)
+        self.assertIsNone(daily.uv_index)   # missing keys read as None
+        self.entries[1]["templow"] = -1.0
+        self.assertEqual(-1.0, daily.templow)
+        self.assertEqual(daily, HomeAssistantDailyForecastView(dict(self.entries[1])))
+        self.assertNotEqual(daily, HomeAssistantDailyForecastView(self.entries[0]))
+
+    def test_release_all_keeps_dataclasses_only(self):
+        forecast = HomeAssistantHourlyForecast(**HomeAssistantAdapter.filter_attributes(self.entries[0], 'hourly'))
+        daily = HomeAssistantDailyForecastView(self.entries[1])
+        released = HomeAssistantDailyForecastView.release_all([forecast, daily])
+        self.assertIs(forecast, released[0])
+        self.assertEqual(daily.to_forecast(), released[1])
+        self.assertIs(HomeAssistantDailyForecast, type(released[1]))
+        self.entries[1]["templow"] = -1.0     # the decoded entry is no longer read
+        self.assertEqual(-3.9, released[1].templow)
+
+    @requires_kodi
+    def test_converted_entries_move_to_the_released_series(self):
+        views = [HomeAssistantHourlyForecastView(self.entries[0])]
+        meta, memo = HomeAssistantResolvedForecastMeta(current()), BoundedMemo(capacity=8)
+        converted = ForecastConverter.translate_hourly_forecasts(
+            ha_hourly=views, meta=meta, ha_sun_info=sun(), memo=memo
+        )
+        released = HomeAssistantHourlyForecastView.release_all(views)
+        ForecastConverter.rebind_all(converted, released)
+        self.entries[0]["temperature"] = 0.0     # the decoded entry is no longer read
+        self.assertIs(released[0], converted[0]._ha_forecast)
+        self.assertEqual(15.7, converted[0].temperature.value)
+        # the next refresh finds the entry in the memo by the values of the dataclass
+        again = ForecastConverter.translate_hourly_forecasts(
+            ha_hourly=released, meta=meta, ha_sun_info=sun(), memo=memo
+        )
+        self.assertIs(converted[0], again[0])
+
+
+if __name__ == '__main__':
+    unittest.main()